@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def solve_assignment(cost) -> list[tuple[int, int]]:
+    """Minimum-cost assignment of rows to columns (Hungarian method).
+
+    `cost` is an n x m array of finite costs; the result pairs min(n, m) rows
+    with distinct columns so that the summed cost is minimal, as
+    (row, col) tuples sorted by row. Shortest-augmenting-path formulation with
+    potentials, O(k^2 * K) for k = min(n, m), K = max(n, m); the inner scan
+    over columns is vectorised.
+    """
+    c = np.asarray(cost, dtype=np.float64)
+    if c.ndim != 2 or 0 in c.shape:
+        return []
+    transposed = c.shape[0] > c.shape[1]
+    if transposed:
+        c = c.T
+    n, m = c.shape
+
+    # 1-based: column 0 is the virtual start of every augmenting path
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j] = row holding column j (0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)  # previous column on the shortest path
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = c[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            cand = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(cand)) + 1
+            delta = cand[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = [(int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """Bounded LRU map whose entries also expire `ttl` seconds after being set.
+
+    Reads refresh recency but not age, so an entry is never served past its
+    TTL. `invalidate`/`invalidate_where` are the hooks for callers that learn
+    about a change before the TTL would catch it. `on_evict(key, value)` is
+    called for entries the cache drops by itself (expired or least recently
+    used), so callers can keep side indexes in step. Counters are exposed via
+    `stats()`.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_evict: Callable[[Hashable, Any], None] | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._on_evict = on_evict
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self._live(key) is not None
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if self.ttl is not None and self._clock() - item[0] >= self.ttl:
+            del self._data[key]
+            self.expirations += 1
+            if self._on_evict is not None:
+                self._on_evict(key, item[1])
+            return None
+        return item
+
+    def get(self, key, default=None):
+        item = self._live(key)
+        if item is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._data.move_to_end(key)
+        return item[1]
+
+    def set(self, key, value):
+        self._data[key] = (self._clock(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            key, (_, value) = self._data.popitem(last=False)
+            self.evictions += 1
+            if self._on_evict is not None:
+                self._on_evict(key, value)
+
+    def invalidate(self, key) -> bool:
+        if self._data.pop(key, None) is None:
+            return False
+        self.invalidations += 1
+        return True
+
+    def invalidate_where(self, pred: Callable[[Hashable, Any], bool]) -> int:
+        keys = [k for k, (_, v) in self._data.items() if pred(k, v)]
+        for k in keys:
+            del self._data[k]
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        self.invalidations += len(self._data)
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
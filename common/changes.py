@@ -0,0 +1,97 @@
+import asyncio
+from typing import AsyncIterator, Callable
+
+import grpc
+
+from common.log import get_logger
+
+log = get_logger("changes")
+
+# op values carried by change events (RouteChange, StationChange, ...)
+RESYNC = "RESYNC"   # first message of every watch: drop anything cached, then follow deltas
+UPSERT = "UPSERT"
+DELETE = "DELETE"
+
+_CLOSED = object()
+
+
+class Subscription:
+    """One subscriber's bounded queue. Iterate it with `async for`.
+
+    Iteration ends when the subscriber falls more than `maxsize` events behind;
+    it has then missed changes and must resubscribe (and resync).
+    """
+
+    def __init__(self, hub: "ChangeHub", maxsize: int):
+        self._hub = hub
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def _offer(self, event) -> bool:
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # make room for the close marker; everything queued is moot now
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(_CLOSED)
+            return False
+
+    def close(self):
+        self._hub._subs.discard(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self._queue.get()
+        if event is _CLOSED:
+            self.close()
+            raise StopAsyncIteration
+        return event
+
+
+class ChangeHub:
+    """In-process fan-out of change events to any number of async subscribers.
+
+    `publish` never blocks: a subscriber that can't keep up is cut off instead
+    of slowing the writer down. Must be used from the event loop thread; other
+    threads go through `loop.call_soon_threadsafe(hub.publish, event)`.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._subs: set[Subscription] = set()
+
+    def __len__(self):
+        return len(self._subs)
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(self, self.maxsize)
+        self._subs.add(sub)
+        return sub
+
+    def publish(self, event):
+        for sub in list(self._subs):
+            if not sub._offer(event):
+                self._subs.discard(sub)
+
+
+async def follow(open_stream: Callable[[], AsyncIterator], on_event: Callable, on_reset: Callable,
+                 name: str = "watch", retry_seconds: float = 1.0):
+    """Consume a Watch* server stream forever, reconnecting on failure.
+
+    `on_reset` runs on RESYNC and whenever the stream drops, because events may
+    have been missed in between; `on_event` gets every other event.
+    """
+    while True:
+        try:
+            async for event in open_stream():
+                if event.op == RESYNC:
+                    on_reset()
+                else:
+                    on_event(event)
+        except grpc.RpcError as e:
+            log.warning("stream failed", stream=name, code=e.code().name)
+        on_reset()
+        await asyncio.sleep(retry_seconds)
@@ -0,0 +1,140 @@
+import asyncio
+import itertools
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable
+
+import grpc
+
+from common import tracing
+from common.log import get_logger
+
+log = get_logger("grpc")
+
+GRPC_POOL_SIZE = int(os.getenv("GRPC_POOL_SIZE", "2"))
+GRPC_KEEPALIVE_MS = int(os.getenv("GRPC_KEEPALIVE_MS", "30000"))
+GRPC_KEEPALIVE_TIMEOUT_MS = int(os.getenv("GRPC_KEEPALIVE_TIMEOUT_MS", "10000"))
+
+# Keepalive pings keep idle HTTP/2 connections (and any NAT/LB entries in
+# front of them) open between bursts. A local subchannel pool stops grpc from
+# collapsing the channels of one backend's pool onto a single shared socket.
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", GRPC_KEEPALIVE_MS),
+    ("grpc.keepalive_timeout_ms", GRPC_KEEPALIVE_TIMEOUT_MS),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.use_local_subchannel_pool", 1),
+]
+
+
+class ChannelRegistry:
+    """Long-lived channels and stubs, `pool_size` connections per backend.
+
+    Stubs are handed out round-robin over the backend's channels, so callers
+    can ask for a stub per request without paying a handshake each time.
+    """
+
+    def __init__(self, pool_size: int = GRPC_POOL_SIZE, options=None,
+                 channel_factory: Callable[..., grpc.Channel] = grpc.insecure_channel):
+        self.pool_size = max(1, pool_size)
+        self.options = list(CHANNEL_OPTIONS if options is None else options)
+        self._factory = channel_factory
+        self._lock = threading.Lock()
+        self._pools: dict[str, list[grpc.Channel]] = {}
+        self._rr: dict[str, itertools.count] = {}
+        self._stubs: dict[tuple[str, type, int], object] = {}
+
+    def _pool(self, addr: str) -> list[grpc.Channel]:
+        pool = self._pools.get(addr)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(addr)
+                if pool is None:
+                    pool = [self._open(addr) for _ in range(self.pool_size)]
+                    self._rr[addr] = itertools.count()
+                    self._pools[addr] = pool
+        return pool
+
+    def _open(self, addr: str) -> grpc.Channel:
+        ch = self._factory(addr, options=self.options)
+        interceptors = tracing.sync_client_interceptors()
+        return grpc.intercept_channel(ch, *interceptors) if interceptors else ch
+
+    def channel(self, addr: str) -> grpc.Channel:
+        pool = self._pool(addr)
+        return pool[next(self._rr[addr]) % len(pool)]
+
+    def stub(self, addr: str, stub_cls):
+        pool = self._pool(addr)
+        idx = next(self._rr[addr]) % len(pool)
+        key = (addr, stub_cls, idx)
+        s = self._stubs.get(key)
+        if s is None:
+            s = self._stubs.setdefault(key, stub_cls(pool[idx]))
+        return s
+
+    def warmup(self, addrs, timeout: float = 5.0) -> dict[str, bool]:
+        """Open every pooled connection up front; returns addr -> ready."""
+        ready = {}
+        for addr in addrs:
+            ok = True
+            for ch in self._pool(addr):
+                try:
+                    grpc.channel_ready_future(ch).result(timeout=timeout)
+                except FutureTimeoutError:
+                    ok = False
+            ready[addr] = ok
+            if not ok:
+                log.warning("warmup: backend not ready, will connect lazily", addr=addr, timeout_s=timeout)
+        return ready
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+            self._rr.clear()
+            self._stubs.clear()
+        for pool in pools.values():
+            for ch in pool:
+                ch.close()
+
+
+class AioChannelRegistry(ChannelRegistry):
+    """`ChannelRegistry` over grpc.aio channels, for asyncio callers.
+
+    aio channels belong to the event loop they were created on, so build and
+    warm this registry from inside the serving loop.
+    """
+
+    def __init__(self, pool_size: int = GRPC_POOL_SIZE, options=None,
+                 channel_factory: Callable[..., grpc.aio.Channel] = grpc.aio.insecure_channel):
+        super().__init__(pool_size, options, channel_factory)
+
+    def _open(self, addr: str) -> grpc.aio.Channel:
+        interceptors = tracing.aio_client_interceptors()
+        if interceptors:
+            return self._factory(addr, options=self.options, interceptors=interceptors)
+        return self._factory(addr, options=self.options)
+
+    async def warmup(self, addrs, timeout: float = 5.0) -> dict[str, bool]:
+        async def _ready(ch):
+            try:
+                await asyncio.wait_for(ch.channel_ready(), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+        ready = {}
+        for addr in addrs:
+            results = await asyncio.gather(*(_ready(ch) for ch in self._pool(addr)))
+            ready[addr] = all(results)
+            if not ready[addr]:
+                log.warning("warmup: backend not ready, will connect lazily", addr=addr, timeout_s=timeout)
+        return ready
+
+    async def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+            self._rr.clear()
+            self._stubs.clear()
+        await asyncio.gather(*(ch.close() for pool in pools.values() for ch in pool))
@@ -1,13 +1,283 @@
+import asyncio
 import os
-from pymongo import MongoClient
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
+from pymongo.errors import PyMongoError
+
+from common import tracing
+from common.log import get_logger
+
+log = get_logger("db")
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = os.getenv("DB_NAME", "lastmile")
 
+# Pool sizing. MONGO_*_POOL_SIZE bounds the sockets pymongo keeps per pod;
+# DB_EXECUTOR_WORKERS bounds how many blocking driver calls the async layer
+# runs at once. Keep the executor <= the socket pool so threads never queue
+# inside pymongo waiting for a connection.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "32"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+
 _client = None
+_executor = None
+_async_db = None
 
 def get_db():
     global _client
     if _client is None:
-        _client = MongoClient(MONGO_URI)
+        _client = MongoClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+        )
     return _client[DB_NAME]
+
+def use_client(client):
+    """Serve get_db()/get_async_db() from `client` (e.g. a common.memdb.MemoryClient); returns the previous one."""
+    global _client, _async_db
+    previous, _client, _async_db = _client, client, None
+    return previous
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+    return _executor
+
+
+class AsyncCollection:
+    """Awaitable facade over a pymongo collection.
+
+    Every driver call is pushed onto a bounded thread pool, so a slow query
+    ties up one worker thread instead of the grpc.aio event loop. Method names
+    and arguments are the pymongo ones; `find` is the exception because a
+    cursor is lazy, so it takes `sort`/`limit` and returns a materialized list.
+    The wrapped collection stays reachable as `.sync`.
+    """
+
+    def __init__(self, collection, executor: ThreadPoolExecutor | None = None):
+        self.sync = collection
+        self._executor = executor
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = loop.run_in_executor(self._executor or get_executor(), partial(fn, *args, **kwargs))
+        tracer = tracing.get_tracer()
+        if tracer is None or not tracing.in_trace():
+            return await call
+        # only inside a trace: a root span per background query would just be noise
+        op, coll = getattr(fn, "__name__", "call"), self.sync.name
+        with tracer.start_as_current_span(f"mongo {coll}.{op}", kind=tracing.CLIENT, attributes={
+                "db.system": "mongodb", "db.collection": coll, "db.operation": op}):
+            return await call
+
+    async def find(self, *args, sort=None, limit: int = 0, **kwargs) -> list:
+        def find():
+            cursor = self.sync.find(*args, **kwargs)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        return await self._run(find)
+
+    def __getattr__(self, name):
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await self._run(attr, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+
+class AsyncDatabase:
+    """Database handle whose attributes are `AsyncCollection`s."""
+
+    def __init__(self, db, executor: ThreadPoolExecutor | None = None):
+        self.sync = db
+        self._executor = executor
+        self._collections: dict[str, AsyncCollection] = {}
+
+    def __getattr__(self, name) -> AsyncCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name) -> AsyncCollection:
+        coll = self._collections.get(name)
+        if coll is None:
+            coll = AsyncCollection(getattr(self.sync, name), self._executor)
+            self._collections[name] = coll
+        return coll
+
+def get_async_db() -> AsyncDatabase:
+    global _async_db
+    if _async_db is None:
+        _async_db = AsyncDatabase(get_db())
+    return _async_db
+
+
+# streams being drained by pump_changes, so shutdown can tell its own close from a failure
+_pumped: dict = {}
+
+# how often a service retries a change stream that dropped after it was open
+CHANGE_STREAM_RETRY_SECONDS = float(os.getenv("CHANGE_STREAM_RETRY_SECONDS", "5"))
+
+def pump_changes(stream, on_change, loop: asyncio.AbstractEventLoop, name: str = "changes",
+                 on_end=None) -> threading.Thread:
+    """Drain a pymongo change stream on a daemon thread.
+
+    Each change document is handed to `on_change` on `loop`. Change streams
+    need a replica set; callers open the stream themselves (and handle the
+    OperationFailure a standalone mongod raises) before pumping it. When the
+    stream ends (failover, network error, invalidate) `on_end()` runs on
+    `loop`, so the caller can reopen it and tell its readers changes may
+    have been missed.
+    """
+    def _run():
+        try:
+            with stream:
+                for change in stream:
+                    loop.call_soon_threadsafe(on_change, change)
+            log.warning("change stream closed", stream=name)
+        except PyMongoError as e:
+            log.warning("change stream ended", stream=name, error=e)
+        except RuntimeError:
+            return  # loop closed under us during shutdown
+        if _pumped.pop(stream, None) is not None and on_end is not None:
+            try:
+                loop.call_soon_threadsafe(on_end)
+            except RuntimeError:
+                pass
+
+    t = threading.Thread(target=_run, name=f"{name}-changes", daemon=True)
+    _pumped[stream] = t
+    t.start()
+    return t
+
+
+def close_change_streams():
+    """Close every pumped change stream for shutdown; their `on_end` callbacks do not run."""
+    streams = list(_pumped)
+    _pumped.clear()
+    for stream in streams:
+        try:
+            stream.close()
+        except PyMongoError:
+            pass
+
+
+# PENDING rider requests are deleted by Mongo's TTL monitor this long after their
+# ETA (expire_at = eta + grace, set on insert; see the pending_ttl index)
+RIDER_EXPIRY_GRACE_SECONDS = int(os.getenv("RIDER_EXPIRY_GRACE", "600"))
+
+# How long a TryMatch idempotency key is remembered (match_dedup TTL index)
+MATCH_DEDUP_TTL_SECONDS = int(os.getenv("MATCH_DEDUP_TTL", "600"))
+
+# How long a spilled notification is retried before it is dropped (notification_outbox TTL index)
+OUTBOX_TTL_SECONDS = int(os.getenv("OUTBOX_TTL", "86400"))
+
+# --- Indexes ---
+# Every query on a hot path has an index here. Services apply the entries for
+# the collections they own at startup (ensure_indexes), scripts/init_db.py
+# applies all of them, and `init_db.py --check` explain()s HOT_QUERIES and
+# fails if any of them would scan the whole collection.
+INDEXES: dict[str, list[IndexModel]] = {
+    "rider_requests": [
+        # ListPendingAtStation: equality on station/dest/status, range + sort on eta
+        IndexModel([("station_id", ASCENDING), ("dest_area", ASCENDING),
+                    ("status", ASCENDING), ("eta_unix", ASCENDING)], name="pending_at_station"),
+        # gateway /api/rider/my-requests and trip completion (rider_id $in)
+        IndexModel([("rider_id", ASCENDING), ("eta_unix", DESCENDING)], name="rider_recent"),
+        # expiry: only PENDING requests are reaped; ASSIGNED ones leave the partial index
+        IndexModel([("expire_at", ASCENDING)], name="pending_ttl", expireAfterSeconds=0,
+                   partialFilterExpression={"status": "PENDING"}),
+    ],
+    "users": [
+        IndexModel([("phone", ASCENDING)], name="phone"),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_recent"),
+    ],
+    "trips": [
+        IndexModel([("driver_id", ASCENDING), ("status", ASCENDING)], name="driver_status"),
+    ],
+    "driver_routes": [
+        IndexModel([("driver_id", ASCENDING)], name="driver"),
+    ],
+    "notification_outbox": [
+        # Outbox._drain: claim expired leases, then read back by claim token
+        IndexModel([("lease_until", ASCENDING)], name="lease"),
+        IndexModel([("claim", ASCENDING)], name="claim"),
+        # undeliverable notifications are dropped after a day
+        IndexModel([("created_at", ASCENDING)], name="ttl", expireAfterSeconds=OUTBOX_TTL_SECONDS),
+    ],
+    "match_dedup": [
+        # Mongo's TTL monitor drops keys about a minute after they expire
+        IndexModel([("created_at", ASCENDING)], name="ttl", expireAfterSeconds=MATCH_DEDUP_TTL_SECONDS),
+    ],
+}
+
+# (collection, filter, sort) shaped like the real hot queries; values are placeholders.
+HOT_QUERIES = [
+    ("rider_requests", {"station_id": "S", "dest_area": "A", "status": "PENDING",
+                        "eta_unix": {"$gte": 0, "$lte": 1}}, [("eta_unix", ASCENDING)]),
+    ("rider_requests", {"rider_id": "R"}, [("eta_unix", DESCENDING)]),
+    ("users", {"phone": "P"}, None),
+    ("notifications", {"user_id": "U"}, [("timestamp", DESCENDING)]),
+    ("trips", {"driver_id": "D", "status": {"$nin": ["COMPLETED", "CANCELLED"]}}, None),
+    ("driver_routes", {"driver_id": "D"}, None),
+]
+
+def ensure_indexes(db, collections=None) -> bool:
+    """Create the manifest indexes (idempotent). Returns False if Mongo refused."""
+    ok = True
+    for name, models in INDEXES.items():
+        if collections is not None and name not in collections:
+            continue
+        try:
+            db[name].create_indexes(models)
+        except PyMongoError as e:
+            ok = False
+            log.error("ensure_indexes failed", collection=name, error=e)
+    return ok
+
+def backfill_rider_expiry(db) -> int:
+    """Give PENDING requests written before the TTL index an expire_at; returns how many."""
+    res = db.rider_requests.update_many(
+        {"status": "PENDING", "expire_at": {"$exists": False}},
+        [{"$set": {"expire_at": {"$toDate": {
+            "$multiply": [{"$add": ["$eta_unix", RIDER_EXPIRY_GRACE_SECONDS]}, 1000]}}}}],
+    )
+    return res.modified_count
+
+def plan_stages(plan) -> list[str]:
+    """All stage names in an explain() plan tree, depth first."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for v in plan.values():
+            stages.extend(plan_stages(v))
+    elif isinstance(plan, list):
+        for v in plan:
+            stages.extend(plan_stages(v))
+    return stages
+
+def verify_indexes(db, queries=HOT_QUERIES) -> list[tuple[str, dict]]:
+    """explain() each hot query; returns the ones whose winning plan is a COLLSCAN."""
+    bad = []
+    for name, flt, sort in queries:
+        cursor = db[name].find(flt)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in plan_stages(winning):
+            bad.append((name, flt))
+    return bad
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from common.cache import TTLCache
+from common.log import get_logger
+
+log = get_logger("dedup")
+
+
+class DedupPending(Exception):
+    """Another process claimed the key and hasn't stored its result within the wait."""
+
+
+class DedupStore:
+    """Run a keyed call at most once per `ttl` and replay its result to repeats.
+
+    Results are protobuf messages of `response_cls`. Repeats on this process
+    are answered from memory, and concurrent ones share the first call. That
+    call runs as its own task and finishes even if its caller is cancelled;
+    only `fn` itself failing releases the key. Other processes see the key
+    through `collection` (a Mongo collection with a TTL index on
+    `created_at`). The first caller claims the key with an insert, and the
+    rest wait for its stored result. If Mongo is unreachable, the call still
+    runs with in-memory dedup only.
+    """
+
+    def __init__(self, collection, response_cls, ttl: float = 600, cache_size: int = 10000,
+                 wait_seconds: float = 2.0, poll_seconds: float = 0.05, name: str = "dedup"):
+        self.coll = collection
+        self.response_cls = response_cls
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self.name = name
+        self._cache = TTLCache(cache_size, ttl)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def run(self, key: str, fn: Callable[[], Awaitable]):
+        hit = self._cache.get(key)
+        if hit is not None:
+            return hit
+        task = self._inflight.get(key)
+        if task is None:
+            # its own task, so a caller whose deadline fires (gRPC cancels the
+            # handler) doesn't cancel fn halfway and free the key for a retry
+            task = self._inflight[key] = asyncio.create_task(self._run_once(key, fn))
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here, in case every caller has gone
+
+    async def _run_once(self, key: str, fn):
+        claimed = await self._claim(key)
+        if not claimed:
+            result = await self._wait(key)
+            if result is not None:
+                self._cache.set(key, result)
+                return result
+            # the claimant failed and released the key: run it here
+            return await self._run_once(key, fn)
+
+        try:
+            result = await fn()
+        except BaseException:
+            await self._release(key)
+            raise
+        self._cache.set(key, result)
+        try:
+            await self.coll.update_one({"_id": key}, {"$set": {"result": result.SerializeToString()}})
+        except PyMongoError as e:
+            log.error("storing result failed", store=self.name, key=key, error=e)
+        return result
+
+    async def _claim(self, key: str) -> bool:
+        try:
+            await self.coll.insert_one({"_id": key, "created_at": datetime.now(timezone.utc), "result": None})
+            return True
+        except DuplicateKeyError:
+            return False
+        except PyMongoError as e:
+            log.warning("claim failed, deduping in memory only", store=self.name, key=key, error=e)
+            return True
+
+    async def _release(self, key: str):
+        try:
+            await self.coll.delete_one({"_id": key, "result": None})
+        except PyMongoError as e:
+            log.error("releasing claim failed", store=self.name, key=key, error=e)
+
+    async def _wait(self, key: str):
+        """The stored result, or None if the claim was released; DedupPending on timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_seconds
+        while True:
+            doc = await self.coll.find_one({"_id": key})
+            if doc is None:
+                return None
+            if doc.get("result") is not None:
+                return self.response_cls.FromString(doc["result"])
+            if loop.time() >= deadline:
+                raise DedupPending(key)
+            await asyncio.sleep(self.poll_seconds)
@@ -1,16 +1,121 @@
 import math
 from dataclasses import dataclass
+
+import numpy as np
 @dataclass
 #hi
 class LatLng:
     lat: float
     lon: float
 
+EARTH_RADIUS_M = 6371000
+M_PER_DEG_LAT = math.pi * EARTH_RADIUS_M / 180  # ~111.2 km
+
 def haversine_m(lat1, lon1, lat2, lon2) -> float:
-    R = 6371000
+    R = EARTH_RADIUS_M
     p = math.pi/180
     dlat = (lat2-lat1)*p
     dlon = (lon2-lon1)*p
     a = math.sin(dlat/2)**2 + math.cos(lat1*p)*math.cos(lat2*p)*math.sin(dlon/2)**2
     c = 2*math.atan2(math.sqrt(a), math.sqrt(1-a))
     return R*c
+
+
+# --- Batch distances ---
+# Vectorised haversine over flat lat/lon arrays (degrees). `dtype` picks the
+# working precision: float64 agrees with haversine_m to float rounding,
+# float32 halves memory and is within about a metre at city scale.
+
+def _hav(lat1, lon1, lat2, lon2):
+    p = np.pi / 180
+    dlat = (lat2 - lat1) * p
+    dlon = (lon2 - lon1) * p
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1 * p) * np.cos(lat2 * p) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def haversine_many(lat, lon, lats, lons, dtype=np.float64) -> np.ndarray:
+    """Distance in metres from one point to each of N points, shape (N,)."""
+    lats = np.asarray(lats, dtype=dtype)
+    lons = np.asarray(lons, dtype=dtype)
+    return _hav(dtype(lat), dtype(lon), lats, lons).astype(dtype, copy=False)
+
+def haversine_pairs(lats1, lons1, lats2, lons2, dtype=np.float64) -> np.ndarray:
+    """Element-wise distances in metres between point i of each set, shape (N,)."""
+    return _hav(np.asarray(lats1, dtype=dtype), np.asarray(lons1, dtype=dtype),
+                np.asarray(lats2, dtype=dtype), np.asarray(lons2, dtype=dtype)).astype(dtype, copy=False)
+
+def haversine_matrix(lats1, lons1, lats2, lons2, dtype=np.float64) -> np.ndarray:
+    """All-pairs distances in metres, shape (N, M): row i is point i of the first set."""
+    lats1 = np.asarray(lats1, dtype=dtype)[:, None]
+    lons1 = np.asarray(lons1, dtype=dtype)[:, None]
+    lats2 = np.asarray(lats2, dtype=dtype)[None, :]
+    lons2 = np.asarray(lons2, dtype=dtype)[None, :]
+    return _hav(lats1, lons1, lats2, lons2).astype(dtype, copy=False)
+
+def polyline_segments_m(lats, lons, dtype=np.float64) -> np.ndarray:
+    """Length of each leg of a polyline, shape (N-1,); .sum() is the path length."""
+    lats = np.asarray(lats, dtype=dtype)
+    lons = np.asarray(lons, dtype=dtype)
+    return _hav(lats[:-1], lons[:-1], lats[1:], lons[1:]).astype(dtype, copy=False)
+
+
+class GeoGrid:
+    """Uniform lat/lon grid of named points for radius queries.
+
+    Cells are `cell_m` tall; with cell_m >= the usual query radius a lookup
+    reads a 3x3 block (a few more columns far from the equator), then a
+    bounding-box check, and only the survivors pay for a haversine. Cost per
+    query depends on local density, not on how many points are indexed.
+    """
+
+    def __init__(self, cell_m: float = 500.0):
+        self.cell_deg = cell_m / M_PER_DEG_LAT
+        self._cells: dict[tuple[int, int], dict[str, tuple[float, float]]] = {}
+        self._where: dict[str, tuple[int, int]] = {}
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def insert(self, key: str, lat: float, lon: float):
+        self.remove(key)
+        cell = self._cell(lat, lon)
+        self._cells.setdefault(cell, {})[key] = (lat, lon)
+        self._where[key] = cell
+
+    def remove(self, key: str):
+        cell = self._where.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+
+    def near(self, lat: float, lon: float, radius_m: float) -> list[tuple[str, float]]:
+        """(key, distance_m) for every point within radius_m, nearest first."""
+        dlat = radius_m / M_PER_DEG_LAT
+        coslat = max(math.cos(math.radians(lat)), 1e-6)
+        dlon = dlat / coslat
+        r0, c0 = self._cell(lat - dlat, lon - dlon)
+        r1, c1 = self._cell(lat + dlat, lon + dlon)
+
+        out = []
+        for r in range(r0, r1 + 1):
+            for c in range(c0, c1 + 1):
+                bucket = self._cells.get((r, c))
+                if not bucket:
+                    continue
+                for key, (plat, plon) in bucket.items():
+                    if abs(plat - lat) > dlat or abs(plon - lon) > dlon:
+                        continue
+                    d = haversine_m(lat, lon, plat, plon)
+                    if d <= radius_m:
+                        out.append((key, d))
+        out.sort(key=lambda kd: kd[1])
+        return out
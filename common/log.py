@@ -0,0 +1,161 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+from google.protobuf.message import Message
+
+# LOG_LEVEL applies to every logger; LOG_LEVEL_<NAME> (e.g. LOG_LEVEL_RIDER=DEBUG) overrides it for one
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (one object per line, what Filebeat/Logstash parse) or "text" for a terminal
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# fraction of `sampled` (hot-path) records that are kept
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+# records waiting for the writer thread; past this they are dropped rather than block the loop
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_listener: logging.handlers.QueueListener | None = None
+_handler: "_DroppingQueueHandler | None" = None
+
+
+def _value(v):
+    if isinstance(v, Message):
+        # str() is the C implementation; text_format's one-line mode is pure Python and ~10x slower
+        return " ".join(str(v).split("\n")).strip()
+    return v
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, plus the record's fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for k, v in getattr(record, "fields", {}).items():
+            out[k] = _value(v)
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """`[name] msg k=v ...`, close to the old print() lines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={_value(v)}" for k, v in getattr(record, "fields", {}).items())
+        line = f"[{record.name}] {record.getMessage()}" + (f" {fields}" if fields else "")
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread as they are: formatting happens there, not on the event loop."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure(stream=None, fmt: str | None = None, level: str | None = None, queue_size: int | None = None):
+    """Route all logging through a bounded queue to one writer thread (idempotent unless arguments are given)."""
+    global _listener, _handler
+    if _listener is not None and stream is None and fmt is None and level is None:
+        return
+    shutdown()
+    out = logging.StreamHandler(stream or sys.stdout)
+    out.setFormatter(TextFormatter() if (fmt or LOG_FORMAT) == "text" else JsonFormatter())
+    _handler = _DroppingQueueHandler(queue.Queue(queue_size or LOG_QUEUE_SIZE))
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(level or LOG_LEVEL)
+    _listener = logging.handlers.QueueListener(_handler.queue, out)
+    _listener.start()
+
+
+def shutdown():
+    """Flush what is queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+atexit.register(shutdown)
+
+# records never print thread/process names, so don't collect them
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+class Logger:
+    """Structured logger: `log.info("msg", key=value, ...)`.
+
+    Level checks happen before anything is built, so a disabled `debug` call
+    costs one method call whatever its arguments are. Values (protobuf
+    messages included) are only formatted on the writer thread. `sampled`
+    keeps one in 1/rate records, for calls on per-request hot paths.
+    """
+
+    def __init__(self, name: str, sample_rate: float = LOG_SAMPLE_RATE):
+        self.name = name
+        self._log = logging.getLogger(name)
+        override = os.getenv(f"LOG_LEVEL_{name.upper().replace('-', '_')}")
+        if override:
+            self._log.setLevel(override.upper())
+        self.sample_rate = sample_rate
+
+    def _emit(self, level: int, msg: str, fields: dict, exc_info=None):
+        if self._log.isEnabledFor(level):
+            # straight to makeRecord/handle: Logger.log would also walk the stack for a caller we don't print
+            if exc_info:
+                exc_info = sys.exc_info()
+            record = self._log.makeRecord(self.name, level, "", 0, msg, (), exc_info, extra={"fields": fields})
+            self._log.handle(record)
+
+    def debug(self, msg: str, **fields):
+        self._emit(logging.DEBUG, msg, fields)
+
+    def info(self, msg: str, **fields):
+        self._emit(logging.INFO, msg, fields)
+
+    def warning(self, msg: str, **fields):
+        self._emit(logging.WARNING, msg, fields)
+
+    def error(self, msg: str, **fields):
+        self._emit(logging.ERROR, msg, fields)
+
+    def exception(self, msg: str, **fields):
+        self._emit(logging.ERROR, msg, fields, exc_info=True)
+
+    def sampled(self, msg: str, level: int = logging.INFO, **fields):
+        if self._log.isEnabledFor(level) and random.random() < self.sample_rate:
+            fields["sample_rate"] = self.sample_rate
+            self._emit(level, msg, fields)
+
+
+def get_logger(name: str) -> Logger:
+    configure()
+    return Logger(name)
@@ -0,0 +1,729 @@
+import itertools
+import math
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+# In-memory stand-in for the part of pymongo the services use, so the whole
+# stack can run in one process without a mongod (see common/stack.py).
+#
+# Covered: find/find_one (filter, projection, sort, skip, limit), insert_*,
+# update_* / replace_one (upsert), find_one_and_*, delete_*, count_documents,
+# create_indexes (unique and TTL indexes are honoured, TTL via `expire()`),
+# and watch(), whose change events look like a replica set's. Query operators:
+# $eq $ne $gt $gte $lt $lte $in $nin $exists $and $or $nor. Update operators:
+# $set $unset $inc $mul $min $max $push $addToSet $pull $pullAll $setOnInsert,
+# plus pipeline updates with $set/$unset and the $add/$subtract/$multiply/
+# $min/$max/$toDate expressions. Anything else raises NotImplementedError
+# rather than quietly doing the wrong thing.
+
+_MISSING = object()
+_CLOSED = object()
+
+
+def _copy(v):
+    # documents hold dicts, lists and immutable scalars (ObjectId, datetime, bytes, ...)
+    if isinstance(v, dict):
+        return {k: _copy(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_copy(x) for x in v]
+    return v
+
+
+def _utc(v):
+    # pymongo hands back naive UTC datetimes; compare them with aware ones as Mongo would
+    if isinstance(v, datetime) and v.tzinfo is None:
+        return v.replace(tzinfo=timezone.utc)
+    return v
+
+
+def _get(doc, path: str):
+    cur = doc
+    for part in path.split("."):
+        if isinstance(cur, dict):
+            cur = cur.get(part, _MISSING)
+        elif isinstance(cur, list) and part.isdigit() and int(part) < len(cur):
+            cur = cur[int(part)]
+        else:
+            return _MISSING
+        if cur is _MISSING:
+            return _MISSING
+    return cur
+
+
+def _set(doc: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset(doc: dict, path: str):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+# --- queries ---
+
+def _same(a, b) -> bool:
+    return _utc(a) == _utc(b)
+
+
+def _eq(value, target) -> bool:
+    if value is _MISSING:
+        return target is None
+    if isinstance(value, list) and not isinstance(target, list):
+        return any(_same(v, target) for v in value)
+    return _same(value, target)
+
+
+def _compare(check):
+    def op(value, arg):
+        for v in (value if isinstance(value, list) else [value]):
+            if v is _MISSING or v is None:
+                continue
+            try:
+                if check(_utc(v), _utc(arg)):
+                    return True
+            except TypeError:
+                pass  # different BSON types never compare in a filter
+        return False
+    return op
+
+
+_QUERY_OPS = {
+    "$eq": _eq,
+    "$ne": lambda v, a: not _eq(v, a),
+    "$gt": _compare(lambda v, a: v > a),
+    "$gte": _compare(lambda v, a: v >= a),
+    "$lt": _compare(lambda v, a: v < a),
+    "$lte": _compare(lambda v, a: v <= a),
+    "$in": lambda v, a: any(_eq(v, x) for x in a),
+    "$nin": lambda v, a: not any(_eq(v, x) for x in a),
+    "$exists": lambda v, a: (v is not _MISSING) == bool(a),
+}
+
+
+def _is_ops(cond) -> bool:
+    return isinstance(cond, dict) and bool(cond) and all(k.startswith("$") for k in cond)
+
+
+def matches(doc: dict, flt: dict | None) -> bool:
+    """Whether `doc` satisfies the query filter `flt`."""
+    for key, cond in (flt or {}).items():
+        if key == "$and":
+            ok = all(matches(doc, f) for f in cond)
+        elif key == "$or":
+            ok = any(matches(doc, f) for f in cond)
+        elif key == "$nor":
+            ok = not any(matches(doc, f) for f in cond)
+        elif key.startswith("$"):
+            raise NotImplementedError(f"memdb: query operator {key}")
+        elif _is_ops(cond):
+            value = _get(doc, key)
+            try:
+                ok = all(_QUERY_OPS[op](value, arg) for op, arg in cond.items())
+            except KeyError as e:
+                raise NotImplementedError(f"memdb: query operator {e.args[0]}") from None
+        else:
+            ok = _eq(_get(doc, key), cond)
+        if not ok:
+            return False
+    return True
+
+
+def _sort_key(v):
+    # BSON order for the types we store: missing/null < numbers < strings < objects < ObjectId < bool < dates
+    v = _utc(v)
+    if v is _MISSING or v is None:
+        return (0, 0)
+    if isinstance(v, bool):
+        return (6, v)
+    if isinstance(v, (int, float)):
+        return (1, v)
+    if isinstance(v, str):
+        return (2, v)
+    if isinstance(v, ObjectId):
+        return (5, v.binary)
+    if isinstance(v, datetime):
+        return (7, v)
+    return (3, repr(v))
+
+
+def _sorted(docs: list, spec) -> list:
+    for key, direction in reversed(spec):
+        docs.sort(key=lambda d: _sort_key(_get(d, key)), reverse=direction < 0)
+    return docs
+
+
+def _sort_spec(key_or_list, direction=None) -> list[tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    return [(k, d) for k, d in key_or_list]
+
+
+def _project(doc: dict, projection) -> dict:
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {k: 1 for k in projection}
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(fields.values()):
+        out = {}
+        for k in fields:
+            v = _get(doc, k)
+            if v is not _MISSING:
+                _set(out, k, v)
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    if any(fields.values()):
+        raise OperationFailure("Cannot do inclusion on field in exclusion projection")
+    out = doc
+    for k in projection:
+        if not projection[k]:
+            _unset(out, k)
+    return out
+
+
+# --- updates ---
+
+def _null(*args) -> bool:
+    return any(a is None for a in args)
+
+
+_EXPRESSIONS = {
+    "$add": lambda *a: None if _null(*a) else sum(a),
+    "$subtract": lambda a, b: None if _null(a, b) else a - b,
+    "$multiply": lambda *a: None if _null(*a) else math.prod(a),
+    "$min": lambda *a: min((x for x in a if x is not None), default=None),
+    "$max": lambda *a: max((x for x in a if x is not None), default=None),
+    "$toDate": lambda ms: None if ms is None else datetime.fromtimestamp(ms / 1000, tz=timezone.utc),
+}
+
+
+def _expr(doc, e):
+    if isinstance(e, str) and e.startswith("$"):
+        v = _get(doc, e[1:])
+        return None if v is _MISSING else v
+    if isinstance(e, dict) and len(e) == 1 and next(iter(e)).startswith("$"):
+        op, args = next(iter(e.items()))
+        if op == "$literal":
+            return args
+        fn = _EXPRESSIONS.get(op)
+        if fn is None:
+            raise NotImplementedError(f"memdb: expression {op}")
+        return fn(*(_expr(doc, a) for a in (args if isinstance(args, list) else [args])))
+    if isinstance(e, dict):
+        return {k: _expr(doc, v) for k, v in e.items()}
+    if isinstance(e, list):
+        return [_expr(doc, v) for v in e]
+    return e
+
+
+def _each(spec):
+    return spec["$each"] if isinstance(spec, dict) and "$each" in spec else [spec]
+
+
+def _update_field(doc, path, fn):
+    v = _get(doc, path)
+    _set(doc, path, fn(None if v is _MISSING else v))
+
+
+def _add_to_set(cur: list, items: list) -> list:
+    out = list(cur)
+    for x in items:
+        if x not in out:
+            out.append(x)
+    return out
+
+
+def _pull(doc, path, cond):
+    v = _get(doc, path)
+    if not isinstance(v, list):
+        return
+    if isinstance(cond, dict) and not _is_ops(cond):
+        keep = [x for x in v if not (isinstance(x, dict) and matches(x, cond))]
+    else:
+        keep = [x for x in v if not matches({"v": x}, {"v": cond})]
+    _set(doc, path, keep)
+
+
+_UPDATES = {
+    "$set": lambda doc, k, v: _set(doc, k, _copy(v)),
+    "$unset": lambda doc, k, v: _unset(doc, k),
+    "$inc": lambda doc, k, v: _update_field(doc, k, lambda cur: (cur or 0) + v),
+    "$mul": lambda doc, k, v: _update_field(doc, k, lambda cur: (cur or 0) * v),
+    "$min": lambda doc, k, v: _update_field(doc, k, lambda cur: v if cur is None or _utc(v) < _utc(cur) else cur),
+    "$max": lambda doc, k, v: _update_field(doc, k, lambda cur: v if cur is None or _utc(v) > _utc(cur) else cur),
+    "$push": lambda doc, k, v: _update_field(doc, k, lambda cur: (cur or []) + _copy(_each(v))),
+    "$addToSet": lambda doc, k, v: _update_field(doc, k, lambda cur: _add_to_set(cur or [], _copy(_each(v)))),
+    "$pull": _pull,
+    "$pullAll": lambda doc, k, v: _update_field(doc, k, lambda cur: [x for x in (cur or []) if x not in v]),
+}
+
+
+def apply_update(doc: dict, update, inserting: bool = False):
+    """Apply an update document or pipeline to `doc` in place."""
+    if isinstance(update, list):
+        for stage in update:
+            for op, spec in stage.items():
+                if op in ("$set", "$addFields"):
+                    values = {k: _expr(doc, e) for k, e in spec.items()}
+                    for k, v in values.items():
+                        _set(doc, k, v)
+                elif op == "$unset":
+                    for k in ([spec] if isinstance(spec, str) else spec):
+                        _unset(doc, k)
+                else:
+                    raise NotImplementedError(f"memdb: pipeline stage {op}")
+        return
+    for op, spec in update.items():
+        if op == "$setOnInsert":
+            if inserting:
+                for k, v in spec.items():
+                    _set(doc, k, _copy(v))
+            continue
+        fn = _UPDATES.get(op)
+        if fn is None:
+            raise NotImplementedError(f"memdb: update operator {op}")
+        for k, v in spec.items():
+            fn(doc, k, v)
+
+
+def _upsert_seed(flt: dict) -> dict:
+    """The new document an upsert starts from: the filter's equality conditions."""
+    doc = {}
+    for k, v in (flt or {}).items():
+        if k.startswith("$"):
+            continue
+        if _is_ops(v):
+            if "$eq" in v:
+                _set(doc, k, _copy(v["$eq"]))
+        else:
+            _set(doc, k, _copy(v))
+    return doc
+
+
+class MemoryCursor:
+    """The pymongo Cursor methods the services use; evaluated on first iteration."""
+
+    def __init__(self, coll: "MemoryCollection", flt, projection):
+        self._coll = coll
+        self._filter = flt
+        self._projection = projection
+        self._sort: list = []
+        self._skip = 0
+        self._limit = 0
+        self._it = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, n: int):
+        self._skip = n
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._it is None:
+            self._it = iter(self._coll._select(self._filter, self._projection, self._sort, self._skip, self._limit))
+        return next(self._it)
+
+    next = __next__
+
+    def close(self):
+        self._it = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryChangeStream:
+    """Blocking iterator over a collection's change events, shaped like pymongo's ChangeStream."""
+
+    def __init__(self, coll: "MemoryCollection", pipeline, full_document):
+        self._coll = coll
+        self._queue: queue.Queue = queue.Queue()
+        self._filters = []
+        for stage in pipeline or []:
+            if set(stage) != {"$match"}:
+                raise NotImplementedError(f"memdb: change stream stage {next(iter(stage))}")
+            self._filters.append(stage["$match"])
+        self.full_document = full_document
+        self.alive = True
+
+    def _push(self, event: dict):
+        if all(matches(event, f) for f in self._filters):
+            self._queue.put(event)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.alive:
+            raise StopIteration
+        event = self._queue.get()
+        if event is _CLOSED:
+            self.alive = False
+            raise StopIteration
+        return event
+
+    next = __next__
+
+    def try_next(self):
+        try:
+            event = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        if event is _CLOSED:
+            self.alive = False
+            return None
+        return event
+
+    def close(self):
+        if self.alive:
+            self._coll._unwatch(self)
+            self._queue.put(_CLOSED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryCollection:
+    """A pymongo Collection over a dict, safe to call from several threads (AsyncCollection's executor)."""
+
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+        self._docs: dict = {}
+        self._lock = threading.RLock()
+        self._indexes: dict[str, dict] = {"_id_": {"key": [("_id", 1)], "unique": True}}
+        self._streams: list[MemoryChangeStream] = []
+
+    # --- reads ---
+
+    def _select(self, flt, projection=None, sort=None, skip: int = 0, limit: int = 0) -> list[dict]:
+        with self._lock:
+            docs = [d for d in self._docs.values() if matches(d, flt)]
+            if sort:
+                docs = _sorted(docs, sort)
+            docs = docs[skip:skip + limit] if limit else docs[skip:]
+            return [_project(_copy(d), projection) for d in docs]
+
+    def find(self, filter=None, projection=None, sort=None, skip: int = 0, limit: int = 0, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self, filter, projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        docs = self._select(filter, projection, _sort_spec(sort) if sort else None, limit=1)
+        return docs[0] if docs else None
+
+    def count_documents(self, filter, **kwargs) -> int:
+        with self._lock:
+            return sum(1 for d in self._docs.values() if matches(d, filter))
+
+    def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    # --- writes ---
+
+    def _check_unique(self, doc: dict, replacing=_MISSING):
+        for name, spec in self._indexes.items():
+            if not spec.get("unique") or name == "_id_":
+                continue
+            key = tuple(_get(doc, k) for k, _ in spec["key"])
+            for other_id, other in self._docs.items():
+                if other_id != replacing and tuple(_get(other, k) for k, _ in spec["key"]) == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} index: {name}",
+                                            11000)
+
+    def _insert(self, doc: dict):
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} index: _id_ "
+                                    f"dup key: {{ _id: {doc['_id']!r} }}", 11000)
+        self._check_unique(doc)
+        stored = _copy(doc)
+        self._docs[doc["_id"]] = stored
+        self._emit("insert", stored)
+
+    def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        with self._lock:
+            self._insert(document)
+        return InsertOneResult(document["_id"], True)
+
+    def insert_many(self, documents, ordered: bool = True, **kwargs) -> InsertManyResult:
+        ids = []
+        with self._lock:
+            for doc in documents:
+                self._insert(doc)
+                ids.append(doc["_id"])
+        return InsertManyResult(ids, True)
+
+    def _write(self, doc: dict, new: dict):
+        if new.get("_id") != doc["_id"]:
+            raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'")
+        self._check_unique(new, replacing=doc["_id"])
+        self._docs[doc["_id"]] = new
+
+    def _update(self, flt, update, upsert: bool, many: bool, sort=None):
+        """Returns (matched, modified, upserted_id, before, after) for the first/only touched doc."""
+        matched = modified = 0
+        before = after = upserted = None
+        candidates = [d for d in self._docs.values() if matches(d, flt)]
+        if sort:
+            candidates = _sorted(candidates, sort)
+        for doc in candidates if many else candidates[:1]:
+            matched += 1
+            new = _copy(doc)
+            apply_update(new, update)
+            if before is None:
+                before, after = doc, new
+            if new != doc:
+                self._write(doc, new)
+                modified += 1
+                self._emit("update", new)
+        if not matched and upsert:
+            new = _upsert_seed(flt)
+            apply_update(new, update, inserting=True)
+            self._insert(new)
+            upserted, after = new["_id"], self._docs[new["_id"]]
+        return matched, modified, upserted, before, after
+
+    def _update_result(self, matched, modified, upserted) -> UpdateResult:
+        raw = {"n": matched or (1 if upserted is not None else 0), "nModified": modified}
+        if upserted is not None:
+            raw["upserted"] = upserted
+        return UpdateResult(raw, True)
+
+    def update_one(self, filter, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        with self._lock:
+            matched, modified, upserted, _, _ = self._update(filter, update, upsert, many=False)
+        return self._update_result(matched, modified, upserted)
+
+    def update_many(self, filter, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        with self._lock:
+            matched, modified, upserted, _, _ = self._update(filter, update, upsert, many=True)
+        return self._update_result(matched, modified, upserted)
+
+    def replace_one(self, filter, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        if any(k.startswith("$") for k in replacement):
+            raise ValueError("replacement can not include $ operators")
+        with self._lock:
+            for doc in self._docs.values():
+                if matches(doc, filter):
+                    new = _copy(replacement)
+                    new.setdefault("_id", doc["_id"])
+                    modified = int(new != doc)
+                    if modified:
+                        self._write(doc, new)
+                        self._emit("replace", new)
+                    return self._update_result(1, modified, None)
+            if not upsert:
+                return self._update_result(0, 0, None)
+            new = {**_upsert_seed(filter), **_copy(replacement)}
+            self._insert(new)
+            return self._update_result(0, 0, new["_id"])
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert: bool = False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        with self._lock:
+            _, _, _, before, after = self._update(filter, update, upsert, many=False,
+                                                  sort=_sort_spec(sort) if sort else None)
+            doc = after if return_document else before
+            return None if doc is None else _project(_copy(doc), projection)
+
+    def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        with self._lock:
+            docs = self._select(filter, None, _sort_spec(sort) if sort else None, limit=1)
+            if not docs:
+                return None
+            self._delete(docs[0]["_id"])
+            return _project(docs[0], projection)
+
+    def _delete(self, _id):
+        self._docs.pop(_id, None)
+        self._emit("delete", None, _id)
+
+    def delete_one(self, filter, **kwargs) -> DeleteResult:
+        with self._lock:
+            for _id, doc in self._docs.items():
+                if matches(doc, filter):
+                    self._delete(_id)
+                    return DeleteResult({"n": 1}, True)
+        return DeleteResult({"n": 0}, True)
+
+    def delete_many(self, filter, **kwargs) -> DeleteResult:
+        with self._lock:
+            ids = [_id for _id, doc in self._docs.items() if matches(doc, filter)]
+            for _id in ids:
+                self._delete(_id)
+        return DeleteResult({"n": len(ids)}, True)
+
+    def drop(self, **kwargs):
+        with self._lock:
+            self._docs.clear()
+
+    # --- indexes ---
+
+    def create_indexes(self, indexes, **kwargs) -> list[str]:
+        names = []
+        with self._lock:
+            for model in indexes:
+                spec = dict(model.document)
+                spec["key"] = list(spec["key"].items())
+                self._indexes[spec["name"]] = spec
+                names.append(spec["name"])
+        return names
+
+    def create_index(self, keys, **kwargs) -> str:
+        from pymongo import IndexModel
+        return self.create_indexes([IndexModel(keys, **kwargs)])[0]
+
+    def index_information(self) -> dict:
+        return {name: dict(spec) for name, spec in self._indexes.items()}
+
+    def expire(self, now: datetime | None = None) -> int:
+        """Delete what Mongo's TTL monitor would have by `now`; returns how many."""
+        now = now or datetime.now(timezone.utc)
+        n = 0
+        with self._lock:
+            for spec in list(self._indexes.values()):
+                ttl = spec.get("expireAfterSeconds")
+                if ttl is None:
+                    continue
+                field, partial = spec["key"][0][0], spec.get("partialFilterExpression")
+                for _id, doc in list(self._docs.items()):
+                    v = _get(doc, field)
+                    dates = [_utc(x) for x in (v if isinstance(v, list) else [v]) if isinstance(x, datetime)]
+                    if dates and min(dates).timestamp() + ttl <= now.timestamp() and matches(doc, partial):
+                        self._delete(_id)
+                        n += 1
+        return n
+
+    # --- change streams ---
+
+    def watch(self, pipeline=None, full_document: str | None = None, **kwargs) -> MemoryChangeStream:
+        if not self.database.client.change_streams:
+            raise OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+        stream = MemoryChangeStream(self, pipeline, full_document)
+        with self._lock:
+            self._streams.append(stream)
+        return stream
+
+    def _unwatch(self, stream: MemoryChangeStream):
+        with self._lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+
+    def _emit(self, op: str, doc: dict | None, _id=_MISSING):
+        if not self._streams:
+            return
+        key = doc["_id"] if doc is not None else _id
+        token = next(self.database.client._tokens)
+        for stream in self._streams:
+            event = {
+                "_id": {"_data": f"{token:016x}"},
+                "operationType": op,
+                "clusterTime": time.time(),
+                "ns": {"db": self.database.name, "coll": self.name},
+                "documentKey": {"_id": key},
+            }
+            if op in ("insert", "replace") or (op == "update" and stream.full_document == "updateLookup"):
+                event["fullDocument"] = _copy(doc)
+            stream._push(event)
+
+    def _close_streams(self):
+        for stream in list(self._streams):
+            stream.close()
+
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: dict[str, MemoryCollection] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name) -> MemoryCollection:
+        coll = self._collections.get(name)
+        if coll is None:
+            with self._lock:
+                coll = self._collections.setdefault(name, MemoryCollection(self, name))
+        return coll
+
+    def get_collection(self, name, **kwargs) -> MemoryCollection:
+        return self[name]
+
+    def list_collection_names(self, **kwargs) -> list[str]:
+        return [n for n, c in self._collections.items() if c._docs]
+
+    def drop_collection(self, name, **kwargs):
+        self[name].drop()
+
+
+class MemoryClient:
+    """Drop-in for MongoClient: `client[db_name][collection]`, all in this process.
+
+    `change_streams=False` behaves like a standalone mongod, whose watch() fails.
+    """
+
+    def __init__(self, change_streams: bool = True):
+        self.change_streams = change_streams
+        self._databases: dict[str, MemoryDatabase] = {}
+        self._tokens = itertools.count(1)
+
+    def __getitem__(self, name) -> MemoryDatabase:
+        db = self._databases.get(name)
+        if db is None:
+            db = self._databases.setdefault(name, MemoryDatabase(self, name))
+        return db
+
+    def get_database(self, name, **kwargs) -> MemoryDatabase:
+        return self[name]
+
+    def expire(self, now: datetime | None = None) -> int:
+        """One pass of the TTL monitor over every collection."""
+        return sum(c.expire(now) for db in list(self._databases.values())
+                   for c in list(db._collections.values()))
+
+    def close(self):
+        """End every open change stream (their pump threads then exit)."""
+        for db in self._databases.values():
+            for coll in db._collections.values():
+                coll._close_streams()
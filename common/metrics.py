@@ -0,0 +1,30 @@
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, start_http_server
+
+from common.log import get_logger
+
+log = get_logger("metrics")
+
+# Port each pod serves Prometheus metrics on (GET /metrics); 0 turns it off
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# seconds; spans a cache hit up to a slow cross-service chain
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def start_metrics_server(port: int = METRICS_PORT, registry: CollectorRegistry = REGISTRY,
+                         host: str = "0.0.0.0"):
+    """Serve `registry` at GET /metrics on `port` from prometheus_client's background thread.
+
+    Returns the HTTP server, or None if the port can't be bound (several
+    services on one host all default to 9100); the service keeps running
+    without the endpoint.
+    """
+    try:
+        server, _ = start_http_server(port, host, registry)
+    except OSError as e:
+        log.error("metrics endpoint disabled, port unavailable", port=port, error=e)
+        return None
+    log.info("serving metrics", port=server.server_port)
+    return server
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from pymongo.errors import PyMongoError
+
+from common.log import get_logger
+
+log = get_logger("outbox")
+
+# How long the worker waits after the first queued message before sending, so
+# a burst (a batch match, a mass trip completion) goes out as one call
+OUTBOX_WINDOW_MS = float(os.getenv("OUTBOX_WINDOW_MS", "50"))
+OUTBOX_MAX_BATCH = int(os.getenv("OUTBOX_MAX_BATCH", "500"))
+# messages held in memory before the rest spill to Mongo
+OUTBOX_MAX_BUFFER = int(os.getenv("OUTBOX_MAX_BUFFER", "10000"))
+OUTBOX_RETRY_SECONDS = float(os.getenv("OUTBOX_RETRY_SECONDS", "1"))
+OUTBOX_MAX_RETRY_SECONDS = float(os.getenv("OUTBOX_MAX_RETRY_SECONDS", "30"))
+# how often a replica looks for spilled messages it didn't write (e.g. left
+# by a pod that was scaled away), and how long a claim on them lasts
+OUTBOX_DRAIN_SECONDS = float(os.getenv("OUTBOX_DRAIN_SECONDS", "60"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "30"))
+
+
+class Outbox:
+    """Fire-and-forget queue of protobuf messages, sent in batches by a background worker.
+
+    `put` appends and returns at once. After the first put the worker waits
+    `window` seconds, then hands up to `max_batch` messages at a time to
+    `send(batch)`. When a send fails, everything still in memory is spilled to
+    `collection` (documents with a TTL index on `created_at`) so it survives a
+    restart. The worker then retries from there with exponential backoff.
+    Messages beyond `max_buffer` in memory are spilled the same way. Spilled
+    messages are claimed with a lease, so only one replica sends them. Delivery
+    is at least once.
+    """
+
+    def __init__(self, send: Callable[[list], Awaitable], collection, message_cls,
+                 window: float = OUTBOX_WINDOW_MS / 1000, max_batch: int = OUTBOX_MAX_BATCH,
+                 max_buffer: int = OUTBOX_MAX_BUFFER, retry_seconds: float = OUTBOX_RETRY_SECONDS,
+                 max_retry_seconds: float = OUTBOX_MAX_RETRY_SECONDS,
+                 drain_seconds: float = OUTBOX_DRAIN_SECONDS, lease_seconds: float = OUTBOX_LEASE_SECONDS,
+                 name: str = "outbox"):
+        self.send = send
+        self.coll = collection
+        self.message_cls = message_cls
+        self.window = window
+        self.max_batch = max_batch
+        self.max_buffer = max_buffer
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.drain_seconds = drain_seconds
+        self.lease_seconds = lease_seconds
+        self.name = name
+        self._queue: deque = deque()
+        self._wakeup = asyncio.Event()
+        # look in Mongo once at start for anything a previous process left behind
+        self._spilled = True
+        self._failures = 0
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+        self.spilled = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, msg):
+        self._queue.append(msg)
+        self._wakeup.set()
+
+    def start(self):
+        """Begin delivering; call from the serving loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the worker and spill whatever is still queued, for another replica (or the next start) to send."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._queue:
+            msgs = list(self._queue)
+            self._queue.clear()
+            await self._spill(msgs)
+            if self._queue:
+                log.error("messages lost on shutdown", outbox=self.name, n=len(self._queue))
+            else:
+                log.info("spilled on shutdown", outbox=self.name, n=len(msgs))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.drain_seconds)
+            except asyncio.TimeoutError:
+                self._spilled = True
+            self._wakeup.clear()
+            if self._queue:
+                await asyncio.sleep(self.window)
+            if await self.flush():
+                self._failures = 0
+                continue
+            self._failures += 1
+            await asyncio.sleep(min(self.retry_seconds * 2 ** (self._failures - 1), self.max_retry_seconds))
+            self._wakeup.set()
+
+    async def flush(self) -> bool:
+        """Send everything queued in memory, then anything spilled; False if a send failed."""
+        if len(self._queue) > self.max_buffer:
+            overflow = [self._queue.pop() for _ in range(len(self._queue) - self.max_buffer)]
+            await self._spill(overflow[::-1])
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            try:
+                await self.send(batch)
+            except asyncio.CancelledError:
+                # stopped mid-send (close()): keep the batch; delivery is at least once anyway
+                self._queue.extendleft(reversed(batch))
+                raise
+            except Exception as e:
+                log.warning("send failed, spilling", outbox=self.name, batch=len(batch),
+                            spilled=len(batch) + len(self._queue), error=e)
+                batch.extend(self._queue)
+                self._queue.clear()
+                await self._spill(batch)
+                return False
+            self.sent += len(batch)
+        if self._spilled:
+            return await self._drain()
+        return True
+
+    async def _spill(self, msgs: list):
+        now = datetime.now(timezone.utc)
+        docs = [{"msg": m.SerializeToString(), "created_at": now, "lease_until": now} for m in msgs]
+        try:
+            await self.coll.insert_many(docs)
+        except PyMongoError as e:
+            # nowhere durable to put them: keep them in memory and try again later
+            log.error("spill failed, keeping messages in memory", outbox=self.name, n=len(msgs), error=e)
+            self._queue.extendleft(reversed(msgs))
+            return
+        self._spilled = True
+        self.spilled += len(msgs)
+
+    async def _drain(self) -> bool:
+        """Claim the spilled messages whose lease is up and send them; True once none are left."""
+        now = datetime.now(timezone.utc)
+        token = uuid.uuid4().hex
+        try:
+            await self.coll.update_many(
+                {"lease_until": {"$lte": now}},
+                {"$set": {"lease_until": now + timedelta(seconds=self.lease_seconds), "claim": token}}
+            )
+            while True:
+                docs = await self.coll.find({"claim": token}, limit=self.max_batch)
+                if not docs:
+                    break
+                await self.send([self.message_cls.FromString(d["msg"]) for d in docs])
+                self.sent += len(docs)
+                await self.coll.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        except Exception as e:
+            log.warning("draining spilled messages failed", outbox=self.name, error=e)
+            try:
+                # give back the claim so the next retry doesn't wait out the lease
+                await self.coll.update_many({"claim": token}, {"$set": {"lease_until": now}})
+            except PyMongoError:
+                pass  # then they are retried once the lease runs out
+            return False
+        self._spilled = False
+        return True
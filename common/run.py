@@ -1,15 +1,206 @@
 import asyncio
+import os
+import signal
+import time
 import grpc
-from typing import Callable
+from functools import partial
+from typing import Awaitable, Callable
+
+from opentelemetry import trace
+from prometheus_client import Counter, Gauge, Histogram
+
+from common import tracing
+from common.log import get_logger
+from common.metrics import LATENCY_BUCKETS, METRICS_PORT, start_metrics_server
+
+log = get_logger("grpc")
+
+# how long in-flight RPCs get to finish after SIGTERM (k8s allows 30 s by default)
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "10"))
+
+# run once the server has stopped, in reverse order of registration
+_shutdown_hooks: list[Callable[[], Awaitable]] = []
+
+# grpc_server_* names and labels follow go-grpc-prometheus, so stock dashboards work
+_LABELS = ("grpc_type", "grpc_service", "grpc_method")
+RPC_STARTED = Counter("grpc_server_started_total", "RPCs started on the server.", _LABELS)
+RPC_HANDLED = Counter(
+    "grpc_server_handled_total", "RPCs completed on the server, by status code.", _LABELS + ("grpc_code",))
+RPC_IN_FLIGHT = Gauge("grpc_server_in_flight", "RPCs currently being handled.", _LABELS)
+RPC_SECONDS = Histogram(
+    "grpc_server_handling_seconds", "Time from receiving an RPC to its last response (whole stream for streams).",
+    _LABELS, buckets=LATENCY_BUCKETS)
+
+
+def _code(context, error: BaseException | None) -> str:
+    # abort() and set_code() leave the status on the context; anything else that escapes is UNKNOWN
+    code = None
+    try:
+        code = context.code()
+    except Exception:
+        pass
+    if isinstance(code, grpc.StatusCode):
+        return code.name
+    if isinstance(error, asyncio.CancelledError):
+        return grpc.StatusCode.CANCELLED.name
+    return grpc.StatusCode.UNKNOWN.name if error is not None else grpc.StatusCode.OK.name
+
+
+def _rewrap(handler, unary, stream, service: str, method: str):
+    """The same RPC handler with its behavior passed through `unary(behavior, kind, ...)` or `stream(...)`."""
+    if handler.unary_unary:
+        make, wrap, behavior, kind = grpc.unary_unary_rpc_method_handler, unary, handler.unary_unary, "unary"
+    elif handler.stream_unary:
+        make, wrap, behavior, kind = grpc.stream_unary_rpc_method_handler, unary, handler.stream_unary, "client_stream"
+    elif handler.unary_stream:
+        make, wrap, behavior, kind = grpc.unary_stream_rpc_method_handler, stream, handler.unary_stream, "server_stream"
+    else:
+        make, wrap, behavior, kind = grpc.stream_stream_rpc_method_handler, stream, handler.stream_stream, "bidi_stream"
+    return make(wrap(behavior, (kind, service, method)),
+                request_deserializer=handler.request_deserializer, response_serializer=handler.response_serializer)
+
+
+class MetricsInterceptor(grpc.aio.ServerInterceptor):
+    """Counts, status codes, in-flight gauge and latency histogram for every RPC a server handles."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        _, service, method = handler_call_details.method.split("/", 2)
+        return _rewrap(handler, self._unary, self._stream, service, method)
+
+    @staticmethod
+    def _begin(labels) -> float:
+        RPC_STARTED.labels(*labels).inc()
+        RPC_IN_FLIGHT.labels(*labels).inc()
+        return time.perf_counter()
+
+    @staticmethod
+    def _end(labels, started: float, context, error: BaseException | None):
+        RPC_IN_FLIGHT.labels(*labels).dec()
+        RPC_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+        RPC_HANDLED.labels(*labels, _code(context, error)).inc()
+
+    def _unary(self, behavior, labels):
+        async def wrapper(request, context):
+            started, error = self._begin(labels), None
+            try:
+                return await behavior(request, context)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._end(labels, started, context, error)
+        return wrapper
+
+    def _stream(self, behavior, labels):
+        async def wrapper(request, context):
+            started, error = self._begin(labels), None
+            try:
+                async for response in behavior(request, context):
+                    yield response
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._end(labels, started, context, error)
+        return wrapper
+
+
+class TracingInterceptor(grpc.aio.ServerInterceptor):
+    """A SERVER span per RPC, continuing the caller's trace from its `traceparent` metadata."""
+
+    def __init__(self, tracer: trace.Tracer):
+        self.tracer = tracer
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        _, service, method = handler_call_details.method.split("/", 2)
+        parent = tracing.extract(handler_call_details.invocation_metadata)
+        return _rewrap(handler, partial(self._unary, parent=parent), partial(self._stream, parent=parent),
+                       service, method)
+
+    def _start(self, labels, parent):
+        kind, service, method = labels
+        return self.tracer.start_span(f"{service}/{method}", context=parent, kind=tracing.SERVER, attributes={
+            "rpc.system": "grpc", "rpc.service": service, "rpc.method": method, "rpc.grpc.type": kind})
+
+    @staticmethod
+    def _end(span, context, error: BaseException | None):
+        code = _code(context, error)
+        span.set_attribute("rpc.grpc.status_code", grpc.StatusCode[code].value[0])
+        if code == "UNKNOWN" and error is not None:
+            span.record_exception(error)
+        if code != "OK":
+            tracing.fail(span, code)
+
+    def _unary(self, behavior, labels, parent):
+        async def wrapper(request, context):
+            span, error = self._start(labels, parent), None
+            with trace.use_span(span, end_on_exit=True, record_exception=False, set_status_on_exception=False):
+                try:
+                    return await behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    self._end(span, context, error)
+        return wrapper
+
+    def _stream(self, behavior, labels, parent):
+        async def wrapper(request, context):
+            span, error = self._start(labels, parent), None
+            with trace.use_span(span, end_on_exit=True, record_exception=False, set_status_on_exception=False):
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    self._end(span, context, error)
+        return wrapper
+
+
+def server_interceptors() -> list[grpc.aio.ServerInterceptor]:
+    # tracing outermost, so its span covers the time the metrics interceptor measures
+    tracer = tracing.get_tracer()
+    return ([TracingInterceptor(tracer)] if tracer else []) + [MetricsInterceptor()]
+
+def new_server() -> grpc.aio.Server:
+    """grpc.aio server with the shared interceptors; every service factory builds its server here."""
+    return grpc.aio.server(interceptors=server_interceptors())
+
+def on_shutdown(hook: Callable[[], Awaitable]):
+    """Have run_grpc() await `hook()` after the server stops, e.g. to flush an outbox."""
+    _shutdown_hooks.append(hook)
+
+async def run_shutdown_hooks():
+    while _shutdown_hooks:
+        hook = _shutdown_hooks.pop()
+        try:
+            await hook()
+        except Exception:
+            log.exception("shutdown hook failed")
 
 async def run_grpc(server, host_port: str):
     server.add_insecure_port(host_port)
     await server.start()
-    print(f"[grpc] listening on {host_port}")
+    log.info("listening", addr=host_port)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: asyncio.ensure_future(server.stop(SHUTDOWN_GRACE_SECONDS)))
     await server.wait_for_termination()
+    log.info("stopped, running shutdown hooks", hooks=len(_shutdown_hooks))
+    await run_shutdown_hooks()
 
 def serve(factory: Callable[[], grpc.aio.Server], host_port: str):
     async def _main():
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT)
         server = factory()
         await run_grpc(server, host_port)
     asyncio.run(_main())
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import os
+import socket
+from bisect import bisect
+from typing import Callable
+
+from common.log import get_logger
+
+log = get_logger("sharding")
+
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+SHARD_REFRESH_SECONDS = float(os.getenv("SHARD_REFRESH_SECONDS", "5"))
+
+# set on a request one replica hands to another, so it is never handed on twice
+FORWARDED_HEADER = "x-lastmile-forwarded"
+
+
+def _hash(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring mapping keys (station ids) to nodes ("host:port").
+
+    Each node owns `vnodes` points on the ring, so keys spread evenly and a
+    node joining or leaving only moves about 1/N of them. The ring depends
+    only on the set of node names: every process that sees the same members
+    agrees on every owner without talking to the others.
+    """
+
+    def __init__(self, nodes=(), vnodes: int = SHARD_VNODES):
+        self.vnodes = vnodes
+        self._nodes: tuple[str, ...] = ()
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        self.set_nodes(nodes)
+
+    @property
+    def nodes(self) -> tuple[str, ...]:
+        return self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def set_nodes(self, nodes) -> bool:
+        """Replace the membership; returns False if it didn't change."""
+        nodes = tuple(sorted(set(nodes)))
+        if nodes == self._nodes:
+            return False
+        ring = sorted((_hash(f"{n}#{i}"), n) for n in nodes for i in range(self.vnodes))
+        self._points = [p for p, _ in ring]
+        self._owners = [n for _, n in ring]
+        self._nodes = nodes
+        return True
+
+    def owner(self, key: str) -> str | None:
+        if not self._points:
+            return None
+        i = bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[i]
+
+
+async def resolve_peers(spec: str) -> list[str]:
+    """Expand a peer spec into "host:port" members.
+
+    `spec` is either a comma-separated list of addresses or
+    "dns:<name>:<port>", which takes every address <name> resolves to (a
+    Kubernetes headless service lists one per ready pod).
+    """
+    if spec.startswith("dns:"):
+        host, port = spec[len("dns:"):].rsplit(":", 1)
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, int(port), type=socket.SOCK_STREAM)
+        return sorted({f"{info[4][0]}:{port}" for info in infos})
+    return sorted({p.strip() for p in spec.split(",") if p.strip()})
+
+
+class ShardMap:
+    """A HashRing whose members are re-resolved from a peer spec in the background.
+
+    This is the whole rebalance protocol: every participant polls the same
+    membership source and rebuilds the same ring. `on_change(old, new)` runs
+    after each change so the caller can hand off state for keys it no longer
+    owns. While views disagree (at most one refresh period) a key can have
+    two owners; callers must still be correct then, only slower. A failed
+    lookup keeps the last known members.
+    """
+
+    def __init__(self, spec: str, vnodes: int = SHARD_VNODES,
+                 refresh_seconds: float = SHARD_REFRESH_SECONDS,
+                 on_change: Callable[[tuple[str, ...], tuple[str, ...]], None] | None = None,
+                 name: str = "shards"):
+        self.spec = spec
+        self.ring = HashRing(vnodes=vnodes)
+        self.refresh_seconds = refresh_seconds
+        self.on_change = on_change
+        self.name = name
+        self._task: asyncio.Task | None = None
+
+    def owner(self, key: str) -> str | None:
+        return self.ring.owner(key)
+
+    async def refresh(self) -> bool:
+        try:
+            members = await resolve_peers(self.spec)
+        except OSError as e:
+            log.warning("resolving peers failed, keeping last members", ring=self.name, spec=self.spec, members=list(self.ring.nodes), error=e)
+            return False
+        if not members:
+            return False
+        old = self.ring.nodes
+        if not self.ring.set_nodes(members):
+            return False
+        log.info("ring members changed", ring=self.name, old=list(old), new=list(self.ring.nodes))
+        if self.on_change:
+            self.on_change(old, self.ring.nodes)
+        return True
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        """Begin polling membership; call from the serving loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
@@ -0,0 +1,154 @@
+import asyncio
+import importlib
+import inspect
+import os
+
+import grpc
+from lastmile.v1 import (
+    driver_pb2_grpc, location_pb2_grpc, matching_pb2_grpc, notification_pb2_grpc,
+    rider_pb2_grpc, station_pb2_grpc, trip_pb2_grpc, user_pb2_grpc,
+)
+
+from common import tracing
+from common.db import DB_NAME, close_change_streams, use_client
+from common.log import get_logger
+from common.memdb import MemoryClient
+from common.run import run_shutdown_hooks
+
+log = get_logger("stack")
+
+# (name, module, env vars other services read its address from), in
+# dependency order: every service only dials the ones listed before it.
+SERVICES = [
+    ("user", "services.user_svc", ("USER_ADDR",)),
+    ("station", "services.station_svc", ("STATION_ADDR",)),
+    ("driver", "services.driver_svc", ("DRIVER_ADDR",)),
+    ("notification", "services.notification_svc", ("NOTIFY_ADDR", "NOTIFICATION_ADDR")),
+    ("rider", "services.rider_svc", ("RIDER_ADDR",)),
+    ("trip", "services.trip_svc", ("TRIP_ADDR",)),
+    ("matching", "services.matching_svc", ("MATCH_ADDR",)),
+    ("location", "services.location_svc", ("LOCATION_ADDR",)),
+]
+
+STUBS = {
+    "user": user_pb2_grpc.UserServiceStub,
+    "station": station_pb2_grpc.StationServiceStub,
+    "driver": driver_pb2_grpc.DriverServiceStub,
+    "notification": notification_pb2_grpc.NotificationServiceStub,
+    "rider": rider_pb2_grpc.RiderServiceStub,
+    "trip": trip_pb2_grpc.TripServiceStub,
+    "matching": matching_pb2_grpc.MatchingServiceStub,
+    "location": location_pb2_grpc.LocationServiceStub,
+}
+
+
+class Stack:
+    """All services in this process, each on its own grpc.aio server, over an in-memory Mongo.
+
+        async with Stack() as stack:
+            stack.db.stations.insert_one({...})
+            await stack.stub("location").BatchDriverLocations(...)
+
+    The servicers are the real ones, built by each module's factory() and
+    wired to each other through the usual *_ADDR variables. Those point at
+    loopback ports picked by the OS and are restored on stop().
+    - `client` defaults to a fresh common.memdb.MemoryClient. A MongoClient
+      works too.
+    - `services` boots only the named ones. The others keep whatever address
+      the environment gives them.
+    - With a MemoryClient, TTL indexes are applied every `ttl_interval`
+      seconds, as Mongo's TTL monitor does.
+    """
+
+    def __init__(self, client=None, services=None, host: str = "127.0.0.1", ttl_interval: float = 60.0):
+        self.client = client if client is not None else MemoryClient()
+        self.db = self.client[DB_NAME]
+        self.only = set(services) if services is not None else None
+        self.host = host
+        self.ttl_interval = ttl_interval
+        self.servers: dict[str, grpc.aio.Server] = {}
+        self.addrs: dict[str, str] = {}
+        self._channels: dict[str, grpc.aio.Channel] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._saved_env: dict[str, str | None] = {}
+        self._previous_client = None
+        self._installed = False
+
+    async def __aenter__(self) -> "Stack":
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def _setenv(self, var: str, value: str):
+        self._saved_env.setdefault(var, os.environ.get(var))
+        os.environ[var] = value
+
+    async def start(self) -> "Stack":
+        self._previous_client = use_client(self.client)
+        self._installed = True
+        try:
+            for name, module, env in SERVICES:
+                if self.only is not None and name not in self.only:
+                    continue
+                # outbox workers, change-stream tails, index maintenance: cancelled on stop()
+                before = asyncio.all_tasks()
+                server = importlib.import_module(module).factory()
+                if inspect.isawaitable(server):
+                    server = await server
+                self._tasks |= asyncio.all_tasks() - before
+                port = server.add_insecure_port(f"{self.host}:0")
+                await server.start()
+                self.servers[name] = server
+                self.addrs[name] = f"{self.host}:{port}"
+                for var in env:
+                    self._setenv(var, self.addrs[name])
+        except BaseException:
+            await self.stop()
+            raise
+        if self.ttl_interval and isinstance(self.client, MemoryClient):
+            self._tasks.add(asyncio.create_task(self._ttl_monitor()))
+        log.info("stack up", **self.addrs)
+        return self
+
+    async def stop(self):
+        # background tasks first, so change-stream tails don't see their upstream vanish
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for server in reversed(list(self.servers.values())):
+            await server.stop(None)
+        await run_shutdown_hooks()  # e.g. outboxes spill what they still hold
+        await asyncio.gather(*(ch.close() for ch in self._channels.values()))
+        close_change_streams()  # before the client, so the services don't try to re-tail
+        if isinstance(self.client, MemoryClient):
+            self.client.close()  # ends the change streams, so their pump threads exit
+        if self._installed:
+            use_client(self._previous_client)
+            self._installed = False
+        for var, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+        self.servers.clear()
+        self._channels.clear()
+        self._tasks = set()
+        self._saved_env = {}
+
+    async def _ttl_monitor(self):
+        while True:
+            await asyncio.sleep(self.ttl_interval)
+            n = self.client.expire()
+            if n:
+                log.debug("ttl expired documents", n=n)
+
+    def channel(self, name: str) -> grpc.aio.Channel:
+        ch = self._channels.get(name)
+        if ch is None:
+            ch = self._channels[name] = tracing.aio_channel(self.addrs[name])
+        return ch
+
+    def stub(self, name: str):
+        """A client stub for one of the running services, e.g. `stack.stub("location")`."""
+        return STUBS[name](self.channel(name))
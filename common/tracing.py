@@ -0,0 +1,262 @@
+import collections
+import os
+import sys
+
+import grpc
+from opentelemetry import context as otel_context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, SpanExporter,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from common.log import get_logger
+
+log = get_logger("tracing")
+
+# "" (off), "otlp" (OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT) or "file" (JSON lines)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "")
+# fraction of new traces recorded; a trace that arrives with a parent keeps its parent's decision
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+# finished spans waiting for export; past this they are dropped
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "8192"))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "512"))
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "2"))
+
+INTERNAL, SERVER, CLIENT = SpanKind.INTERNAL, SpanKind.SERVER, SpanKind.CLIENT
+
+_provider: TracerProvider | None = None
+_tracer: trace.Tracer | None = None
+_configured = False
+
+
+def _service_name(service: str) -> str:
+    return service or os.getenv("OTEL_SERVICE_NAME") or \
+        os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+
+
+def file_exporter(path: str = TRACE_FILE) -> SpanExporter:
+    """One JSON object per span, appended to `path`."""
+    return ConsoleSpanExporter(out=open(path, "a"), formatter=lambda span: span.to_json(indent=None) + "\n")
+
+
+def configure(exporter: SpanExporter | None = None, sample_rate: float | None = None, service: str = "",
+              batch: bool = True) -> trace.Tracer | None:
+    """Install the process tracer. Without an exporter it is built from TRACE_EXPORTER (or left off).
+
+    The provider is kept here rather than set globally, so tests can swap it.
+    `batch=False` exports each span as it ends instead of from a background thread.
+    """
+    global _provider, _tracer
+    disable()
+    if exporter is None:
+        if TRACE_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        elif TRACE_EXPORTER == "file":
+            exporter = file_exporter()
+        else:
+            return None
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    _provider = TracerProvider(resource=Resource.create({"service.name": _service_name(service)}),
+                               sampler=ParentBased(TraceIdRatioBased(rate)))
+    _provider.add_span_processor(BatchSpanProcessor(
+        exporter, max_queue_size=TRACE_QUEUE_SIZE, max_export_batch_size=TRACE_BATCH_SIZE,
+        schedule_delay_millis=TRACE_FLUSH_SECONDS * 1000) if batch else SimpleSpanProcessor(exporter))
+    _tracer = _provider.get_tracer("lastmile")
+    log.info("tracing on", exporter=type(exporter).__name__, sample_rate=rate, service=_service_name(service))
+    return _tracer
+
+
+def disable():
+    """Turn tracing off, flushing what the current provider still holds."""
+    global _provider, _tracer, _configured
+    if _provider is not None:
+        _provider.shutdown()
+    _provider, _tracer, _configured = None, None, True
+
+
+def get_tracer() -> trace.Tracer | None:
+    """The process tracer, or None when tracing is off (callers skip all work then)."""
+    if not _configured:
+        configure()
+    return _tracer
+
+
+def in_trace() -> bool:
+    return trace.get_current_span().get_span_context().is_valid
+
+
+def fail(span: trace.Span, message: str):
+    span.set_status(Status(StatusCode.ERROR, message))
+
+
+def extract(metadata) -> otel_context.Context:
+    """The caller's context from gRPC metadata pairs."""
+    return propagate.extract({k: v for k, v in metadata or ()})
+
+
+def _with_context(metadata) -> list[tuple[str, str]]:
+    carrier: dict[str, str] = {}
+    propagate.inject(carrier)
+    return [(k, v) for k, v in (metadata or ()) if k not in carrier] + list(carrier.items())
+
+
+# --- gRPC client side: start a CLIENT span and send its context along ---
+
+class _ClientCallDetails(collections.namedtuple(
+        "_ClientCallDetails", ("method", "timeout", "metadata", "credentials", "wait_for_ready", "compression")),
+        grpc.ClientCallDetails):
+    pass
+
+
+def _rpc_attributes(method: str) -> dict:
+    _, service, name = method.split("/", 2) if method.count("/") >= 2 else ("", "", method)
+    return {"rpc.system": "grpc", "rpc.service": service, "rpc.method": name}
+
+
+class AioClientInterceptor(grpc.aio.UnaryUnaryClientInterceptor, grpc.aio.UnaryStreamClientInterceptor,
+                           grpc.aio.StreamUnaryClientInterceptor, grpc.aio.StreamStreamClientInterceptor):
+    """Traces unary calls as CLIENT spans; streaming calls only carry the current context."""
+
+    def __init__(self, tracer: trace.Tracer):
+        self.tracer = tracer
+
+    @staticmethod
+    def _details(details):
+        return details._replace(metadata=grpc.aio.Metadata(*_with_context(details.metadata)))
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = client_call_details.method
+        method = method.decode() if isinstance(method, bytes) else method
+        with self.tracer.start_as_current_span(method.lstrip("/"), kind=CLIENT,
+                                               attributes=_rpc_attributes(method)) as span:
+            call = await continuation(self._details(client_call_details), request)
+            try:
+                await call
+            except grpc.aio.AioRpcError as e:
+                span.set_attribute("rpc.grpc.status_code", e.code().value[0])
+                fail(span, e.code().name)
+            return call
+
+    async def _propagate(self, continuation, client_call_details, request):
+        if in_trace():
+            client_call_details = self._details(client_call_details)
+        return await continuation(client_call_details, request)
+
+    async def intercept_unary_stream(self, continuation, client_call_details, request):
+        return await self._propagate(continuation, client_call_details, request)
+
+    async def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return await self._propagate(continuation, client_call_details, request_iterator)
+
+    async def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        return await self._propagate(continuation, client_call_details, request_iterator)
+
+
+class SyncClientInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    """The blocking-channel counterpart of `AioClientInterceptor`, for the Flask gateway."""
+
+    def __init__(self, tracer: trace.Tracer):
+        self.tracer = tracer
+
+    @staticmethod
+    def _details(details):
+        return _ClientCallDetails(details.method, details.timeout, _with_context(details.metadata),
+                                  details.credentials, getattr(details, "wait_for_ready", None),
+                                  getattr(details, "compression", None))
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = client_call_details.method
+        with self.tracer.start_as_current_span(method.lstrip("/"), kind=CLIENT,
+                                               attributes=_rpc_attributes(method)) as span:
+            outcome = continuation(self._details(client_call_details), request)
+            if outcome.exception() is not None:
+                code = outcome.code()
+                span.set_attribute("rpc.grpc.status_code", code.value[0])
+                fail(span, code.name)
+            return outcome
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        if in_trace():
+            client_call_details = self._details(client_call_details)
+        return continuation(client_call_details, request)
+
+
+def aio_client_interceptors() -> list:
+    tracer = get_tracer()
+    return [AioClientInterceptor(tracer)] if tracer else []
+
+
+def sync_client_interceptors() -> list:
+    tracer = get_tracer()
+    return [SyncClientInterceptor(tracer)] if tracer else []
+
+
+def aio_channel(target: str, **kwargs) -> grpc.aio.Channel:
+    """grpc.aio.insecure_channel with the tracing interceptors (when tracing is on)."""
+    interceptors = aio_client_interceptors()
+    if interceptors:
+        kwargs["interceptors"] = interceptors + list(kwargs.get("interceptors") or [])
+    return grpc.aio.insecure_channel(target, **kwargs)
+
+
+# --- HTTP (Flask / Quart) ---
+
+def init_app(app):
+    """Trace every request of a Flask or Quart app as a SERVER span, continuing an incoming traceparent."""
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    is_quart = "quart" in type(app).__module__
+    if is_quart:
+        from quart import g, request
+    else:
+        from flask import g, request
+
+    def start():
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        span = tracer.start_span(f"{request.method} {rule}", context=propagate.extract(request.headers),
+                                 kind=SERVER, attributes={"http.method": request.method, "http.route": rule})
+        g._trace = (span, otel_context.attach(trace.set_span_in_context(span)))
+
+    def status(response):
+        active = getattr(g, "_trace", None)
+        if active is not None:
+            active[0].set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                fail(active[0], f"HTTP {response.status_code}")
+        return response
+
+    def end(exc=None):
+        active = getattr(g, "_trace", None)
+        if active is not None:
+            g._trace = None
+            span, token = active
+            if exc is not None:
+                span.record_exception(exc)
+                fail(span, f"{type(exc).__name__}: {exc}")
+            span.end()
+            otel_context.detach(token)
+
+    if is_quart:
+        # Quart runs plain functions on a worker thread, where the span would never become current
+        async def _start():
+            start()
+
+        async def _status(response):
+            return status(response)
+
+        async def _end(exc=None):
+            end(exc)
+
+        app.before_request(_start)
+        app.after_request(_status)
+        app.teardown_request(_end)
+    else:
+        app.before_request(start)
+        app.after_request(status)
+        app.teardown_request(end)
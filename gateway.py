@@ -1,7 +1,11 @@
 # gateway.py
+import atexit
+import json
 import os
+import queue
+import threading
 import time
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import grpc
 from google.protobuf.json_format import MessageToDict
@@ -14,12 +18,16 @@ from lastmile.v1 import (
     rider_pb2, rider_pb2_grpc,
     driver_pb2, driver_pb2_grpc,
     location_pb2, location_pb2_grpc,
+    notification_pb2, notification_pb2_grpc,
     common_pb2,trip_pb2,trip_pb2_grpc
 )
+from common import tracing
+from common.channels import ChannelRegistry
 
 app = Flask(__name__)
 # Enable CORS to allow your React frontend (running on a different port) to call this API
 CORS(app)
+tracing.init_app(app)
 
 # Configuration (Ports must match your services/ files)
 USER_ADDR = os.getenv("USER_ADDR", "localhost:50051")
@@ -27,27 +35,86 @@ STATION_ADDR = os.getenv("STATION_ADDR", "localhost:50052")
 DRIVER_ADDR = os.getenv("DRIVER_ADDR", "localhost:50053")
 RIDER_ADDR = os.getenv("RIDER_ADDR", "localhost:50054")
 LOCATION_ADDR = os.getenv("LOCATION_ADDR", "localhost:50058")
+TRIP_ADDR = os.getenv("TRIP_ADDR", "localhost:50055")
+NOTIFICATION_ADDR = os.getenv("NOTIFICATION_ADDR", "localhost:50056")
+# idle SSE streams send a comment this often, so proxies keep them open and a gone client is noticed
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
 
 # --- Helper functions to get gRPC stubs ---
+# Stubs come from a process-wide registry of long-lived, keepalive'd channels
+# (GRPC_POOL_SIZE per backend) instead of a fresh channel per HTTP request.
+channels = ChannelRegistry()
+
 def get_user_stub():
-    channel = grpc.insecure_channel(USER_ADDR)
-    return user_pb2_grpc.UserServiceStub(channel)
+    return channels.stub(USER_ADDR, user_pb2_grpc.UserServiceStub)
 
 def get_station_stub():
-    channel = grpc.insecure_channel(STATION_ADDR)
-    return station_pb2_grpc.StationServiceStub(channel)
+    return channels.stub(STATION_ADDR, station_pb2_grpc.StationServiceStub)
 
 def get_rider_stub():
-    channel = grpc.insecure_channel(RIDER_ADDR)
-    return rider_pb2_grpc.RiderServiceStub(channel)
+    return channels.stub(RIDER_ADDR, rider_pb2_grpc.RiderServiceStub)
 
 def get_driver_stub():
-    channel = grpc.insecure_channel(DRIVER_ADDR)
-    return driver_pb2_grpc.DriverServiceStub(channel)
+    return channels.stub(DRIVER_ADDR, driver_pb2_grpc.DriverServiceStub)
 
 def get_location_stub():
-    channel = grpc.insecure_channel(LOCATION_ADDR)
-    return location_pb2_grpc.LocationServiceStub(channel)
+    return channels.stub(LOCATION_ADDR, location_pb2_grpc.LocationServiceStub)
+
+def get_trip_stub():
+    return channels.stub(TRIP_ADDR, trip_pb2_grpc.TripServiceStub)
+
+def get_notification_stub():
+    return channels.stub(NOTIFICATION_ADDR, notification_pb2_grpc.NotificationServiceStub)
+
+BACKEND_ADDRS = [USER_ADDR, STATION_ADDR, DRIVER_ADDR, RIDER_ADDR, LOCATION_ADDR, TRIP_ADDR, NOTIFICATION_ADDR]
+
+
+# --- Server-Sent Events ---
+def sse_frame(event: str, data, event_id=None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_KEEPALIVE = ": keepalive\n\n"
+
+def sse_response(call, to_frame):
+    """Relay a server-streaming gRPC call as text/event-stream; cancels the call when the client leaves.
+
+    The call is read on its own thread so that an idle stream can still send
+    SSE_KEEPALIVE; the write is what tells the server the client has gone.
+    """
+    done = object()
+    inbox = queue.Queue()
+
+    def read():
+        try:
+            for msg in call:
+                inbox.put(msg)
+        except grpc.RpcError as e:
+            inbox.put(e)
+        finally:
+            inbox.put(done)
+
+    def events():
+        threading.Thread(target=read, daemon=True).start()
+        try:
+            while True:
+                try:
+                    msg = inbox.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield SSE_KEEPALIVE
+                    continue
+                if msg is done:
+                    return
+                if isinstance(msg, grpc.RpcError):
+                    if msg.code() != grpc.StatusCode.CANCELLED:
+                        yield sse_frame("error", {"error": msg.details()})
+                    return
+                yield to_frame(msg)
+        finally:
+            call.cancel()
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 # --- Routes ---
@@ -172,6 +239,16 @@ def get_rider_requests():
     except grpc.RpcError as e:
         return jsonify({"error": e.details()}), 500
 
+@app.route('/api/rider/requests/stream', methods=['GET'])
+def stream_rider_requests():
+    """Live board as Server-Sent Events: a RESYNC plus snapshot, then every change at the station."""
+    station_id = request.args.get('station_id')
+    if not station_id:
+        return jsonify({"error": "station_id required"}), 400
+    call = get_rider_stub().WatchStation(rider_pb2.WatchStationRequest(
+        station_id=station_id, dest_area=request.args.get('dest_area', '')))
+    return sse_response(call, lambda change: sse_frame(change.op, MessageToDict(change)))
+
 @app.route('/api/rider/my-requests', methods=['GET'])
 def get_my_rider_requests():
     """Fetch all requests for a specific rider directly from DB"""
@@ -239,24 +316,43 @@ def update_driver_location():
     lat = float(data.get('lat'))
     lon = float(data.get('lon'))
     
+    loc = location_pb2.DriverLocation(
+        driver_id=driver_id,
+        route_id=route_id,
+        point=common_pb2.LatLng(lat=lat, lon=lon),
+        ts_unix=int(time.time())
+    )
     stub = get_location_stub()
-    
-    def generate_location():
-        loc = location_pb2.DriverLocation(
-            driver_id=driver_id,
-            route_id=route_id,
-            point=common_pb2.LatLng(lat=lat, lon=lon),
-            ts_unix=int(time.time())
-        )
-        yield loc
-        
     try:
-        # StreamDriverLocation expects an iterator
-        stub.StreamDriverLocation(generate_location())
+        # A single unary call; no need to open a client stream for one point
+        stub.BatchDriverLocations(location_pb2.BatchDriverLocationsRequest(locations=[loc]))
         return jsonify({"status": "updated"}), 200
     except grpc.RpcError as e:
         return jsonify({"error": e.details()}), 500
 
+@app.route('/api/driver/locations', methods=['POST'])
+def update_driver_locations():
+    """Bulk location update: {"locations": [{driver_id, route_id, lat, lon, ts_unix?}, ...]}"""
+    data = request.json
+    items = data.get('locations') or []
+    if not items:
+        return jsonify({"error": "locations required"}), 400
+
+    now = int(time.time())
+    locs = [location_pb2.DriverLocation(
+        driver_id=it.get('driver_id'),
+        route_id=it.get('route_id'),
+        point=common_pb2.LatLng(lat=float(it.get('lat')), lon=float(it.get('lon'))),
+        ts_unix=int(it.get('ts_unix', now))
+    ) for it in items]
+
+    stub = get_location_stub()
+    try:
+        resp = stub.BatchDriverLocations(location_pb2.BatchDriverLocationsRequest(locations=locs))
+        return jsonify({"accepted": resp.accepted, "triggered": resp.triggered}), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
 @app.route('/api/driver/active-route', methods=['GET'])
 def get_active_driver_route():
     """Fetch the active route for a driver directly from DB"""
@@ -296,11 +392,7 @@ def complete_trip():
         
     # We can call the trip service via gRPC to update status
     # The trip service will handle route deletion as per our plan
-    
-    # First, let's get the stub
-    # We need a trip stub function
-    channel = grpc.insecure_channel(os.getenv("TRIP_ADDR", "localhost:50055"))
-    stub = trip_pb2_grpc.TripServiceStub(channel)
+    stub = get_trip_stub()
     
     try:
         resp = stub.UpdateTripStatus(trip_pb2.UpdateTripStatusRequest(
@@ -356,6 +448,32 @@ def get_notifications():
         
     return jsonify(notifs), 200
 
+def notification_json(n) -> dict:
+    """A streamed notification in the same shape GET /api/notifications returns."""
+    return {"id": n.id, "user_id": n.user_id, "title": n.title, "message": n.body,
+            "data": n.data_json, "read": False, "timestamp": n.timestamp}
+
+@app.route('/api/notifications/stream', methods=['GET'])
+def stream_notifications():
+    """New notifications as Server-Sent Events, in place of polling GET /api/notifications.
+
+    Each event's id is `<timestamp>-<id>`, so an EventSource that reconnects
+    (it sends Last-Event-ID) gets what it missed, including others stored in
+    the same ms. A client can also pass ?since=<ms>.
+    """
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({"error": "user_id required"}), 400
+    since = request.headers.get('Last-Event-ID') or request.args.get('since') or "0"
+    since, _, after_id = since.partition("-")
+    try:
+        since = int(since)
+    except ValueError:
+        return jsonify({"error": "since must be a timestamp in ms"}), 400
+    call = get_notification_stub().Subscribe(
+        notification_pb2.SubscribeRequest(user_id=user_id, since_ms=since, after_id=after_id))
+    return sse_response(call, lambda n: sse_frame("notification", notification_json(n), event_id=f"{n.timestamp}-{n.id}"))
+
 @app.route('/api/notifications/<notif_id>/read', methods=['PUT'])
 def mark_notification_read(notif_id):
     """Mark a notification as read"""
@@ -397,4 +515,6 @@ def clear_notifications():
 
 if __name__ == '__main__':
     print("Starting Flask API Gateway on port 5000...")
+    channels.warmup(BACKEND_ADDRS, timeout=float(os.getenv("GRPC_WARMUP_TIMEOUT", "5")))
+    atexit.register(channels.close)
     app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG', 'False') == 'True')
\ No newline at end of file
@@ -0,0 +1,439 @@
+# gateway_aio.py
+# ASGI flavour of gateway.py: same routes, same JSON, but every downstream call
+# is an awaited grpc.aio / async Mongo call, so one worker keeps many requests
+# in flight instead of blocking on each backend hop.
+#
+#   hypercorn gateway_aio:app --bind 0.0.0.0:5000 --workers 2
+import asyncio
+import json
+import os
+import time
+from quart import Quart, request, jsonify
+from quart_cors import cors
+import grpc
+from google.protobuf.json_format import MessageToDict
+from bson import ObjectId
+
+from lastmile.v1 import (
+    user_pb2, user_pb2_grpc,
+    station_pb2, station_pb2_grpc,
+    rider_pb2, rider_pb2_grpc,
+    driver_pb2, driver_pb2_grpc,
+    location_pb2, location_pb2_grpc,
+    notification_pb2, notification_pb2_grpc,
+    common_pb2, trip_pb2, trip_pb2_grpc
+)
+from common import tracing
+from common.channels import AioChannelRegistry
+from common.db import get_async_db
+
+app = cors(Quart(__name__))
+tracing.init_app(app)
+
+USER_ADDR = os.getenv("USER_ADDR", "localhost:50051")
+STATION_ADDR = os.getenv("STATION_ADDR", "localhost:50052")
+DRIVER_ADDR = os.getenv("DRIVER_ADDR", "localhost:50053")
+RIDER_ADDR = os.getenv("RIDER_ADDR", "localhost:50054")
+LOCATION_ADDR = os.getenv("LOCATION_ADDR", "localhost:50058")
+TRIP_ADDR = os.getenv("TRIP_ADDR", "localhost:50055")
+NOTIFICATION_ADDR = os.getenv("NOTIFICATION_ADDR", "localhost:50056")
+# idle SSE streams send a comment this often, so proxies keep them open and a gone client is noticed
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+BACKEND_ADDRS = [USER_ADDR, STATION_ADDR, DRIVER_ADDR, RIDER_ADDR, LOCATION_ADDR, TRIP_ADDR, NOTIFICATION_ADDR]
+
+# aio channels are bound to the serving loop, so the registry is created in
+# before_serving rather than at import time.
+channels: AioChannelRegistry | None = None
+
+@app.before_serving
+async def startup():
+    global channels
+    channels = AioChannelRegistry()
+    await channels.warmup(BACKEND_ADDRS, timeout=float(os.getenv("GRPC_WARMUP_TIMEOUT", "5")))
+
+@app.after_serving
+async def shutdown():
+    if channels is not None:
+        await channels.close()
+
+# --- Helper functions to get gRPC stubs ---
+def get_user_stub():
+    return channels.stub(USER_ADDR, user_pb2_grpc.UserServiceStub)
+
+def get_station_stub():
+    return channels.stub(STATION_ADDR, station_pb2_grpc.StationServiceStub)
+
+def get_rider_stub():
+    return channels.stub(RIDER_ADDR, rider_pb2_grpc.RiderServiceStub)
+
+def get_driver_stub():
+    return channels.stub(DRIVER_ADDR, driver_pb2_grpc.DriverServiceStub)
+
+def get_location_stub():
+    return channels.stub(LOCATION_ADDR, location_pb2_grpc.LocationServiceStub)
+
+def get_trip_stub():
+    return channels.stub(TRIP_ADDR, trip_pb2_grpc.TripServiceStub)
+
+def get_notification_stub():
+    return channels.stub(NOTIFICATION_ADDR, notification_pb2_grpc.NotificationServiceStub)
+
+
+# --- Server-Sent Events ---
+def sse_frame(event: str, data, event_id=None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_KEEPALIVE = b": keepalive\n\n"
+
+async def sse_response(call, to_frame):
+    """Relay a server-streaming gRPC call as text/event-stream; cancels the call when the client leaves.
+
+    An idle stream sends SSE_KEEPALIVE every SSE_KEEPALIVE_SECONDS. The pending
+    read is kept across keepalives rather than cancelled, which would end the call.
+    """
+    async def events():
+        messages = aiter(call)
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(anext(messages))
+                done, _ = await asyncio.wait((pending,), timeout=SSE_KEEPALIVE_SECONDS)
+                if not done:
+                    yield SSE_KEEPALIVE
+                    continue
+                msg, pending = pending.result(), None
+                yield to_frame(msg).encode()
+        except StopAsyncIteration:
+            pass
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.CANCELLED:
+                yield sse_frame("error", {"error": e.details()}).encode()
+        finally:
+            if pending is not None:
+                pending.cancel()
+            call.cancel()
+
+    response = await app.make_response((events(), 200, {
+        'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}))
+    response.timeout = None  # the stream is open-ended
+    return response
+
+
+# --- Routes ---
+
+@app.route('/api/health', methods=['GET'])
+async def health():
+    return jsonify({"status": "ok"}), 200
+
+# 1. User Authentication
+@app.route('/api/signup', methods=['POST'])
+async def signup():
+    """Creates a new user (Rider or Driver)"""
+    data = await request.get_json()
+    role_str = data.get('role', 'RIDER').upper()
+    role_enum = getattr(common_pb2, role_str, common_pb2.RIDER)
+
+    user = common_pb2.User(name=data.get('name'), phone=data.get('phone'), role=role_enum)
+    req = user_pb2.CreateUserRequest(user=user, password=data.get('password'))
+    try:
+        resp = await get_user_stub().CreateUser(req)
+        return jsonify(MessageToDict(resp.user)), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+@app.route('/api/login', methods=['POST'])
+async def login():
+    """Authenticates user and returns ID + Role"""
+    data = await request.get_json()
+    req = user_pb2.AuthenticateRequest(phone=data.get('phone'), password=data.get('password'))
+    stub = get_user_stub()
+    try:
+        # GetUser needs the id Authenticate returns, so these two stay sequential
+        resp = await stub.Authenticate(req)
+        if resp.user_id:
+            user_resp = await stub.GetUser(user_pb2.GetUserRequest(id=resp.user_id))
+            return jsonify({
+                "token": resp.jwt,
+                "user": MessageToDict(user_resp.user)
+            }), 200
+        else:
+            return jsonify({"error": "Invalid credentials"}), 401
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+
+# 2. Stations
+@app.route('/api/stations', methods=['GET'])
+async def list_stations():
+    """Returns a list of all available stations"""
+    try:
+        resp = await get_station_stub().ListStations(common_pb2.Empty())
+        return jsonify([MessageToDict(s) for s in resp.stations]), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+
+# 3. Rider Operations
+@app.route('/api/rider/request', methods=['POST'])
+async def create_rider_request():
+    """Creates a ride request for a specific station"""
+    data = await request.get_json()
+    mins = int(data.get('eta_minutes', 10))
+    req_msg = common_pb2.RiderRequest(
+        rider_id=data.get('rider_id'),
+        station_id=data.get('station_id'),
+        dest_area=data.get('dest_area'),
+        eta_unix=int(time.time()) + mins * 60,
+        status="PENDING"
+    )
+    try:
+        resp = await get_rider_stub().AddRequest(rider_pb2.AddRequestRequest(request=req_msg))
+        return jsonify(MessageToDict(resp.request)), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+@app.route('/api/rider/requests', methods=['GET'])
+async def get_rider_requests():
+    """Pending requests for a station (+/- 30 min), for the live board."""
+    station_id = request.args.get('station_id')
+    if not station_id:
+        return jsonify({"error": "station_id required"}), 400
+    try:
+        resp = await get_rider_stub().ListPendingAtStation(rider_pb2.ListPendingAtStationRequest(
+            station_id=station_id,
+            now_unix=int(time.time()),
+            minutes_window=30,
+            dest_area=""
+        ))
+        return jsonify([MessageToDict(r) for r in resp.requests]), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+@app.route('/api/rider/requests/stream', methods=['GET'])
+async def stream_rider_requests():
+    """Live board as Server-Sent Events: a RESYNC plus snapshot, then every change at the station."""
+    station_id = request.args.get('station_id')
+    if not station_id:
+        return jsonify({"error": "station_id required"}), 400
+    call = get_rider_stub().WatchStation(rider_pb2.WatchStationRequest(
+        station_id=station_id, dest_area=request.args.get('dest_area', '')))
+    return await sse_response(call, lambda change: sse_frame(change.op, MessageToDict(change)))
+
+@app.route('/api/rider/my-requests', methods=['GET'])
+async def get_my_rider_requests():
+    """Fetch all requests for a specific rider directly from DB"""
+    rider_id = request.args.get('rider_id')
+    if not rider_id:
+        return jsonify({"error": "rider_id required"}), 400
+
+    db = get_async_db()
+    requests = await db.rider_requests.find({"rider_id": rider_id}, sort=[("eta_unix", -1)], limit=20)
+    out = []
+    for r in requests:
+        out.append({
+            "id": str(r["_id"]),
+            "stationId": r["station_id"],
+            "destination": r["dest_area"],
+            "etaUnix": r["eta_unix"],
+            "status": r["status"]
+        })
+    return jsonify(out), 200
+
+
+# 4. Driver Operations
+@app.route('/api/driver/route', methods=['POST'])
+async def create_driver_route():
+    """Registers a driver's route (capacity and stations)"""
+    data = await request.get_json()
+    route_stations = [
+        driver_pb2.RouteStation(station_id=sid, minutes_before_eta_match=5)
+        for sid in data.get('stations', [])
+    ]
+    route = driver_pb2.DriverRoute(
+        driver_id=data.get('driver_id'),
+        dest_area=data.get('dest_area'),
+        seats_total=int(data.get('seats_total', 3)),
+        seats_free=int(data.get('seats_free', 3)),
+        stations=route_stations
+    )
+    try:
+        resp = await get_driver_stub().RegisterRoute(driver_pb2.RegisterRouteRequest(route=route))
+        return jsonify(MessageToDict(resp.route)), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+@app.route('/api/driver/location', methods=['POST'])
+async def update_driver_location():
+    """Updates driver location. Expects driver_id, route_id, lat, lon."""
+    data = await request.get_json()
+    loc = location_pb2.DriverLocation(
+        driver_id=data.get('driver_id'),
+        route_id=data.get('route_id'),
+        point=common_pb2.LatLng(lat=float(data.get('lat')), lon=float(data.get('lon'))),
+        ts_unix=int(time.time())
+    )
+    try:
+        await get_location_stub().BatchDriverLocations(location_pb2.BatchDriverLocationsRequest(locations=[loc]))
+        return jsonify({"status": "updated"}), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+@app.route('/api/driver/locations', methods=['POST'])
+async def update_driver_locations():
+    """Bulk location update: {"locations": [{driver_id, route_id, lat, lon, ts_unix?}, ...]}"""
+    data = await request.get_json()
+    items = data.get('locations') or []
+    if not items:
+        return jsonify({"error": "locations required"}), 400
+
+    now = int(time.time())
+    locs = [location_pb2.DriverLocation(
+        driver_id=it.get('driver_id'),
+        route_id=it.get('route_id'),
+        point=common_pb2.LatLng(lat=float(it.get('lat')), lon=float(it.get('lon'))),
+        ts_unix=int(it.get('ts_unix', now))
+    ) for it in items]
+    try:
+        resp = await get_location_stub().BatchDriverLocations(location_pb2.BatchDriverLocationsRequest(locations=locs))
+        return jsonify({"accepted": resp.accepted, "triggered": resp.triggered}), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+@app.route('/api/driver/active-route', methods=['GET'])
+async def get_active_driver_route():
+    """Fetch the active route for a driver directly from DB"""
+    driver_id = request.args.get('driver_id')
+    if not driver_id:
+        return jsonify({"error": "driver_id required"}), 400
+
+    route = await get_async_db().driver_routes.find_one({"driver_id": driver_id})
+    if route:
+        route['id'] = str(route.pop('_id'))
+        return jsonify(route), 200
+    else:
+        return jsonify(None), 200
+
+@app.route('/api/driver/route/<route_id>', methods=['DELETE'])
+async def delete_driver_route(route_id):
+    """Deletes a driver route"""
+    try:
+        resp = await get_driver_stub().DeleteRoute(driver_pb2.DeleteRouteRequest(route_id=route_id))
+        return jsonify({"status": "deleted", "route_id": resp.route_id}), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+@app.route('/api/trip/complete', methods=['POST'])
+async def complete_trip():
+    """Completes a trip and cleans up the route"""
+    data = await request.get_json()
+    trip_id = data.get('trip_id')
+    if not trip_id:
+        return jsonify({"error": "trip_id required"}), 400
+    try:
+        resp = await get_trip_stub().UpdateTripStatus(trip_pb2.UpdateTripStatusRequest(
+            trip_id=trip_id,
+            status="COMPLETED"
+        ))
+        return jsonify(MessageToDict(resp.trip)), 200
+    except grpc.RpcError as e:
+        return jsonify({"error": e.details()}), 500
+
+@app.route('/api/driver/active-trip', methods=['GET'])
+async def get_active_driver_trip():
+    """Fetch the active trip for a driver"""
+    driver_id = request.args.get('driver_id')
+    if not driver_id:
+        return jsonify({"error": "driver_id required"}), 400
+
+    trip = await get_async_db().trips.find_one({
+        "driver_id": driver_id,
+        "status": {"$nin": ["COMPLETED", "CANCELLED"]}
+    })
+    if trip:
+        trip['id'] = str(trip.pop('_id'))
+        return jsonify(trip), 200
+    else:
+        return jsonify(None), 200
+
+
+# 5. Notifications
+@app.route('/api/notifications', methods=['GET'])
+async def get_notifications():
+    """Fetch notifications for a user"""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({"error": "user_id required"}), 400
+
+    notifs = await get_async_db().notifications.find({"user_id": user_id}, sort=[("timestamp", -1)], limit=50)
+    for n in notifs:
+        n['id'] = str(n.pop('_id'))
+    return jsonify(notifs), 200
+
+def notification_json(n) -> dict:
+    """A streamed notification in the same shape GET /api/notifications returns."""
+    return {"id": n.id, "user_id": n.user_id, "title": n.title, "message": n.body,
+            "data": n.data_json, "read": False, "timestamp": n.timestamp}
+
+@app.route('/api/notifications/stream', methods=['GET'])
+async def stream_notifications():
+    """New notifications as Server-Sent Events, in place of polling GET /api/notifications.
+
+    Each event's id is `<timestamp>-<id>`, so an EventSource that reconnects
+    (it sends Last-Event-ID) gets what it missed, including others stored in
+    the same ms. A client can also pass ?since=<ms>.
+    """
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({"error": "user_id required"}), 400
+    since = request.headers.get('Last-Event-ID') or request.args.get('since') or "0"
+    since, _, after_id = since.partition("-")
+    try:
+        since = int(since)
+    except ValueError:
+        return jsonify({"error": "since must be a timestamp in ms"}), 400
+    call = get_notification_stub().Subscribe(
+        notification_pb2.SubscribeRequest(user_id=user_id, since_ms=since, after_id=after_id))
+    return await sse_response(call, lambda n: sse_frame("notification", notification_json(n), event_id=f"{n.timestamp}-{n.id}"))
+
+@app.route('/api/notifications/<notif_id>/read', methods=['PUT'])
+async def mark_notification_read(notif_id):
+    """Mark a notification as read"""
+    try:
+        await get_async_db().notifications.update_one(
+            {"_id": ObjectId(notif_id)},
+            {"$set": {"read": True}}
+        )
+        return jsonify({"status": "ok"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/notifications/read-all', methods=['PUT'])
+async def mark_all_notifications_read():
+    """Mark all notifications as read for a user"""
+    user_id = (await request.get_json()).get('user_id')
+    if not user_id:
+        return jsonify({"error": "user_id required"}), 400
+
+    await get_async_db().notifications.update_many(
+        {"user_id": user_id, "read": False},
+        {"$set": {"read": True}}
+    )
+    return jsonify({"status": "ok"}), 200
+
+@app.route('/api/notifications/clear', methods=['DELETE'])
+async def clear_notifications():
+    """Clear all notifications for a user"""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({"error": "user_id required"}), 400
+
+    await get_async_db().notifications.delete_many({"user_id": user_id})
+    return jsonify({"status": "ok"}), 200
+
+
+if __name__ == '__main__':
+    print("Starting async API Gateway on port 5000...")
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv('QUART_DEBUG', 'False') == 'True')
@@ -44,6 +44,16 @@ class DriverServiceStub(object):
                 request_serializer=lastmile_dot_v1_dot_driver__pb2.UpdateSeatsRequest.SerializeToString,
                 response_deserializer=lastmile_dot_v1_dot_driver__pb2.UpdateSeatsResponse.FromString,
                 _registered_method=True)
+        self.ReserveSeats = channel.unary_unary(
+                '/lastmile.v1.DriverService/ReserveSeats',
+                request_serializer=lastmile_dot_v1_dot_driver__pb2.ReserveSeatsRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_driver__pb2.ReserveSeatsResponse.FromString,
+                _registered_method=True)
+        self.ReleaseSeats = channel.unary_unary(
+                '/lastmile.v1.DriverService/ReleaseSeats',
+                request_serializer=lastmile_dot_v1_dot_driver__pb2.ReleaseSeatsRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_driver__pb2.ReleaseSeatsResponse.FromString,
+                _registered_method=True)
         self.GetRoute = channel.unary_unary(
                 '/lastmile.v1.DriverService/GetRoute',
                 request_serializer=lastmile_dot_v1_dot_driver__pb2.GetRouteRequest.SerializeToString,
@@ -54,6 +64,11 @@ class DriverServiceStub(object):
                 request_serializer=lastmile_dot_v1_dot_driver__pb2.DeleteRouteRequest.SerializeToString,
                 response_deserializer=lastmile_dot_v1_dot_driver__pb2.DeleteRouteResponse.FromString,
                 _registered_method=True)
+        self.WatchRoutes = channel.unary_stream(
+                '/lastmile.v1.DriverService/WatchRoutes',
+                request_serializer=lastmile_dot_v1_dot_driver__pb2.WatchRoutesRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_driver__pb2.RouteChange.FromString,
+                _registered_method=True)
 
 
 class DriverServiceServicer(object):
@@ -71,6 +86,18 @@ class DriverServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ReserveSeats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReleaseSeats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetRoute(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -83,6 +110,12 @@ class DriverServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchRoutes(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_DriverServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -96,6 +129,16 @@ def add_DriverServiceServicer_to_server(servicer, server):
                     request_deserializer=lastmile_dot_v1_dot_driver__pb2.UpdateSeatsRequest.FromString,
                     response_serializer=lastmile_dot_v1_dot_driver__pb2.UpdateSeatsResponse.SerializeToString,
             ),
+            'ReserveSeats': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReserveSeats,
+                    request_deserializer=lastmile_dot_v1_dot_driver__pb2.ReserveSeatsRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_driver__pb2.ReserveSeatsResponse.SerializeToString,
+            ),
+            'ReleaseSeats': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReleaseSeats,
+                    request_deserializer=lastmile_dot_v1_dot_driver__pb2.ReleaseSeatsRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_driver__pb2.ReleaseSeatsResponse.SerializeToString,
+            ),
             'GetRoute': grpc.unary_unary_rpc_method_handler(
                     servicer.GetRoute,
                     request_deserializer=lastmile_dot_v1_dot_driver__pb2.GetRouteRequest.FromString,
@@ -106,6 +149,11 @@ def add_DriverServiceServicer_to_server(servicer, server):
                     request_deserializer=lastmile_dot_v1_dot_driver__pb2.DeleteRouteRequest.FromString,
                     response_serializer=lastmile_dot_v1_dot_driver__pb2.DeleteRouteResponse.SerializeToString,
             ),
+            'WatchRoutes': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchRoutes,
+                    request_deserializer=lastmile_dot_v1_dot_driver__pb2.WatchRoutesRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_driver__pb2.RouteChange.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'lastmile.v1.DriverService', rpc_method_handlers)
@@ -171,6 +219,60 @@ class DriverService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ReserveSeats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lastmile.v1.DriverService/ReserveSeats',
+            lastmile_dot_v1_dot_driver__pb2.ReserveSeatsRequest.SerializeToString,
+            lastmile_dot_v1_dot_driver__pb2.ReserveSeatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReleaseSeats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lastmile.v1.DriverService/ReleaseSeats',
+            lastmile_dot_v1_dot_driver__pb2.ReleaseSeatsRequest.SerializeToString,
+            lastmile_dot_v1_dot_driver__pb2.ReleaseSeatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def GetRoute(request,
             target,
@@ -224,3 +326,30 @@ class DriverService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def WatchRoutes(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/lastmile.v1.DriverService/WatchRoutes',
+            lastmile_dot_v1_dot_driver__pb2.WatchRoutesRequest.SerializeToString,
+            lastmile_dot_v1_dot_driver__pb2.RouteChange.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
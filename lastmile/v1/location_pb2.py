@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from lastmile.v1 import common_pb2 as lastmile_dot_v1_dot_common__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1alastmile/v1/location.proto\x12\x0blastmile.v1\x1a\x18lastmile/v1/common.proto\"j\n\x0e\x44riverLocation\x12\x11\n\tdriver_id\x18\x01 \x01(\t\x12\"\n\x05point\x18\x02 \x01(\x0b\x32\x13.lastmile.v1.LatLng\x12\x0f\n\x07ts_unix\x18\x03 \x01(\x03\x12\x10\n\x08route_id\x18\x04 \x01(\t\"\x1f\n\x11LocationStreamAck\x12\n\n\x02ok\x18\x01 \x01(\x08\x32h\n\x0fLocationService\x12U\n\x14StreamDriverLocation\x12\x1b.lastmile.v1.DriverLocation\x1a\x1e.lastmile.v1.LocationStreamAck(\x01\x42?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1alastmile/v1/location.proto\x12\x0blastmile.v1\x1a\x18lastmile/v1/common.proto\"j\n\x0e\x44riverLocation\x12\x11\n\tdriver_id\x18\x01 \x01(\t\x12\"\n\x05point\x18\x02 \x01(\x0b\x32\x13.lastmile.v1.LatLng\x12\x0f\n\x07ts_unix\x18\x03 \x01(\x03\x12\x10\n\x08route_id\x18\x04 \x01(\t\"\x1f\n\x11LocationStreamAck\x12\n\n\x02ok\x18\x01 \x01(\x08\"M\n\x1b\x42\x61tchDriverLocationsRequest\x12.\n\tlocations\x18\x01 \x03(\x0b\x32\x1b.lastmile.v1.DriverLocation\"C\n\x1c\x42\x61tchDriverLocationsResponse\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x01 \x01(\x05\x12\x11\n\ttriggered\x18\x02 \x01(\x05\x32\xd5\x01\n\x0fLocationService\x12U\n\x14StreamDriverLocation\x12\x1b.lastmile.v1.DriverLocation\x1a\x1e.lastmile.v1.LocationStreamAck(\x01\x12k\n\x14\x42\x61tchDriverLocations\x12(.lastmile.v1.BatchDriverLocationsRequest\x1a).lastmile.v1.BatchDriverLocationsResponseB?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -37,6 +37,10 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_DRIVERLOCATION']._serialized_end=175
   _globals['_LOCATIONSTREAMACK']._serialized_start=177
   _globals['_LOCATIONSTREAMACK']._serialized_end=208
-  _globals['_LOCATIONSERVICE']._serialized_start=210
-  _globals['_LOCATIONSERVICE']._serialized_end=314
+  _globals['_BATCHDRIVERLOCATIONSREQUEST']._serialized_start=210
+  _globals['_BATCHDRIVERLOCATIONSREQUEST']._serialized_end=287
+  _globals['_BATCHDRIVERLOCATIONSRESPONSE']._serialized_start=289
+  _globals['_BATCHDRIVERLOCATIONSRESPONSE']._serialized_end=356
+  _globals['_LOCATIONSERVICE']._serialized_start=359
+  _globals['_LOCATIONSERVICE']._serialized_end=572
 # @@protoc_insertion_point(module_scope)
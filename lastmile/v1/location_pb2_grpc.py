@@ -39,6 +39,11 @@ class LocationServiceStub(object):
                 request_serializer=lastmile_dot_v1_dot_location__pb2.DriverLocation.SerializeToString,
                 response_deserializer=lastmile_dot_v1_dot_location__pb2.LocationStreamAck.FromString,
                 _registered_method=True)
+        self.BatchDriverLocations = channel.unary_unary(
+                '/lastmile.v1.LocationService/BatchDriverLocations',
+                request_serializer=lastmile_dot_v1_dot_location__pb2.BatchDriverLocationsRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_location__pb2.BatchDriverLocationsResponse.FromString,
+                _registered_method=True)
 
 
 class LocationServiceServicer(object):
@@ -50,6 +55,12 @@ class LocationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BatchDriverLocations(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_LocationServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -58,6 +69,11 @@ def add_LocationServiceServicer_to_server(servicer, server):
                     request_deserializer=lastmile_dot_v1_dot_location__pb2.DriverLocation.FromString,
                     response_serializer=lastmile_dot_v1_dot_location__pb2.LocationStreamAck.SerializeToString,
             ),
+            'BatchDriverLocations': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchDriverLocations,
+                    request_deserializer=lastmile_dot_v1_dot_location__pb2.BatchDriverLocationsRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_location__pb2.BatchDriverLocationsResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'lastmile.v1.LocationService', rpc_method_handlers)
@@ -95,3 +111,30 @@ class LocationService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def BatchDriverLocations(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lastmile.v1.LocationService/BatchDriverLocations',
+            lastmile_dot_v1_dot_location__pb2.BatchDriverLocationsRequest.SerializeToString,
+            lastmile_dot_v1_dot_location__pb2.BatchDriverLocationsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1alastmile/v1/matching.proto\x12\x0blastmile.v1\"d\n\x0fTryMatchRequest\x12\x11\n\tdriver_id\x18\x01 \x01(\t\x12\x10\n\x08route_id\x18\x02 \x01(\t\x12\x12\n\nstation_id\x18\x03 \x01(\t\x12\x18\n\x10\x61rrival_eta_unix\x18\x04 \x01(\x03\"8\n\nAssignment\x12\x18\n\x10rider_request_id\x18\x01 \x01(\t\x12\x10\n\x08rider_id\x18\x02 \x01(\t\"j\n\x10TryMatchResponse\x12\x0f\n\x07trip_id\x18\x01 \x01(\t\x12,\n\x0b\x61ssignments\x18\x02 \x03(\x0b\x32\x17.lastmile.v1.Assignment\x12\x17\n\x0fseats_remaining\x18\x03 \x01(\x05\x32Z\n\x0fMatchingService\x12G\n\x08TryMatch\x12\x1c.lastmile.v1.TryMatchRequest\x1a\x1d.lastmile.v1.TryMatchResponseB?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1alastmile/v1/matching.proto\x12\x0blastmile.v1\"}\n\x0fTryMatchRequest\x12\x11\n\tdriver_id\x18\x01 \x01(\t\x12\x10\n\x08route_id\x18\x02 \x01(\t\x12\x12\n\nstation_id\x18\x03 \x01(\t\x12\x18\n\x10\x61rrival_eta_unix\x18\x04 \x01(\x03\x12\x17\n\x0fidempotency_key\x18\x05 \x01(\t\"8\n\nAssignment\x12\x18\n\x10rider_request_id\x18\x01 \x01(\t\x12\x10\n\x08rider_id\x18\x02 \x01(\t\"j\n\x10TryMatchResponse\x12\x0f\n\x07trip_id\x18\x01 \x01(\t\x12,\n\x0b\x61ssignments\x18\x02 \x03(\x0b\x32\x17.lastmile.v1.Assignment\x12\x17\n\x0fseats_remaining\x18\x03 \x01(\x05\x32Z\n\x0fMatchingService\x12G\n\x08TryMatch\x12\x1c.lastmile.v1.TryMatchRequest\x1a\x1d.lastmile.v1.TryMatchResponseB?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,11 +33,11 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1'
   _globals['_TRYMATCHREQUEST']._serialized_start=43
-  _globals['_TRYMATCHREQUEST']._serialized_end=143
-  _globals['_ASSIGNMENT']._serialized_start=145
-  _globals['_ASSIGNMENT']._serialized_end=201
-  _globals['_TRYMATCHRESPONSE']._serialized_start=203
-  _globals['_TRYMATCHRESPONSE']._serialized_end=309
-  _globals['_MATCHINGSERVICE']._serialized_start=311
-  _globals['_MATCHINGSERVICE']._serialized_end=401
+  _globals['_TRYMATCHREQUEST']._serialized_end=168
+  _globals['_ASSIGNMENT']._serialized_start=170
+  _globals['_ASSIGNMENT']._serialized_end=226
+  _globals['_TRYMATCHRESPONSE']._serialized_start=228
+  _globals['_TRYMATCHRESPONSE']._serialized_end=334
+  _globals['_MATCHINGSERVICE']._serialized_start=336
+  _globals['_MATCHINGSERVICE']._serialized_end=426
 # @@protoc_insertion_point(module_scope)
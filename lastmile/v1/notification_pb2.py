@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1elastmile/v1/notification.proto\x12\x0blastmile.v1\".\n\nPushTarget\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x0f\n\x07\x63hannel\x18\x02 \x01(\t\"g\n\x0bPushRequest\x12(\n\x07targets\x18\x01 \x03(\x0b\x32\x17.lastmile.v1.PushTarget\x12\r\n\x05title\x18\x02 \x01(\t\x12\x0c\n\x04\x62ody\x18\x03 \x01(\t\x12\x11\n\tdata_json\x18\x04 \x01(\t\"2\n\x0cPushResponse\x12\x11\n\tattempted\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x05\x32R\n\x13NotificationService\x12;\n\x04Push\x12\x18.lastmile.v1.PushRequest\x1a\x19.lastmile.v1.PushResponseB?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1elastmile/v1/notification.proto\x12\x0blastmile.v1\".\n\nPushTarget\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x0f\n\x07\x63hannel\x18\x02 \x01(\t\"g\n\x0bPushRequest\x12(\n\x07targets\x18\x01 \x03(\x0b\x32\x17.lastmile.v1.PushTarget\x12\r\n\x05title\x18\x02 \x01(\t\x12\x0c\n\x04\x62ody\x18\x03 \x01(\t\x12\x11\n\tdata_json\x18\x04 \x01(\t\"2\n\x0cPushResponse\x12\x11\n\tattempted\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x05\"<\n\x10PushBatchRequest\x12(\n\x06pushes\x18\x01 \x03(\x0b\x32\x18.lastmile.v1.PushRequest\"G\n\x10SubscribeRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08since_ms\x18\x02 \x01(\x03\x12\x10\n\x08\x61\x66ter_id\x18\x03 \x01(\t\"n\n\x0cNotification\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\r\n\x05title\x18\x03 \x01(\t\x12\x0c\n\x04\x62ody\x18\x04 \x01(\t\x12\x11\n\tdata_json\x18\x05 \x01(\t\x12\x11\n\ttimestamp\x18\x06 \x01(\x03\x32\xe2\x01\n\x13NotificationService\x12;\n\x04Push\x12\x18.lastmile.v1.PushRequest\x1a\x19.lastmile.v1.PushResponse\x12\x45\n\tPushBatch\x12\x1d.lastmile.v1.PushBatchRequest\x1a\x19.lastmile.v1.PushResponse\x12G\n\tSubscribe\x12\x1d.lastmile.v1.SubscribeRequest\x1a\x19.lastmile.v1.Notification0\x01\x42?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -38,6 +38,12 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_PUSHREQUEST']._serialized_end=198
   _globals['_PUSHRESPONSE']._serialized_start=200
   _globals['_PUSHRESPONSE']._serialized_end=250
-  _globals['_NOTIFICATIONSERVICE']._serialized_start=252
-  _globals['_NOTIFICATIONSERVICE']._serialized_end=334
+  _globals['_PUSHBATCHREQUEST']._serialized_start=252
+  _globals['_PUSHBATCHREQUEST']._serialized_end=312
+  _globals['_SUBSCRIBEREQUEST']._serialized_start=314
+  _globals['_SUBSCRIBEREQUEST']._serialized_end=385
+  _globals['_NOTIFICATION']._serialized_start=387
+  _globals['_NOTIFICATION']._serialized_end=497
+  _globals['_NOTIFICATIONSERVICE']._serialized_start=500
+  _globals['_NOTIFICATIONSERVICE']._serialized_end=726
 # @@protoc_insertion_point(module_scope)
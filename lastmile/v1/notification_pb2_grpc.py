@@ -39,6 +39,16 @@ class NotificationServiceStub(object):
                 request_serializer=lastmile_dot_v1_dot_notification__pb2.PushRequest.SerializeToString,
                 response_deserializer=lastmile_dot_v1_dot_notification__pb2.PushResponse.FromString,
                 _registered_method=True)
+        self.PushBatch = channel.unary_unary(
+                '/lastmile.v1.NotificationService/PushBatch',
+                request_serializer=lastmile_dot_v1_dot_notification__pb2.PushBatchRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_notification__pb2.PushResponse.FromString,
+                _registered_method=True)
+        self.Subscribe = channel.unary_stream(
+                '/lastmile.v1.NotificationService/Subscribe',
+                request_serializer=lastmile_dot_v1_dot_notification__pb2.SubscribeRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_notification__pb2.Notification.FromString,
+                _registered_method=True)
 
 
 class NotificationServiceServicer(object):
@@ -50,6 +60,22 @@ class NotificationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def PushBatch(self, request, context):
+        """Many pushes stored in one bulk insert (what producers' outboxes send)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Subscribe(self, request, context):
+        """Every notification pushed to user_id from now on. With since_ms set, stored
+        ones newer than that are sent first, so a reconnecting client misses nothing.
+        With after_id (the last one received), those stored in that same ms after it are sent too.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_NotificationServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -58,6 +84,16 @@ def add_NotificationServiceServicer_to_server(servicer, server):
                     request_deserializer=lastmile_dot_v1_dot_notification__pb2.PushRequest.FromString,
                     response_serializer=lastmile_dot_v1_dot_notification__pb2.PushResponse.SerializeToString,
             ),
+            'PushBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.PushBatch,
+                    request_deserializer=lastmile_dot_v1_dot_notification__pb2.PushBatchRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_notification__pb2.PushResponse.SerializeToString,
+            ),
+            'Subscribe': grpc.unary_stream_rpc_method_handler(
+                    servicer.Subscribe,
+                    request_deserializer=lastmile_dot_v1_dot_notification__pb2.SubscribeRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_notification__pb2.Notification.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'lastmile.v1.NotificationService', rpc_method_handlers)
@@ -95,3 +131,57 @@ class NotificationService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def PushBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lastmile.v1.NotificationService/PushBatch',
+            lastmile_dot_v1_dot_notification__pb2.PushBatchRequest.SerializeToString,
+            lastmile_dot_v1_dot_notification__pb2.PushResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Subscribe(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/lastmile.v1.NotificationService/Subscribe',
+            lastmile_dot_v1_dot_notification__pb2.SubscribeRequest.SerializeToString,
+            lastmile_dot_v1_dot_notification__pb2.Notification.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from lastmile.v1 import common_pb2 as lastmile_dot_v1_dot_common__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x17lastmile/v1/rider.proto\x12\x0blastmile.v1\x1a\x18lastmile/v1/common.proto\"?\n\x11\x41\x64\x64RequestRequest\x12*\n\x07request\x18\x01 \x01(\x0b\x32\x19.lastmile.v1.RiderRequest\"@\n\x12\x41\x64\x64RequestResponse\x12*\n\x07request\x18\x01 \x01(\x0b\x32\x19.lastmile.v1.RiderRequest\"n\n\x1bListPendingAtStationRequest\x12\x12\n\nstation_id\x18\x01 \x01(\t\x12\x10\n\x08now_unix\x18\x02 \x01(\x03\x12\x16\n\x0eminutes_window\x18\x03 \x01(\x05\x12\x11\n\tdest_area\x18\x04 \x01(\t\"K\n\x1cListPendingAtStationResponse\x12+\n\x08requests\x18\x01 \x03(\x0b\x32\x19.lastmile.v1.RiderRequest\";\n\x13MarkAssignedRequest\x12\x13\n\x0brequest_ids\x18\x01 \x03(\t\x12\x0f\n\x07trip_id\x18\x02 \x01(\t\"\'\n\x14MarkAssignedResponse\x12\x0f\n\x07updated\x18\x01 \x01(\x05\x32\x9f\x02\n\x0cRiderService\x12M\n\nAddRequest\x12\x1e.lastmile.v1.AddRequestRequest\x1a\x1f.lastmile.v1.AddRequestResponse\x12k\n\x14ListPendingAtStation\x12(.lastmile.v1.ListPendingAtStationRequest\x1a).lastmile.v1.ListPendingAtStationResponse\x12S\n\x0cMarkAssigned\x12 .lastmile.v1.MarkAssignedRequest\x1a!.lastmile.v1.MarkAssignedResponseB?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x17lastmile/v1/rider.proto\x12\x0blastmile.v1\x1a\x18lastmile/v1/common.proto\"?\n\x11\x41\x64\x64RequestRequest\x12*\n\x07request\x18\x01 \x01(\x0b\x32\x19.lastmile.v1.RiderRequest\"@\n\x12\x41\x64\x64RequestResponse\x12*\n\x07request\x18\x01 \x01(\x0b\x32\x19.lastmile.v1.RiderRequest\"n\n\x1bListPendingAtStationRequest\x12\x12\n\nstation_id\x18\x01 \x01(\t\x12\x10\n\x08now_unix\x18\x02 \x01(\x03\x12\x16\n\x0eminutes_window\x18\x03 \x01(\x05\x12\x11\n\tdest_area\x18\x04 \x01(\t\"K\n\x1cListPendingAtStationResponse\x12+\n\x08requests\x18\x01 \x03(\x0b\x32\x19.lastmile.v1.RiderRequest\";\n\x13MarkAssignedRequest\x12\x13\n\x0brequest_ids\x18\x01 \x03(\t\x12\x0f\n\x07trip_id\x18\x02 \x01(\t\"P\n\x14MarkAssignedResponse\x12\x0f\n\x07updated\x18\x01 \x01(\x05\x12\x14\n\x0c\x61ssigned_ids\x18\x02 \x03(\t\x12\x11\n\ttaken_ids\x18\x03 \x03(\t\"?\n\x17UnassignRequestsRequest\x12\x13\n\x0brequest_ids\x18\x01 \x03(\t\x12\x0f\n\x07trip_id\x18\x02 \x01(\t\"+\n\x18UnassignRequestsResponse\x12\x0f\n\x07updated\x18\x01 \x01(\x05\"<\n\x13WatchStationRequest\x12\x12\n\nstation_id\x18\x01 \x01(\t\x12\x11\n\tdest_area\x18\x02 \x01(\t\"[\n\rPendingChange\x12\n\n\x02op\x18\x01 \x01(\t\x12\x12\n\nrequest_id\x18\x02 \x01(\t\x12*\n\x07request\x18\x03 \x01(\x0b\x32\x19.lastmile.v1.RiderRequest2\xd0\x03\n\x0cRiderService\x12M\n\nAddRequest\x12\x1e.lastmile.v1.AddRequestRequest\x1a\x1f.lastmile.v1.AddRequestResponse\x12k\n\x14ListPendingAtStation\x12(.lastmile.v1.ListPendingAtStationRequest\x1a).lastmile.v1.ListPendingAtStationResponse\x12S\n\x0cMarkAssigned\x12 .lastmile.v1.MarkAssignedRequest\x1a!.lastmile.v1.MarkAssignedResponse\x12_\n\x10UnassignRequests\x12$.lastmile.v1.UnassignRequestsRequest\x1a%.lastmile.v1.UnassignRequestsResponse\x12N\n\x0cWatchStation\x12 .lastmile.v1.WatchStationRequest\x1a\x1a.lastmile.v1.PendingChange0\x01\x42?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -44,7 +44,15 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_MARKASSIGNEDREQUEST']._serialized_start=386
   _globals['_MARKASSIGNEDREQUEST']._serialized_end=445
   _globals['_MARKASSIGNEDRESPONSE']._serialized_start=447
-  _globals['_MARKASSIGNEDRESPONSE']._serialized_end=486
-  _globals['_RIDERSERVICE']._serialized_start=489
-  _globals['_RIDERSERVICE']._serialized_end=776
+  _globals['_MARKASSIGNEDRESPONSE']._serialized_end=527
+  _globals['_UNASSIGNREQUESTSREQUEST']._serialized_start=529
+  _globals['_UNASSIGNREQUESTSREQUEST']._serialized_end=592
+  _globals['_UNASSIGNREQUESTSRESPONSE']._serialized_start=594
+  _globals['_UNASSIGNREQUESTSRESPONSE']._serialized_end=637
+  _globals['_WATCHSTATIONREQUEST']._serialized_start=639
+  _globals['_WATCHSTATIONREQUEST']._serialized_end=699
+  _globals['_PENDINGCHANGE']._serialized_start=701
+  _globals['_PENDINGCHANGE']._serialized_end=792
+  _globals['_RIDERSERVICE']._serialized_start=795
+  _globals['_RIDERSERVICE']._serialized_end=1259
 # @@protoc_insertion_point(module_scope)
@@ -49,6 +49,16 @@ class RiderServiceStub(object):
                 request_serializer=lastmile_dot_v1_dot_rider__pb2.MarkAssignedRequest.SerializeToString,
                 response_deserializer=lastmile_dot_v1_dot_rider__pb2.MarkAssignedResponse.FromString,
                 _registered_method=True)
+        self.UnassignRequests = channel.unary_unary(
+                '/lastmile.v1.RiderService/UnassignRequests',
+                request_serializer=lastmile_dot_v1_dot_rider__pb2.UnassignRequestsRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_rider__pb2.UnassignRequestsResponse.FromString,
+                _registered_method=True)
+        self.WatchStation = channel.unary_stream(
+                '/lastmile.v1.RiderService/WatchStation',
+                request_serializer=lastmile_dot_v1_dot_rider__pb2.WatchStationRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_rider__pb2.PendingChange.FromString,
+                _registered_method=True)
 
 
 class RiderServiceServicer(object):
@@ -72,6 +82,18 @@ class RiderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def UnassignRequests(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchStation(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RiderServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -90,6 +112,16 @@ def add_RiderServiceServicer_to_server(servicer, server):
                     request_deserializer=lastmile_dot_v1_dot_rider__pb2.MarkAssignedRequest.FromString,
                     response_serializer=lastmile_dot_v1_dot_rider__pb2.MarkAssignedResponse.SerializeToString,
             ),
+            'UnassignRequests': grpc.unary_unary_rpc_method_handler(
+                    servicer.UnassignRequests,
+                    request_deserializer=lastmile_dot_v1_dot_rider__pb2.UnassignRequestsRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_rider__pb2.UnassignRequestsResponse.SerializeToString,
+            ),
+            'WatchStation': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchStation,
+                    request_deserializer=lastmile_dot_v1_dot_rider__pb2.WatchStationRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_rider__pb2.PendingChange.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'lastmile.v1.RiderService', rpc_method_handlers)
@@ -181,3 +213,57 @@ class RiderService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def UnassignRequests(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lastmile.v1.RiderService/UnassignRequests',
+            lastmile_dot_v1_dot_rider__pb2.UnassignRequestsRequest.SerializeToString,
+            lastmile_dot_v1_dot_rider__pb2.UnassignRequestsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchStation(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/lastmile.v1.RiderService/WatchStation',
+            lastmile_dot_v1_dot_rider__pb2.WatchStationRequest.SerializeToString,
+            lastmile_dot_v1_dot_rider__pb2.PendingChange.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from lastmile.v1 import common_pb2 as lastmile_dot_v1_dot_common__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x19lastmile/v1/station.proto\x12\x0blastmile.v1\x1a\x18lastmile/v1/common.proto\"=\n\x14UpsertStationRequest\x12%\n\x07station\x18\x01 \x01(\x0b\x32\x14.lastmile.v1.Station\">\n\x15UpsertStationResponse\x12%\n\x07station\x18\x01 \x01(\x0b\x32\x14.lastmile.v1.Station\"\x1f\n\x11GetStationRequest\x12\n\n\x02id\x18\x01 \x01(\t\";\n\x12GetStationResponse\x12%\n\x07station\x18\x01 \x01(\x0b\x32\x14.lastmile.v1.Station\">\n\x14ListStationsResponse\x12&\n\x08stations\x18\x01 \x03(\x0b\x32\x14.lastmile.v1.Station\"+\n\x13NearbyAreasResponse\x12\x14\n\x0cnearby_areas\x18\x01 \x03(\t2\xcf\x02\n\x0eStationService\x12V\n\rUpsertStation\x12!.lastmile.v1.UpsertStationRequest\x1a\".lastmile.v1.UpsertStationResponse\x12M\n\nGetStation\x12\x1e.lastmile.v1.GetStationRequest\x1a\x1f.lastmile.v1.GetStationResponse\x12\x45\n\x0cListStations\x12\x12.lastmile.v1.Empty\x1a!.lastmile.v1.ListStationsResponse\x12O\n\x0bNearbyAreas\x12\x1e.lastmile.v1.GetStationRequest\x1a .lastmile.v1.NearbyAreasResponseB?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x19lastmile/v1/station.proto\x12\x0blastmile.v1\x1a\x18lastmile/v1/common.proto\"=\n\x14UpsertStationRequest\x12%\n\x07station\x18\x01 \x01(\x0b\x32\x14.lastmile.v1.Station\">\n\x15UpsertStationResponse\x12%\n\x07station\x18\x01 \x01(\x0b\x32\x14.lastmile.v1.Station\"\x1f\n\x11GetStationRequest\x12\n\n\x02id\x18\x01 \x01(\t\";\n\x12GetStationResponse\x12%\n\x07station\x18\x01 \x01(\x0b\x32\x14.lastmile.v1.Station\">\n\x14ListStationsResponse\x12&\n\x08stations\x18\x01 \x03(\x0b\x32\x14.lastmile.v1.Station\"+\n\x13NearbyAreasResponse\x12\x14\n\x0cnearby_areas\x18\x01 \x03(\t\"\x16\n\x14WatchStationsRequest\"V\n\rStationChange\x12\n\n\x02op\x18\x01 \x01(\t\x12\x12\n\nstation_id\x18\x02 \x01(\t\x12%\n\x07station\x18\x03 \x01(\x0b\x32\x14.lastmile.v1.Station2\xa1\x03\n\x0eStationService\x12V\n\rUpsertStation\x12!.lastmile.v1.UpsertStationRequest\x1a\".lastmile.v1.UpsertStationResponse\x12M\n\nGetStation\x12\x1e.lastmile.v1.GetStationRequest\x1a\x1f.lastmile.v1.GetStationResponse\x12\x45\n\x0cListStations\x12\x12.lastmile.v1.Empty\x1a!.lastmile.v1.ListStationsResponse\x12O\n\x0bNearbyAreas\x12\x1e.lastmile.v1.GetStationRequest\x1a .lastmile.v1.NearbyAreasResponse\x12P\n\rWatchStations\x12!.lastmile.v1.WatchStationsRequest\x1a\x1a.lastmile.v1.StationChange0\x01\x42?Z=github.com/yourorg/lastmile/api/gen/go/lastmile/v1;lastmilev1b\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -45,6 +45,10 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_LISTSTATIONSRESPONSE']._serialized_end=351
   _globals['_NEARBYAREASRESPONSE']._serialized_start=353
   _globals['_NEARBYAREASRESPONSE']._serialized_end=396
-  _globals['_STATIONSERVICE']._serialized_start=399
-  _globals['_STATIONSERVICE']._serialized_end=734
+  _globals['_WATCHSTATIONSREQUEST']._serialized_start=398
+  _globals['_WATCHSTATIONSREQUEST']._serialized_end=420
+  _globals['_STATIONCHANGE']._serialized_start=422
+  _globals['_STATIONCHANGE']._serialized_end=508
+  _globals['_STATIONSERVICE']._serialized_start=511
+  _globals['_STATIONSERVICE']._serialized_end=928
 # @@protoc_insertion_point(module_scope)
@@ -55,6 +55,11 @@ class StationServiceStub(object):
                 request_serializer=lastmile_dot_v1_dot_station__pb2.GetStationRequest.SerializeToString,
                 response_deserializer=lastmile_dot_v1_dot_station__pb2.NearbyAreasResponse.FromString,
                 _registered_method=True)
+        self.WatchStations = channel.unary_stream(
+                '/lastmile.v1.StationService/WatchStations',
+                request_serializer=lastmile_dot_v1_dot_station__pb2.WatchStationsRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_station__pb2.StationChange.FromString,
+                _registered_method=True)
 
 
 class StationServiceServicer(object):
@@ -84,6 +89,12 @@ class StationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchStations(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_StationServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -107,6 +118,11 @@ def add_StationServiceServicer_to_server(servicer, server):
                     request_deserializer=lastmile_dot_v1_dot_station__pb2.GetStationRequest.FromString,
                     response_serializer=lastmile_dot_v1_dot_station__pb2.NearbyAreasResponse.SerializeToString,
             ),
+            'WatchStations': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchStations,
+                    request_deserializer=lastmile_dot_v1_dot_station__pb2.WatchStationsRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_station__pb2.StationChange.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'lastmile.v1.StationService', rpc_method_handlers)
@@ -225,3 +241,30 @@ class StationService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def WatchStations(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/lastmile.v1.StationService/WatchStations',
+            lastmile_dot_v1_dot_station__pb2.WatchStationsRequest.SerializeToString,
+            lastmile_dot_v1_dot_station__pb2.StationChange.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
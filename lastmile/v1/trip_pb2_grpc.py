@@ -44,6 +44,11 @@ class TripServiceStub(object):
                 request_serializer=lastmile_dot_v1_dot_trip__pb2.UpdateTripStatusRequest.SerializeToString,
                 response_deserializer=lastmile_dot_v1_dot_trip__pb2.UpdateTripStatusResponse.FromString,
                 _registered_method=True)
+        self.RemoveRiders = channel.unary_unary(
+                '/lastmile.v1.TripService/RemoveRiders',
+                request_serializer=lastmile_dot_v1_dot_trip__pb2.RemoveRidersRequest.SerializeToString,
+                response_deserializer=lastmile_dot_v1_dot_trip__pb2.RemoveRidersResponse.FromString,
+                _registered_method=True)
 
 
 class TripServiceServicer(object):
@@ -61,6 +66,12 @@ class TripServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RemoveRiders(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_TripServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -74,6 +85,11 @@ def add_TripServiceServicer_to_server(servicer, server):
                     request_deserializer=lastmile_dot_v1_dot_trip__pb2.UpdateTripStatusRequest.FromString,
                     response_serializer=lastmile_dot_v1_dot_trip__pb2.UpdateTripStatusResponse.SerializeToString,
             ),
+            'RemoveRiders': grpc.unary_unary_rpc_method_handler(
+                    servicer.RemoveRiders,
+                    request_deserializer=lastmile_dot_v1_dot_trip__pb2.RemoveRidersRequest.FromString,
+                    response_serializer=lastmile_dot_v1_dot_trip__pb2.RemoveRidersResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'lastmile.v1.TripService', rpc_method_handlers)
@@ -138,3 +154,30 @@ class TripService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def RemoveRiders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lastmile.v1.TripService/RemoveRiders',
+            lastmile_dot_v1_dot_trip__pb2.RemoveRidersRequest.SerializeToString,
+            lastmile_dot_v1_dot_trip__pb2.RemoveRidersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,89 @@
+"""Concurrent-RPC throughput of UserService.GetUser, blocking vs async Mongo access.
+
+Runs a real grpc.aio server in-process against a stand-in collection that
+sleeps for DB_LATENCY_MS per call (a slow find_one). "blocking" awaits the
+driver inline, which is what the servicers did before common.db grew
+AsyncCollection; "async" goes through the bounded executor.
+
+    python scripts/bench_db.py --rpcs 400 --concurrency 50 --latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import grpc
+from bson.objectid import ObjectId
+from lastmile.v1 import user_pb2, user_pb2_grpc
+from common.db import AsyncCollection
+from services.user_svc import UserServer
+
+
+class SlowUsers:
+    """pymongo-shaped stand-in: every call blocks the calling thread."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.doc = {"_id": ObjectId(), "role": 1, "name": "bench", "phone": "000"}
+
+    def find_one(self, *args, **kwargs):
+        time.sleep(self.latency_s)
+        return self.doc
+
+
+class InlineCollection(AsyncCollection):
+    """Runs the driver call on the event loop thread, i.e. the old behaviour."""
+
+    async def _run(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+async def run_mode(mode: str, rpcs: int, concurrency: int, latency_s: float, workers: int) -> dict:
+    users = SlowUsers(latency_s)
+    svc = UserServer.__new__(UserServer)
+    if mode == "blocking":
+        svc.users = InlineCollection(users)
+    else:
+        svc.users = AsyncCollection(users, ThreadPoolExecutor(max_workers=workers))
+
+    server = grpc.aio.server()
+    user_pb2_grpc.add_UserServiceServicer_to_server(svc, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+
+    sem = asyncio.Semaphore(concurrency)
+    async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as ch:
+        stub = user_pb2_grpc.UserServiceStub(ch)
+        await stub.GetUser(user_pb2.GetUserRequest(id=str(users.doc["_id"])))
+
+        async def one():
+            async with sem:
+                await stub.GetUser(user_pb2.GetUserRequest(id=str(users.doc["_id"])))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(rpcs)))
+        elapsed = time.perf_counter() - t0
+
+    await server.stop(None)
+    return {"mode": mode, "rpcs": rpcs, "seconds": round(elapsed, 3), "rps": round(rpcs / elapsed, 1)}
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--rpcs", type=int, default=400)
+    p.add_argument("--concurrency", type=int, default=50)
+    p.add_argument("--latency-ms", type=float, default=5.0)
+    p.add_argument("--workers", type=int, default=16)
+    a = p.parse_args()
+
+    for mode in ("blocking", "async"):
+        r = asyncio.run(run_mode(mode, a.rpcs, a.concurrency, a.latency_ms / 1000, a.workers))
+        print(f"{r['mode']:>9}: {r['rpcs']} RPCs in {r['seconds']}s -> {r['rps']} rpc/s")
+
+
+if __name__ == "__main__":
+    main()
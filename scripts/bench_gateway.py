@@ -0,0 +1,79 @@
+"""Gateway latency: fresh channel per request vs the pooled ChannelRegistry.
+
+Boots an in-process UserService stand-in and drives `/api/login` (which makes
+two UserService calls) through Flask's test client, once with the old
+per-request `grpc.insecure_channel` and once with `gateway.channels`.
+
+    python scripts/bench_gateway.py --requests 500 --threads 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent import futures
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import grpc
+from lastmile.v1 import user_pb2, user_pb2_grpc, common_pb2
+
+
+class FakeUsers(user_pb2_grpc.UserServiceServicer):
+    def Authenticate(self, request, context):
+        return user_pb2.AuthenticateResponse(user_id="u1", jwt="demo-jwt")
+
+    def GetUser(self, request, context):
+        return user_pb2.GetUserResponse(user=common_pb2.User(id="u1", role=common_pb2.RIDER, name="bench"))
+
+
+def run(mode: str, n: int, threads: int) -> dict:
+    import gateway
+    if mode == "fresh":
+        gateway.get_user_stub = lambda: user_pb2_grpc.UserServiceStub(grpc.insecure_channel(gateway.USER_ADDR))
+    else:
+        gateway.get_user_stub = lambda: gateway.channels.stub(gateway.USER_ADDR, user_pb2_grpc.UserServiceStub)
+        gateway.channels.warmup([gateway.USER_ADDR])
+
+    client = gateway.app.test_client()
+    body = {"phone": "000", "password": "x"}
+
+    def one(_):
+        t0 = time.perf_counter()
+        r = client.post("/api/login", json=body)
+        assert r.status_code == 200, r.data
+        return (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        lat = sorted(pool.map(one, range(n)))
+    elapsed = time.perf_counter() - t0
+    gateway.channels.close()
+    return {
+        "mode": mode,
+        "rps": round(n / elapsed, 1),
+        "p50_ms": round(statistics.median(lat), 2),
+        "p95_ms": round(lat[int(len(lat) * 0.95) - 1], 2),
+        "p99_ms": round(lat[int(len(lat) * 0.99) - 1], 2),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--requests", type=int, default=500)
+    p.add_argument("--threads", type=int, default=8)
+    a = p.parse_args()
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
+    user_pb2_grpc.add_UserServiceServicer_to_server(FakeUsers(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    os.environ["USER_ADDR"] = f"127.0.0.1:{port}"
+
+    for mode in ("fresh", "pooled"):
+        print(run(mode, a.requests, a.threads))
+    server.stop(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Geo microbenchmarks.
+
+1. Geofence cost per ping: scan every station vs GeoGrid lookup. Stations are
+   scattered over a ~30 km square around Bengaluru; each ping is a random
+   point in the same square and asks which stations are within 400 m.
+2. Drivers x stations distances: scalar haversine_m loop vs haversine_matrix
+   (float64 and float32).
+
+    python scripts/bench_geo.py --pings 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from common.geo import GeoGrid, haversine_m, haversine_matrix
+
+RADIUS_M = 400.0
+LAT0, LON0, SPAN = 12.85, 77.45, 0.3
+
+
+def bench_geofence(n_stations: int, pings: int, rnd: random.Random):
+    stations = [(f"s{i}", LAT0 + rnd.random() * SPAN, LON0 + rnd.random() * SPAN) for i in range(n_stations)]
+    grid = GeoGrid(cell_m=RADIUS_M)
+    for k, lat, lon in stations:
+        grid.insert(k, lat, lon)
+    pts = [(LAT0 + rnd.random() * SPAN, LON0 + rnd.random() * SPAN) for _ in range(pings)]
+
+    t0 = time.perf_counter()
+    for lat, lon in pts:
+        [k for k, a, b in stations if haversine_m(lat, lon, a, b) <= RADIUS_M]
+    scan_us = (time.perf_counter() - t0) / pings * 1e6
+
+    t0 = time.perf_counter()
+    for lat, lon in pts:
+        grid.near(lat, lon, RADIUS_M)
+    grid_us = (time.perf_counter() - t0) / pings * 1e6
+    return scan_us, grid_us
+
+
+def bench_matrix(n_drivers: int, n_stations: int, rnd: random.Random):
+    dl = [(LAT0 + rnd.random() * SPAN, LON0 + rnd.random() * SPAN) for _ in range(n_drivers)]
+    sl = [(LAT0 + rnd.random() * SPAN, LON0 + rnd.random() * SPAN) for _ in range(n_stations)]
+
+    t0 = time.perf_counter()
+    [[haversine_m(a, b, c, d) for c, d in sl] for a, b in dl]
+    scalar_ms = (time.perf_counter() - t0) * 1e3
+
+    dlat, dlon = np.array([p[0] for p in dl]), np.array([p[1] for p in dl])
+    slat, slon = np.array([p[0] for p in sl]), np.array([p[1] for p in sl])
+    out = []
+    for dtype in (np.float64, np.float32):
+        t0 = time.perf_counter()
+        haversine_matrix(dlat, dlon, slat, slon, dtype=dtype)
+        out.append((time.perf_counter() - t0) * 1e3)
+    return scalar_ms, out[0], out[1]
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--pings", type=int, default=2000)
+    a = p.parse_args()
+    rnd = random.Random(1)
+
+    print(f"{'stations':>9} {'scan us/ping':>13} {'grid us/ping':>13}")
+    for n in (100, 1000, 10000):
+        scan_us, grid_us = bench_geofence(n, a.pings, rnd)
+        print(f"{n:>9} {scan_us:>13.1f} {grid_us:>13.1f}")
+
+    print()
+    print(f"{'drivers x stations':>19} {'scalar ms':>10} {'f64 ms':>8} {'f32 ms':>8}")
+    for nd, ns in ((100, 100), (1000, 100), (5000, 1000)):
+        scalar_ms, f64_ms, f32_ms = bench_matrix(nd, ns, rnd)
+        print(f"{f'{nd} x {ns}':>19} {scalar_ms:>10.1f} {f64_ms:>8.2f} {f32_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
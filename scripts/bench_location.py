@@ -0,0 +1,103 @@
+"""Location ingestion throughput: one ping at a time vs BatchDriverLocations.
+
+LocationServer runs in-process with stand-in Driver/Station/Matching stubs
+(routes and stations are cached after the first ping, as in production), so
+this measures the geofence + bookkeeping cost per ping on one core.
+
+    python scripts/bench_location.py --routes 1000 --pings 50000 --batch 512
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lastmile.v1 import location_pb2, driver_pb2, station_pb2, matching_pb2, common_pb2
+from services import location_svc
+from services.location_svc import LocationServer
+
+LAT0, LON0, SPAN = 12.85, 77.45, 0.3
+
+
+class FakeDriver:
+    def __init__(self, routes):
+        self.routes = routes
+
+    async def GetRoute(self, req):
+        return driver_pb2.GetRouteResponse(route=self.routes[req.route_id])
+
+
+class FakeStation:
+    def __init__(self, coords):
+        self.coords = coords
+
+    async def GetStation(self, req):
+        lat, lon = self.coords[req.id]
+        return station_pb2.GetStationResponse(station=common_pb2.Station(id=req.id, location=common_pb2.LatLng(lat=lat, lon=lon)))
+
+
+class FakeMatch:
+    async def TryMatch(self, req):
+        return matching_pb2.TryMatchResponse()
+
+
+def build(n_routes, stations_per_route, rnd):
+    coords, routes = {}, {}
+    for r in range(n_routes):
+        ids = []
+        for k in range(stations_per_route):
+            sid = f"s{r}_{k}"
+            coords[sid] = (LAT0 + rnd.random() * SPAN, LON0 + rnd.random() * SPAN)
+            ids.append(driver_pb2.RouteStation(station_id=sid, minutes_before_eta_match=5))
+        routes[f"r{r}"] = driver_pb2.DriverRoute(id=f"r{r}", driver_id=f"d{r}", stations=ids)
+    return coords, routes
+
+
+def make_server(coords, routes):
+    with patch('grpc.aio.insecure_channel'):
+        svc = LocationServer()
+    svc.driver, svc.station, svc.match = FakeDriver(routes), FakeStation(coords), FakeMatch()
+    return svc
+
+
+async def run(a):
+    rnd = random.Random(3)
+    coords, routes = build(a.routes, a.stations, rnd)
+    pings = [location_pb2.DriverLocation(
+        driver_id=f"d{i % a.routes}", route_id=f"r{i % a.routes}", ts_unix=1000,
+        point=common_pb2.LatLng(lat=LAT0 + rnd.random() * SPAN, lon=LON0 + rnd.random() * SPAN),
+    ) for i in range(a.pings)]
+
+    results = {}
+    for mode in ("single", "batched"):
+        svc = make_server(coords, routes)
+        await svc._process_batch(pings[:a.routes])  # warm route/station caches
+        t0 = time.perf_counter()
+        if mode == "single":
+            for p in pings:
+                await svc._process_batch([p])
+        else:
+            for i in range(0, len(pings), a.batch):
+                await svc.BatchDriverLocations(location_pb2.BatchDriverLocationsRequest(locations=pings[i:i + a.batch]), None)
+        results[mode] = a.pings / (time.perf_counter() - t0)
+    for mode, pps in results.items():
+        print(f"{mode:>8}: {pps:,.0f} pings/s")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--routes", type=int, default=1000)
+    p.add_argument("--stations", type=int, default=10, help="stations per route")
+    p.add_argument("--pings", type=int, default=50000)
+    p.add_argument("--batch", type=int, default=512)
+    a = p.parse_args()
+    location_svc.print = lambda *args, **kw: None  # keep per-call logging out of the measurement
+    asyncio.run(run(a))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""CPU spent on request logging per RPC: the old print() lines vs. common.log.
+
+Each case logs one line shaped like a handler's request line (a RiderRequest,
+as AddRequest / ListPendingAtStation log it) N times, with stdout going to
+/dev/null. `caller us` is the time the handler itself spends, which is what
+the event loop pays. `cpu us` is total process CPU including the log writer
+thread, divided by N.
+
+    python scripts/bench_logging.py --n 20000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lastmile.v1 import common_pb2, rider_pb2
+from common import log as logmod
+
+REQ = rider_pb2.AddRequestRequest(request=common_pb2.RiderRequest(
+    id="65f0c0ffee0000000000beef", rider_id="r42", station_id="s7", dest_area="Area A",
+    eta_unix=1_700_000_000, status="PENDING"))
+
+
+def run(label: str, fn, n: int):
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    for _ in range(n):
+        fn()
+    caller = (time.perf_counter() - t0) / n * 1e6
+    logmod.shutdown()  # wait for the writer thread to drain
+    cpu = (time.process_time() - cpu0) / n * 1e6
+    print(f"{label:<28} {caller:>10.2f} {cpu:>10.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    args = ap.parse_args()
+    sink = open(os.devnull, "w")
+    print(f"{'case':<28} {'caller us':>10} {'cpu us':>10}")
+
+    def old_print():
+        print(f"[rider] AddRequest request={REQ}", file=sink)
+    run("print() (before)", old_print, args.n)
+
+    for label, level, fmt, call in (
+        ("log.debug at INFO (default)", "INFO", "json", lambda log: log.debug("AddRequest", request=REQ)),
+        ("log.info json", "INFO", "json", lambda log: log.info("AddRequest", request=REQ)),
+        ("log.sampled 1% json", "INFO", "json", lambda log: log.sampled("AddRequest", request=REQ)),
+    ):
+        logmod.configure(stream=sink, fmt=fmt, level=level, queue_size=args.n + 1)
+        log = logmod.Logger("rider", sample_rate=0.01)
+        run(label, lambda: call(log), args.n)
+
+
+if __name__ == "__main__":
+    main()
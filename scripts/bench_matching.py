@@ -0,0 +1,71 @@
+"""Batch matching: solve time and quality vs. problem size.
+
+For each size, D drivers (1-4 free seats, arrival ETAs spread over the
+batch window) meet R pending riders (ETAs within +/- 12 min) at one
+station. plan_batch solves the seat/rider assignment exactly; the greedy
+baseline is today's TryMatch applied to drivers in arrival order. Use the
+solve times to pick MATCH_BATCH_WINDOW_MS: a window should not collect more
+drivers than can be solved well inside it.
+
+    python scripts/bench_matching.py --sizes 5x20 20x80 50x200 100x400
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lastmile.v1 import common_pb2
+from services.matching_svc import eta_cost, plan_batch
+
+NOW = 1_700_000_000
+
+
+def greedy(arrivals, riders):
+    left = list(riders)
+    out = []
+    for eta, seats in sorted(arrivals):
+        left.sort(key=lambda r: (eta_cost(r, eta), r.eta_unix))
+        out.append((eta, left[:seats]))
+        left = left[seats:]
+    return out
+
+
+def total(pairs):
+    return sum(eta_cost(r, eta) for eta, rs in pairs for r in rs)
+
+
+def bench(drivers: int, riders: int, window_s: int, reps: int, rnd: random.Random):
+    arrivals = [(NOW + rnd.randint(0, window_s), rnd.randint(1, 4)) for _ in range(drivers)]
+    pending = [common_pb2.RiderRequest(id=str(i), eta_unix=NOW + rnd.randint(-720, 720)) for i in range(riders)]
+
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        plan = plan_batch(arrivals, pending)
+    solve_ms = (time.perf_counter() - t0) / reps * 1e3
+
+    opt = total(zip((eta for eta, _ in arrivals), plan))
+    base = total(greedy(arrivals, pending))
+    return solve_ms, opt, base
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", nargs="+", default=["5x20", "20x80", "50x200", "100x400"],
+                    help="DRIVERSxRIDERS")
+    ap.add_argument("--window-s", type=int, default=60, help="spread of driver arrival ETAs")
+    ap.add_argument("--reps", type=int, default=5)
+    args = ap.parse_args()
+
+    rnd = random.Random(1)
+    print(f"{'drivers':>8} {'riders':>8} {'solve ms':>10} {'opt cost':>10} {'greedy cost':>12}")
+    for size in args.sizes:
+        d, r = (int(x) for x in size.split("x"))
+        ms, opt, base = bench(d, r, args.window_s, args.reps, rnd)
+        print(f"{d:>8} {r:>8} {ms:>10.2f} {opt:>10} {base:>12}")
+
+
+if __name__ == "__main__":
+    main()
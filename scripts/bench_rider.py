@@ -0,0 +1,57 @@
+"""Pending-rider lookup cost vs. number of stored requests.
+
+Fills a RiderStore with N PENDING requests spread over S stations x A
+destination areas and +/- 2 h of ETAs, then times the ListPendingAtStation
+window query (+/- 12 min, as TryMatch asks for). Apart from copying out
+the hits, time per query should not grow with N.
+
+    python scripts/bench_rider.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lastmile.v1 import common_pb2
+from services.rider_svc import RiderStore
+
+NOW = 1_700_000_000
+
+
+def bench(n: int, stations: int, areas: int, queries: int, rnd: random.Random):
+    store = RiderStore()
+    for i in range(n):
+        store.add(common_pb2.RiderRequest(
+            id=f"{i:024x}", rider_id=f"r{i}", station_id=f"s{rnd.randrange(stations)}",
+            dest_area=f"a{rnd.randrange(areas)}", eta_unix=NOW + rnd.randint(-7200, 7200), status="PENDING",
+        ))
+    qs = [(f"s{rnd.randrange(stations)}", f"a{rnd.randrange(areas)}") for _ in range(queries)]
+
+    hits = 0
+    t0 = time.perf_counter()
+    for station_id, dest_area in qs:
+        hits += len(store.window(station_id, dest_area, NOW - 720, NOW + 720))
+    us = (time.perf_counter() - t0) / queries * 1e6
+    return us, hits / queries
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--stations", type=int, default=200)
+    ap.add_argument("--areas", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=20000)
+    args = ap.parse_args()
+
+    rnd = random.Random(1)
+    print(f"{'requests':>10} {'us/query':>10} {'avg hits':>10}")
+    for n in args.sizes:
+        us, hits = bench(n, args.stations, args.areas, args.queries, rnd)
+        print(f"{n:>10} {us:>10.2f} {hits:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
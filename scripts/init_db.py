@@ -1,99 +1,103 @@
+import argparse
 import sys
 import os
 
 # Add the project root to the Python path to import common modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from common.db import get_db
+from common.db import get_db, ensure_indexes, verify_indexes, backfill_rider_expiry
+
+STATIONS = [
+    {
+        "id": "MG_ROAD",
+        "name": "MG Road Metro",
+        "lat": 12.9756,
+        "lon": 77.6069,
+        "nearbyAreas": ["Indiranagar", "Domlur", "Ulsoor", "Ashok Nagar"],
+    },
+    {
+        "id": "TRINITY",
+        "name": "Trinity Metro",
+        "lat": 12.9730,
+        "lon": 77.6170,
+        "nearbyAreas": ["HAL", "Old Airport Road", "Jeevanbhima Nagar"],
+    },
+    {
+        "id": "RV_ROAD",
+        "name": "RV Road Metro",
+        "lat": 12.9213,
+        "lon": 77.5802,
+        "nearbyAreas": ["Basavanagudi", "Gandhi Bazaar", "Jayanagar"],
+    },
+    {
+        "id": "CUBBON_PARK",
+        "name": "Cubbon Park Metro",
+        "lat": 12.9809,
+        "lon": 77.5975,
+        "nearbyAreas": ["MG Road", "Brigade Road", "Shivaji Nagar"],
+    },
+    # Additional Stations
+    {
+        "id": "INDIRANAGAR",
+        "name": "Indiranagar Metro",
+        "lat": 12.9783,
+        "lon": 77.6386,
+        "nearbyAreas": ["Indiranagar 100ft Road", "CMH Road", "New Tippasandra"],
+    },
+    {
+        "id": "BAIYAPPANAHALLI",
+        "name": "Baiyappanahalli Metro",
+        "lat": 12.9907,
+        "lon": 77.6523,
+        "nearbyAreas": ["CV Raman Nagar", "Kasturi Nagar", "Old Madras Road"],
+    },
+    {
+        "id": "MAJESTIC",
+        "name": "Nadaprabhu Kempegowda (Majestic)",
+        "lat": 12.9757,
+        "lon": 77.5728,
+        "nearbyAreas": ["Gandhinagar", "Chickpet", "Cottonpet", "KSR Railway Station"],
+    },
+    {
+        "id": "VIJAYANAGAR",
+        "name": "Vijayanagar Metro",
+        "lat": 12.9709,
+        "lon": 77.5374,
+        "nearbyAreas": ["Vijayanagar", "RPC Layout", "Chandra Layout"],
+    },
+    {
+        "id": "JAYANAGAR",
+        "name": "Jayanagar Metro",
+        "lat": 12.9295,
+        "lon": 77.5801,
+        "nearbyAreas": ["Jayanagar 4th Block", "Tilak Nagar", "Yediyur"],
+    },
+    {
+        "id": "BANASHANKARI",
+        "name": "Banashankari Metro",
+        "lat": 12.9152,
+        "lon": 77.5735,
+        "nearbyAreas": ["Banashankari 2nd Stage", "Padmanabhanagar", "Kumaraswamy Layout"],
+    }
+]
+
+def station_doc(s: dict) -> dict:
+    """A STATIONS entry in the stations collection's format (see station_svc.py)."""
+    return {
+        "_id": s["id"],
+        "name": s["name"],
+        "location": {"lat": s["lat"], "lon": s["lon"]},
+        "nearby_areas": s["nearbyAreas"]
+    }
 
 def init_stations():
     db = get_db()
     stations_collection = db.stations
 
-    stations_data = [
-        {
-            "id": "MG_ROAD",
-            "name": "MG Road Metro",
-            "lat": 12.9756,
-            "lon": 77.6069,
-            "nearbyAreas": ["Indiranagar", "Domlur", "Ulsoor", "Ashok Nagar"],
-        },
-        {
-            "id": "TRINITY",
-            "name": "Trinity Metro",
-            "lat": 12.9730,
-            "lon": 77.6170,
-            "nearbyAreas": ["HAL", "Old Airport Road", "Jeevanbhima Nagar"],
-        },
-        {
-            "id": "RV_ROAD",
-            "name": "RV Road Metro",
-            "lat": 12.9213,
-            "lon": 77.5802,
-            "nearbyAreas": ["Basavanagudi", "Gandhi Bazaar", "Jayanagar"],
-        },
-        {
-            "id": "CUBBON_PARK",
-            "name": "Cubbon Park Metro",
-            "lat": 12.9809,
-            "lon": 77.5975,
-            "nearbyAreas": ["MG Road", "Brigade Road", "Shivaji Nagar"],
-        },
-        # Additional Stations
-        {
-            "id": "INDIRANAGAR",
-            "name": "Indiranagar Metro",
-            "lat": 12.9783,
-            "lon": 77.6386,
-            "nearbyAreas": ["Indiranagar 100ft Road", "CMH Road", "New Tippasandra"],
-        },
-        {
-            "id": "BAIYAPPANAHALLI",
-            "name": "Baiyappanahalli Metro",
-            "lat": 12.9907,
-            "lon": 77.6523,
-            "nearbyAreas": ["CV Raman Nagar", "Kasturi Nagar", "Old Madras Road"],
-        },
-        {
-            "id": "MAJESTIC",
-            "name": "Nadaprabhu Kempegowda (Majestic)",
-            "lat": 12.9757,
-            "lon": 77.5728,
-            "nearbyAreas": ["Gandhinagar", "Chickpet", "Cottonpet", "KSR Railway Station"],
-        },
-        {
-            "id": "VIJAYANAGAR",
-            "name": "Vijayanagar Metro",
-            "lat": 12.9709,
-            "lon": 77.5374,
-            "nearbyAreas": ["Vijayanagar", "RPC Layout", "Chandra Layout"],
-        },
-        {
-            "id": "JAYANAGAR",
-            "name": "Jayanagar Metro",
-            "lat": 12.9295,
-            "lon": 77.5801,
-            "nearbyAreas": ["Jayanagar 4th Block", "Tilak Nagar", "Yediyur"],
-        },
-        {
-            "id": "BANASHANKARI",
-            "name": "Banashankari Metro",
-            "lat": 12.9152,
-            "lon": 77.5735,
-            "nearbyAreas": ["Banashankari 2nd Stage", "Padmanabhanagar", "Kumaraswamy Layout"],
-        }
-    ]
-
     print("Initializing stations database...")
     
-    for s in stations_data:
-        # Map user format to DB format used in station_svc.py
-        doc = {
-            "_id": s["id"],
-            "name": s["name"],
-            "location": {"lat": s["lat"], "lon": s["lon"]},
-            "nearby_areas": s["nearbyAreas"]
-        }
+    for s in STATIONS:
+        doc = station_doc(s)
         
         # Upsert: Insert if new, update if exists
         result = stations_collection.replace_one({"_id": s["id"]}, doc, upsert=True)
@@ -101,7 +105,33 @@ def init_stations():
         action = "Updated" if result.matched_count > 0 else "Inserted"
         print(f"{action} station: {s['name']} ({s['id']})")
 
-    print(f"\nSuccessfully initialized {len(stations_data)} stations.")
+    print(f"\nSuccessfully initialized {len(STATIONS)} stations.")
+
+def init_indexes():
+    print("Ensuring indexes...")
+    if not ensure_indexes(get_db()):
+        sys.exit(1)
+    print("Indexes up to date.")
+    n = backfill_rider_expiry(get_db())
+    if n:
+        print(f"Set expire_at on {n} pending rider requests.")
+
+def check_indexes():
+    """Exit non-zero if any hot query would fall back to a COLLSCAN."""
+    bad = verify_indexes(get_db())
+    for coll, flt in bad:
+        print(f"COLLSCAN: {coll}.find({flt})")
+    if bad:
+        sys.exit(1)
+    print("All hot queries use an index.")
 
 if __name__ == "__main__":
-    init_stations()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true",
+                        help="only explain() the hot queries and fail on COLLSCAN")
+    args = parser.parse_args()
+    if args.check:
+        check_indexes()
+    else:
+        init_stations()
+        init_indexes()
\ No newline at end of file
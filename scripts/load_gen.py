@@ -1,55 +1,362 @@
-import grpc
-import time
-import threading
-import sys
+"""End-to-end load: drivers moving along routes while riders post requests.
+
+Setup registers `--drivers` routes over the stations from scripts/init_db.py
+(2-4 consecutive stations each, dest_area taken from the last one). Each
+operation is then either a driver ping or a rider request, in the ratio
+`--rider-share`:
+
+- In the `trip` scenario (the default), a ping is a BatchDriverLocations call
+  with the driver's next position. The driver steps along the route, so its
+  pings cross the station fences, and LocationService → Matching → Rider →
+  Trip → Notification run as they do in production. When a driver reaches
+  the end of its route, its seats are reset and it starts over.
+- In the `match` scenario, a ping is a TryMatch call at the driver's next
+  station, as if it had just arrived. Use it to load MatchingService alone,
+  e.g. for the HPA demo.
+- A rider request is RiderService.AddRequest. It targets one of the `--riders`
+  riders, at a station on a registered route, with an ETA in the next 10 minutes.
+
+Modes:
+- `closed`: `--concurrency` workers each send their next operation as soon as
+  the previous one returns. This measures capacity.
+- `open`: operations start at `--rate` per second (Poisson arrivals), whether
+  or not earlier ones have returned. Latency is counted from the scheduled
+  start, so queueing shows up in the percentiles (no coordinated omission).
+  Past `--max-in-flight` outstanding operations, new ones are dropped and
+  counted in `dropped`.
+
+The report is JSON: throughput, plus count, errors and p50/p95/p99/max per
+RPC. `--compare old.json` exits 1 if any RPC's p99 or the throughput
+regressed by more than `--tolerance`.
+
+Addresses come from the same env vars as the gateway (defaults localhost:5005x);
+the gateway has no MATCH_ADDR, so pass it for `--scenario match`.
+Against docker-compose, run it inside the network. `--in-process` instead boots
+every service in this process over an in-memory Mongo seeded with the
+init_db stations (no Docker, no mongod):
+
+    docker compose run --rm gateway python scripts/load_gen.py --mode open --rate 200 --duration 60
+    docker compose run --rm -e MATCH_ADDR=matching-svc:50057 gateway python scripts/load_gen.py --scenario match
+    python scripts/load_gen.py --in-process --duration 10
+    python scripts/load_gen.py --mode closed --concurrency 64 --out run.json --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
 import os
+import random
+import sys
+import time
+from dataclasses import dataclass
 
-# Add parent directory to path to import generated protos
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from lastmile.v1 import matching_pb2, matching_pb2_grpc
+import grpc
+from lastmile.v1 import (
+    common_pb2, driver_pb2, driver_pb2_grpc, location_pb2, location_pb2_grpc,
+    matching_pb2, matching_pb2_grpc, rider_pb2, rider_pb2_grpc, station_pb2_grpc,
+)
+from common import log
+from common.stack import Stack
+from scripts.init_db import STATIONS, station_doc
 
-def run_load():
-    target = os.environ.get('TARGET_ADDR', 'localhost:50057')
-    # print(f"Starting load generation on {target}...") # Moved to main to avoid spam
+STATION_ADDR = os.getenv("STATION_ADDR", "localhost:50052")
+DRIVER_ADDR = os.getenv("DRIVER_ADDR", "localhost:50053")
+RIDER_ADDR = os.getenv("RIDER_ADDR", "localhost:50054")
+MATCH_ADDR = os.getenv("MATCH_ADDR", "localhost:50057")
+LOCATION_ADDR = os.getenv("LOCATION_ADDR", "localhost:50058")
 
-    while True:
+RPC_TIMEOUT_S = 10
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+class Stats:
+    def __init__(self):
+        self.latency: dict[str, list[float]] = {}
+        self.errors: dict[str, dict[str, int]] = {}
+
+    def record(self, rpc: str, seconds: float):
+        self.latency.setdefault(rpc, []).append(seconds)
+
+    def error(self, rpc: str, code: str):
+        by_code = self.errors.setdefault(rpc, {})
+        by_code[code] = by_code.get(code, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        out = {}
+        for rpc in sorted(set(self.latency) | set(self.errors)):
+            lat = sorted(self.latency.get(rpc, []))
+            out[rpc] = {
+                "count": len(lat),
+                "errors": self.errors.get(rpc, {}),
+                "rps": round(len(lat) / elapsed, 1) if elapsed else 0.0,
+                "p50_ms": round(percentile(lat, 50) * 1e3, 2),
+                "p95_ms": round(percentile(lat, 95) * 1e3, 2),
+                "p99_ms": round(percentile(lat, 99) * 1e3, 2),
+                "max_ms": round(lat[-1] * 1e3, 2) if lat else 0.0,
+            }
+        return out
+
+
+@dataclass
+class Driver:
+    id: str
+    route: driver_pb2.DriverRoute
+    path: list[tuple[float, float]]  # positions along the route, in order
+    stations: list[str]
+    step: int = 0
+    seats: int = 0
+
+
+def path_between(coords: list[tuple[float, float]], steps_per_leg: int) -> list[tuple[float, float]]:
+    """Evenly spaced points from station to station; each station itself is on the path."""
+    out = []
+    for (lat0, lon0), (lat1, lon1) in zip(coords, coords[1:]):
+        for k in range(steps_per_leg):
+            t = k / steps_per_leg
+            out.append((lat0 + (lat1 - lat0) * t, lon0 + (lon1 - lon0) * t))
+    out.append(coords[-1])
+    return out
+
+
+class Sim:
+    def __init__(self, args, stats: Stats, rnd: random.Random):
+        self.args = args
+        self.stats = stats
+        self.rnd = rnd
+        self.drivers: list[Driver] = []
+        self.pickups: list[tuple[str, str]] = []  # (station_id, dest_area) riders can ask for
+        self.triggered = 0
+        self.matched = 0
+        self.ops = 0
+        self._next_driver = 0
+
+    async def connect(self, addrs: dict[str, str]):
+        self._channels = [grpc.aio.insecure_channel(addrs[name]) for name in
+                          ("station", "driver", "rider", "matching", "location")]
+        st, dr, ri, ma, lo = self._channels
+        self.station = station_pb2_grpc.StationServiceStub(st)
+        self.driver = driver_pb2_grpc.DriverServiceStub(dr)
+        self.rider = rider_pb2_grpc.RiderServiceStub(ri)
+        self.match = matching_pb2_grpc.MatchingServiceStub(ma)
+        self.location = location_pb2_grpc.LocationServiceStub(lo)
+
+    async def close(self):
+        await asyncio.gather(*(ch.close() for ch in self._channels))
+
+    async def setup(self):
+        """Register one route per driver over real stations."""
+        stations = list((await self.station.ListStations(common_pb2.Empty(), timeout=RPC_TIMEOUT_S)).stations)
+        if len(stations) < 2:
+            sys.exit("need at least 2 stations; run scripts/init_db.py first")
+        # order by longitude so consecutive stations make a plausible corridor
+        stations.sort(key=lambda s: s.location.lon)
+        for i in range(self.args.drivers):
+            n = self.rnd.randint(2, min(4, len(stations)))
+            start = self.rnd.randrange(len(stations) - n + 1)
+            stops = stations[start:start + n]
+            if self.rnd.random() < 0.5:
+                stops = stops[::-1]
+            dest = stops[-1].nearby_areas[0] if stops[-1].nearby_areas else stops[-1].id
+            seats = self.rnd.randint(2, 4)
+            route = (await self.driver.RegisterRoute(driver_pb2.RegisterRouteRequest(route=driver_pb2.DriverRoute(
+                driver_id=f"load-d{i}", dest_area=dest, seats_total=seats, seats_free=seats,
+                stations=[driver_pb2.RouteStation(station_id=s.id, minutes_before_eta_match=5) for s in stops],
+            )), timeout=RPC_TIMEOUT_S)).route
+            path = path_between([(s.location.lat, s.location.lon) for s in stops], self.args.steps_per_leg)
+            self.drivers.append(Driver(f"load-d{i}", route, path, [s.id for s in stops[:-1]], seats=seats))
+            self.pickups.extend((s.id, dest) for s in stops[:-1])
+
+    async def _call(self, rpc: str, started: float, coro):
         try:
-            # Re-create channel periodically to force re-balancing (L4 LB workaround)
-            with grpc.insecure_channel(target) as channel:
-                stub = matching_pb2_grpc.MatchingServiceStub(channel)
-                
-                # Send a batch of requests per connection
-                for _ in range(50):
-                    try:
-                        # Send a dummy request
-                        stub.TryMatch(matching_pb2.TryMatchRequest(
-                            driver_id="d1", 
-                            route_id="r1", 
-                            station_id="s1", 
-                            arrival_eta_unix=int(time.time())
-                        ))
-                    except grpc.RpcError:
-                        pass
-                    except Exception as e:
-                        print(f"Error sending request: {e}")
-                        time.sleep(1)
-        except Exception as e:
-            print(f"Connection error: {e}")
-            time.sleep(1)
+            resp = await coro
+        except grpc.aio.AioRpcError as e:
+            self.stats.error(rpc, e.code().name)
+            return None
+        self.stats.record(rpc, time.perf_counter() - started)
+        return resp
 
-if __name__ == "__main__":
-    threads = []
-    # Launch 20 threads to generate enough load
-    for i in range(20):
-        t = threading.Thread(target=run_load)
-        t.daemon = True
-        t.start()
-        threads.append(t)
-
-    print("Load generator running. Press Ctrl+C to stop.")
+    async def op(self, started: float):
+        """One operation; `started` is when it was due (open loop) or began (closed loop)."""
+        self.ops += 1
+        if self.rnd.random() < self.args.rider_share:
+            await self.rider_request(started)
+        else:
+            d = self.drivers[self._next_driver % len(self.drivers)]
+            self._next_driver += 1
+            await (self.ping(d, started) if self.args.scenario == "trip" else self.arrive(d, started))
+
+    async def rider_request(self, started: float):
+        station_id, dest = self.rnd.choice(self.pickups)
+        await self._call("RiderService/AddRequest", started, self.rider.AddRequest(
+            rider_pb2.AddRequestRequest(request=common_pb2.RiderRequest(
+                rider_id=f"load-r{self.rnd.randrange(self.args.riders)}", station_id=station_id,
+                eta_unix=int(time.time()) + self.rnd.randint(0, 600), dest_area=dest,
+            )), timeout=RPC_TIMEOUT_S))
+
+    async def ping(self, d: Driver, started: float):
+        lat, lon = d.path[d.step]
+        # advanced before awaiting: with more workers than drivers, two may share one
+        d.step = (d.step + 1) % len(d.path)
+        resp = await self._call("LocationService/BatchDriverLocations", started, self.location.BatchDriverLocations(
+            location_pb2.BatchDriverLocationsRequest(locations=[location_pb2.DriverLocation(
+                driver_id=d.id, route_id=d.route.id, ts_unix=int(time.time()),
+                point=common_pb2.LatLng(lat=lat, lon=lon),
+            )]), timeout=RPC_TIMEOUT_S))
+        if resp is not None:
+            self.triggered += resp.triggered
+        if d.step == 0:
+            await self._end_of_route(d, time.perf_counter())
+
+    async def arrive(self, d: Driver, started: float):
+        station_id = d.stations[d.step % len(d.stations)]
+        d.step += 1
+        now = int(time.time())
+        resp = await self._call("MatchingService/TryMatch", started, self.match.TryMatch(matching_pb2.TryMatchRequest(
+            driver_id=d.id, route_id=d.route.id, station_id=station_id, arrival_eta_unix=now,
+            idempotency_key=f"{d.id}:{d.route.id}:{station_id}:{now}:{d.step}",
+        ), timeout=RPC_TIMEOUT_S))
+        if resp is not None and resp.assignments:
+            self.matched += len(resp.assignments)
+        if d.step % len(d.stations) == 0:
+            await self._end_of_route(d, time.perf_counter())
+
+    async def _end_of_route(self, d: Driver, started: float):
+        await self._call("DriverService/UpdateSeats", started, self.driver.UpdateSeats(
+            driver_pb2.UpdateSeatsRequest(route_id=d.route.id, seats_free=d.seats), timeout=RPC_TIMEOUT_S))
+
+
+async def closed_loop(sim: Sim, concurrency: int, duration: float):
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await sim.op(time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(sim: Sim, rate: float, duration: float, max_in_flight: int, rnd: random.Random) -> int:
+    """Start operations on a Poisson schedule; returns how many were dropped for exceeding max_in_flight."""
+    t0 = time.perf_counter()
+    due, dropped = t0, 0
+    in_flight: set[asyncio.Task] = set()
+    while True:
+        due += rnd.expovariate(rate)
+        if due - t0 >= duration:
+            break
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(sim.op(due))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return dropped
+
+
+async def run(args) -> dict:
+    rnd = random.Random(args.seed)
+    stats = Stats()
+    sim = Sim(args, stats, rnd)
+    stack = None
+    addrs = {"station": STATION_ADDR, "driver": DRIVER_ADDR, "rider": RIDER_ADDR,
+             "matching": MATCH_ADDR, "location": LOCATION_ADDR}
+    if args.in_process:
+        stack = await Stack().start()
+        stack.db.stations.insert_many([station_doc(s) for s in STATIONS])
+        addrs = stack.addrs
+    await sim.connect(addrs)
     try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("Stopping...")
+        await sim.setup()
+        t0 = time.perf_counter()
+        dropped = 0
+        if args.mode == "closed":
+            await closed_loop(sim, args.concurrency, args.duration)
+        else:
+            dropped = await open_loop(sim, args.rate, args.duration, args.max_in_flight, rnd)
+        elapsed = time.perf_counter() - t0
+    finally:
+        await sim.close()
+        if stack is not None:
+            await stack.stop()
+    return {
+        "scenario": args.scenario,
+        "stack": "in-process" if args.in_process else "remote",
+        "mode": args.mode,
+        "rate": args.rate if args.mode == "open" else None,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "drivers": args.drivers,
+        "riders": args.riders,
+        "duration_s": round(elapsed, 3),
+        "ops": sim.ops,
+        "throughput_ops": round(sim.ops / elapsed, 1) if elapsed else 0.0,
+        "dropped": dropped,
+        "matches_triggered": sim.triggered,
+        "riders_matched": sim.matched,
+        "rpcs": stats.report(elapsed),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of `report` against `baseline`: p99 up, or throughput down, by more than `tolerance`."""
+    out = []
+    if report["throughput_ops"] < baseline["throughput_ops"] * (1 - tolerance):
+        out.append(f"throughput {baseline['throughput_ops']} -> {report['throughput_ops']} ops/s")
+    for rpc, cur in report["rpcs"].items():
+        old = baseline.get("rpcs", {}).get(rpc)
+        if old and old["p99_ms"] and cur["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+            out.append(f"{rpc} p99 {old['p99_ms']} -> {cur['p99_ms']} ms")
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--scenario", choices=("trip", "match"), default="trip")
+    p.add_argument("--mode", choices=("closed", "open"), default="closed")
+    p.add_argument("--drivers", type=int, default=100)
+    p.add_argument("--riders", type=int, default=1000)
+    p.add_argument("--rider-share", type=float, default=0.2, help="fraction of operations that are rider requests")
+    p.add_argument("--steps-per-leg", type=int, default=20, help="pings between consecutive stations")
+    p.add_argument("--duration", type=float, default=30, help="seconds")
+    p.add_argument("--concurrency", type=int, default=32, help="closed loop: workers")
+    p.add_argument("--rate", type=float, default=200, help="open loop: operations per second")
+    p.add_argument("--max-in-flight", type=int, default=1000, help="open loop: drop operations beyond this")
+    p.add_argument("--in-process", action="store_true",
+                   help="boot every service in this process over an in-memory Mongo (common/stack.py)")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", help="also write the report here")
+    p.add_argument("--compare", help="baseline report; exit 1 on regression")
+    p.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression for --compare")
+    a = p.parse_args()
+
+    # stdout is the report alone (`> run.json`); service logs from --in-process go to stderr
+    log.configure(stream=sys.stderr)
+    report = asyncio.run(run(a))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if a.out:
+        with open(a.out, "w") as f:
+            f.write(text + "\n")
+    if a.compare:
+        with open(a.compare) as f:
+            regressions = compare(report, json.load(f), a.tolerance)
+        for r in regressions:
+            print(f"REGRESSION: {r}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
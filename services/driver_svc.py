@@ -1,21 +1,91 @@
 import asyncio
+import os
 import grpc
 from lastmile.v1 import driver_pb2, driver_pb2_grpc
-from common.run import serve
-from common.db import get_db
+from common.run import new_server, serve
+from common.log import get_logger
+from common.db import get_async_db, get_db, ensure_indexes, pump_changes, CHANGE_STREAM_RETRY_SECONDS
+from common.changes import ChangeHub, RESYNC, UPSERT, DELETE
+from pymongo.errors import PyMongoError
 # this is driver service
+
+log = get_logger("driver")
+
+# ReserveSeats only retries when another reservation won the race in between
+RESERVE_MAX_ATTEMPTS = int(os.getenv("RESERVE_MAX_ATTEMPTS", "5"))
+
 class DriverStore:
     def __init__(self):
         self.lock = asyncio.Lock()
         self.routes: dict[str, driver_pb2.DriverRoute] = {}
 
+def route_from_doc(doc) -> driver_pb2.DriverRoute:
+    stations_pb = [driver_pb2.RouteStation(station_id=s["station_id"], minutes_before_eta_match=s["minutes_before_eta_match"]) for s in doc["stations"]]
+    return driver_pb2.DriverRoute(
+        id=str(doc["_id"]),
+        driver_id=doc["driver_id"],
+        dest_area=doc["dest_area"],
+        seats_total=doc["seats_total"],
+        seats_free=doc["seats_free"],
+        stations=stations_pb
+    )
+
 class DriverServer(driver_pb2_grpc.DriverServiceServicer):
     def __init__(self):
-        self.db = get_db()
+        self.db = get_async_db()
         self.routes = self.db.driver_routes
+        # Route change feed for WatchRoutes. Local writes are published
+        # directly; when Mongo supports change streams the collection is also
+        # tailed, which picks up other replicas and TripServer's deletes.
+        # Consumers only invalidate, so seeing a change twice is harmless.
+        self.changes = ChangeHub()
+        self._tailing = False
+        self._tail_lock = asyncio.Lock()
+        self._retail: asyncio.Task | None = None
+
+    def _publish(self, op: str, route_id: str, route: driver_pb2.DriverRoute | None = None):
+        self.changes.publish(driver_pb2.RouteChange(op=op, route_id=route_id, route=route))
+
+    def _on_mongo_change(self, change):
+        route_id = str(change.get("documentKey", {}).get("_id", ""))
+        if change.get("operationType") == "delete":
+            self._publish(DELETE, route_id)
+        elif change.get("fullDocument"):
+            self._publish(UPSERT, route_id, route_from_doc(change["fullDocument"]))
+        else:
+            self._publish(UPSERT, route_id)
+
+    async def _ensure_tail(self):
+        async with self._tail_lock:
+            if self._tailing:
+                return
+            try:
+                stream = await self.routes.watch(full_document="updateLookup")
+            except PyMongoError as e:
+                # retried by the next watcher
+                log.warning("change streams unavailable, publishing local writes only", error=e)
+                return
+            pump_changes(stream, self._on_mongo_change, asyncio.get_running_loop(), name="driver_routes",
+                         on_end=self._on_tail_end)
+            self._tailing = True
+
+    def _on_tail_end(self):
+        # writes made elsewhere while the stream is down are lost: watchers drop their caches
+        self._tailing = False
+        self._publish(RESYNC, "")
+        if len(self.changes):  # otherwise the next watcher reopens it
+            self._retail = asyncio.ensure_future(self._reopen_tail())
+
+    async def _reopen_tail(self):
+        while not self._tailing and len(self.changes):
+            await self._ensure_tail()
+            if self._tailing:
+                self._publish(RESYNC, "")  # covers what changed before the new stream opened
+                return
+            await asyncio.sleep(CHANGE_STREAM_RETRY_SECONDS)
 
     async def RegisterRoute(self, request, context):
-        print(f"[driver] RegisterRoute request={request}")
+        log.debug("RegisterRoute", request=request)
         r = request.route
         
         # Convert stations to dict list for storage
@@ -34,21 +104,22 @@ class DriverServer(driver_pb2_grpc.DriverServiceServicer):
             "stations": stations_data
         }
         
-        res = self.routes.insert_one(route_doc)
+        res = await self.routes.insert_one(route_doc)
         rid = str(res.inserted_id)
         
         nr = driver_pb2.DriverRoute(
             id=rid, driver_id=r.driver_id, dest_area=r.dest_area,
             seats_total=r.seats_total, seats_free=route_doc["seats_free"], stations=list(r.stations)
         )
+        self._publish(UPSERT, rid, nr)
         return driver_pb2.RegisterRouteResponse(route=nr)
 
     async def UpdateSeats(self, request, context):
-        print(f"[driver] UpdateSeats request={request}")
+        log.debug("UpdateSeats", request=request)
         from bson.objectid import ObjectId
         try:
             oid = ObjectId(request.route_id)
-            res = self.routes.find_one_and_update(
+            res = await self.routes.find_one_and_update(
                 {"_id": oid},
                 {"$set": {"seats_free": request.seats_free}},
                 return_document=True
@@ -59,56 +130,110 @@ class DriverServer(driver_pb2_grpc.DriverServiceServicer):
         if not res:
             return driver_pb2.UpdateSeatsResponse()
             
-        # Reconstruct proto
-        stations_pb = [driver_pb2.RouteStation(station_id=s["station_id"], minutes_before_eta_match=s["minutes_before_eta_match"]) for s in res["stations"]]
-        
-        r = driver_pb2.DriverRoute(
-            id=str(res["_id"]),
-            driver_id=res["driver_id"],
-            dest_area=res["dest_area"],
-            seats_total=res["seats_total"],
-            seats_free=res["seats_free"],
-            stations=stations_pb
-        )
+        r = route_from_doc(res)
+        self._publish(UPSERT, r.id, r)
         return driver_pb2.UpdateSeatsResponse(route=r)
 
+    async def ReserveSeats(self, request, context):
+        """Take up to n seats without a read-then-write race.
+
+        Every write is a conditional $inc (seats_free >= the amount taken), so concurrent
+        reservations from any number of matchers can never overbook. If fewer
+        than n seats are left, retry for exactly what the last read saw.
+        """
+        log.debug("ReserveSeats", request=request)
+        from bson.objectid import ObjectId
+        try:
+            oid = ObjectId(request.route_id)
+        except Exception:
+            return driver_pb2.ReserveSeatsResponse()
+
+        want = request.n
+        res = None
+        for _ in range(RESERVE_MAX_ATTEMPTS):
+            if want <= 0:
+                break
+            res = await self.routes.find_one_and_update(
+                {"_id": oid, "seats_free": {"$gte": want}},
+                {"$inc": {"seats_free": -want}},
+                return_document=True
+            )
+            if res:
+                r = route_from_doc(res)
+                self._publish(UPSERT, r.id, r)
+                return driver_pb2.ReserveSeatsResponse(granted=want, route=r)
+            # not enough left for `want`: see what is, and ask for that
+            res = await self.routes.find_one({"_id": oid})
+            if not res:
+                return driver_pb2.ReserveSeatsResponse()
+            want = min(want, res.get("seats_free", 0))
+
+        return driver_pb2.ReserveSeatsResponse(granted=0, route=route_from_doc(res) if res else None)
+
+    async def ReleaseSeats(self, request, context):
+        log.debug("ReleaseSeats", request=request)
+        from bson.objectid import ObjectId
+        try:
+            oid = ObjectId(request.route_id)
+            # pipeline update so the cap at seats_total is applied atomically
+            res = await self.routes.find_one_and_update(
+                {"_id": oid},
+                [{"$set": {"seats_free": {"$min": [{"$add": ["$seats_free", request.n]}, "$seats_total"]}}}],
+                return_document=True
+            )
+        except Exception as e:
+            log.error("ReleaseSeats failed", route_id=request.route_id, error=e)
+            res = None
+
+        if not res:
+            return driver_pb2.ReleaseSeatsResponse()
+
+        r = route_from_doc(res)
+        self._publish(UPSERT, r.id, r)
+        return driver_pb2.ReleaseSeatsResponse(route=r)
+
     async def GetRoute(self, request, context):
-        print(f"[driver] GetRoute request={request}")
+        log.debug("GetRoute", request=request)
         from bson.objectid import ObjectId
         try:
             oid = ObjectId(request.route_id)
-            res = self.routes.find_one({"_id": oid})
+            res = await self.routes.find_one({"_id": oid})
         except:
             res = None
             
         if not res:
             return driver_pb2.GetRouteResponse()
             
-        stations_pb = [driver_pb2.RouteStation(station_id=s["station_id"], minutes_before_eta_match=s["minutes_before_eta_match"]) for s in res["stations"]]
-        
-        r = driver_pb2.DriverRoute(
-            id=str(res["_id"]),
-            driver_id=res["driver_id"],
-            dest_area=res["dest_area"],
-            seats_total=res["seats_total"],
-            seats_free=res["seats_free"],
-            stations=stations_pb
-        )
-        return driver_pb2.GetRouteResponse(route=r)
+        return driver_pb2.GetRouteResponse(route=route_from_doc(res))
 
     async def DeleteRoute(self, request, context):
-        print(f"[driver] DeleteRoute request={request}")
+        log.debug("DeleteRoute", request=request)
         from bson.objectid import ObjectId
         try:
             oid = ObjectId(request.route_id)
-            res = self.routes.delete_one({"_id": oid})
+            res = await self.routes.delete_one({"_id": oid})
+            if res.deleted_count:
+                self._publish(DELETE, request.route_id)
         except Exception as e:
-            print(f"[driver] DeleteRoute error: {e}")
+            log.error("DeleteRoute failed", route_id=request.route_id, error=e)
             
         return driver_pb2.DeleteRouteResponse(route_id=request.route_id)
 
+    async def WatchRoutes(self, request, context):
+        log.debug("WatchRoutes", request=request)
+        await self._ensure_tail()
+        # Subscribe before RESYNC so nothing published in between is lost
+        sub = self.changes.subscribe()
+        try:
+            yield driver_pb2.RouteChange(op=RESYNC)
+            async for change in sub:
+                yield change
+        finally:
+            sub.close()
+
 def factory():
-    server = grpc.aio.server()
+    ensure_indexes(get_db(), ["driver_routes"])
+    server = new_server()
     driver_pb2_grpc.add_DriverServiceServicer_to_server(DriverServer(), server)
     return server
 
@@ -1,5 +1,8 @@
 # services/location_svc.py
+import asyncio
+import os
 import time
+from dataclasses import dataclass
 import grpc
 from lastmile.v1 import (
     location_pb2, location_pb2_grpc,
@@ -8,13 +11,57 @@ from lastmile.v1 import (
     driver_pb2, driver_pb2_grpc,
     common_pb2,
 )
-from common.geo import haversine_m
+from common.cache import TTLCache
+from common.changes import DELETE, follow
+from common.channels import AioChannelRegistry
+from common.geo import GeoGrid, haversine_pairs
 from common.env import addr
-from common.run import serve
+from common import tracing
+from common.run import new_server, serve
+from common.log import get_logger
+from common.sharding import ShardMap
+
+log = get_logger("location")
 
 # Tunables (no speed/ETA used)
 GEOFENCE_METERS  = 400.0   # trigger radius around a station
 DEBOUNCE_SECONDS = 30      # suppress repeated triggers per (driver, station)
+AVG_SPEED_MPS    = 10      # approx driving speed in m/s, for the distance-based ETA
+
+# Ingestion: streamed pings from all drivers are pooled for up to
+# BATCH_WINDOW_MS (or BATCH_MAX pings) and geofenced together, grouped by route.
+BATCH_MAX        = int(os.getenv("LOCATION_BATCH_MAX", "512"))
+BATCH_WINDOW_MS  = float(os.getenv("LOCATION_BATCH_WINDOW_MS", "10"))
+# Routes longer than this are checked through the station grid rather than
+# against every one of their stations.
+GRID_MIN_STATIONS = 64
+
+# Cache bounds. TTLs cap how stale a route/station can get when no explicit
+# invalidation arrives; sizes keep memory flat on long-running pods.
+ROUTE_CACHE_SIZE   = int(os.getenv("LOCATION_ROUTE_CACHE_SIZE", "10000"))
+ROUTE_TTL_SECONDS  = float(os.getenv("LOCATION_ROUTE_TTL", "60"))
+STATION_CACHE_SIZE = int(os.getenv("LOCATION_STATION_CACHE_SIZE", "10000"))
+STATION_TTL_SECONDS = float(os.getenv("LOCATION_STATION_TTL", "600"))
+DEBOUNCE_CACHE_SIZE = int(os.getenv("LOCATION_DEBOUNCE_CACHE_SIZE", "100000"))
+
+# Same peer spec as matching-svc; when set, each TryMatch goes straight to the
+# replica that owns its station instead of through the service VIP.
+MATCH_PEERS = os.getenv("MATCH_PEERS", "")
+
+# TryMatch carries an idempotency key, so a slow or failed attempt can simply
+# be sent again: MATCH_RETRIES extra attempts, each bounded by MATCH_TIMEOUT_S.
+MATCH_TIMEOUT_S = float(os.getenv("MATCH_TIMEOUT_S", "5"))
+MATCH_RETRIES   = int(os.getenv("MATCH_RETRIES", "2"))
+RETRYABLE = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.ABORTED)
+
+@dataclass
+class CachedRoute:
+    """A route plus its stations resolved to coordinates, in route order."""
+    route: driver_pb2.DriverRoute
+    by_id: dict[str, driver_pb2.RouteStation]
+    stations: list[driver_pb2.RouteStation]
+    lats: list[float]
+    lons: list[float]
 
 class LocationServer(location_pb2_grpc.LocationServiceServicer):
     def __init__(self):
@@ -22,92 +69,272 @@ class LocationServer(location_pb2_grpc.LocationServiceServicer):
         self._station_addr = addr("STATION_ADDR", "localhost:50052")
         self._driver_addr  = addr("DRIVER_ADDR",  "localhost:50053")
 
-        self._match_ch   = grpc.aio.insecure_channel(self._match_addr)
-        self._station_ch = grpc.aio.insecure_channel(self._station_addr)
-        self._driver_ch  = grpc.aio.insecure_channel(self._driver_addr)
+        self._match_ch   = tracing.aio_channel(self._match_addr)
+        self._station_ch = tracing.aio_channel(self._station_addr)
+        self._driver_ch  = tracing.aio_channel(self._driver_addr)
 
         self.match   = matching_pb2_grpc.MatchingServiceStub(self._match_ch)
         self.station = station_pb2_grpc.StationServiceStub(self._station_ch)
         self.driver  = driver_pb2_grpc.DriverServiceStub(self._driver_ch)
 
-        # small caches
-        self._station_coord_cache: dict[str, common_pb2.LatLng] = {}   # station_id -> LatLng
-        self._route_cache: dict[str, driver_pb2.DriverRoute] = {}      # route_id -> DriverRoute
-        self._last_trigger: dict[tuple[str, str], float] = {}          # (driver_id, station_id) -> ts
+        # bounded caches
+        self._station_coord_cache = TTLCache(STATION_CACHE_SIZE, STATION_TTL_SECONDS,  # station_id -> LatLng
+                                             on_evict=lambda station_id, _: self._drop_station(station_id))
+        self._route_cache = TTLCache(ROUTE_CACHE_SIZE, ROUTE_TTL_SECONDS)              # route_id -> CachedRoute
+        self._last_trigger = TTLCache(DEBOUNCE_CACHE_SIZE, DEBOUNCE_SECONDS)           # (driver_id, station_id) -> ts
+
+        # every station seen on a route, bucketed so a ping only looks at its neighbourhood
+        self._station_index = GeoGrid(cell_m=GEOFENCE_METERS)
+
+        self._ingest: asyncio.Queue = asyncio.Queue()
+        self._ingest_task: asyncio.Task | None = None
+        self._watchers: list[asyncio.Task] = []
+
+        self.match_shards = ShardMap(MATCH_PEERS, name="location/matching") if MATCH_PEERS else None
+        self._match_peers = AioChannelRegistry()
 
     async def _get_station_coord(self, station_id: str) -> common_pb2.LatLng | None:
-        if station_id in self._station_coord_cache:
-            return self._station_coord_cache[station_id]
+        st = self._station_coord_cache.get(station_id)
+        if st is not None:
+            return st
         resp = await self.station.GetStation(station_pb2.GetStationRequest(id=station_id))
         if resp and resp.station and resp.station.location:
-            self._station_coord_cache[station_id] = resp.station.location
+            self._station_coord_cache.set(station_id, resp.station.location)
+            self._station_index.insert(station_id, resp.station.location.lat, resp.station.location.lon)
             return resp.station.location
         return None
 
-    async def _get_route(self, route_id: str) -> driver_pb2.DriverRoute | None:
-        if route_id in self._route_cache:
-            return self._route_cache[route_id]
+    async def _get_route(self, route_id: str) -> CachedRoute | None:
+        cached = self._route_cache.get(route_id)
+        if cached is not None:
+            return cached
         ro = await self.driver.GetRoute(driver_pb2.GetRouteRequest(route_id=route_id))
         if ro and ro.route and ro.route.id:
-            self._route_cache[route_id] = ro.route
-            return ro.route
+            cached = await self._resolve_route(ro.route)
+            self._route_cache.set(route_id, cached)
+            return cached
         return None
 
+    async def _resolve_route(self, route: driver_pb2.DriverRoute) -> CachedRoute:
+        """Resolve the route's stations to coordinates (which also puts them in the grid)."""
+        cached = CachedRoute(route=route, by_id={}, stations=[], lats=[], lons=[])
+        for rs in route.stations:
+            st = await self._get_station_coord(rs.station_id)
+            if not st:
+                continue
+            cached.by_id[rs.station_id] = rs
+            cached.stations.append(rs)
+            cached.lats.append(st.lat)
+            cached.lons.append(st.lon)
+        return cached
+
+    # --- invalidation hooks ---
+    def invalidate_route(self, route_id: str):
+        """Drop a route (deleted, completed or edited); the next ping refetches it."""
+        self._route_cache.invalidate(route_id)
+
+    def invalidate_station(self, station_id: str):
+        """Drop a station and every cached route that passes through it."""
+        self._station_coord_cache.invalidate(station_id)
+        self._drop_station(station_id)
+
+    def _drop_station(self, station_id: str):
+        # also runs when the coord cache expires or evicts a station, so the grid
+        # stays bounded by the cache and no cached route relies on a missing cell entry
+        self._station_index.remove(station_id)
+        self._route_cache.invalidate_where(lambda _, cr: station_id in cr.by_id)
+
+    def reset_routes(self):
+        self._route_cache.clear()
+
+    def reset_stations(self):
+        """Forget every station (and so every route); used when station changes may have been missed."""
+        self._station_coord_cache.clear()
+        self._station_index = GeoGrid(cell_m=GEOFENCE_METERS)
+        self._route_cache.clear()
+
+    def _on_station_change(self, change):
+        self.invalidate_station(change.station_id)
+        if change.op != DELETE and change.station.id:
+            # cheap to apply in place, and saves the refetch on the next ping
+            self._station_coord_cache.set(change.station_id, change.station.location)
+            self._station_index.insert(change.station_id, change.station.location.lat,
+                                       change.station.location.lon)
+
+    def start_watchers(self):
+        """Follow the driver and station change feeds so edits evict cache entries immediately.
+
+        The TTLs stay as the backstop for whatever the feeds miss. Must be
+        called from the serving loop.
+        """
+        if self._watchers:
+            return
+        self._watchers = [
+            asyncio.create_task(follow(
+                lambda: self.driver.WatchRoutes(driver_pb2.WatchRoutesRequest()),
+                on_event=lambda ch: self.invalidate_route(ch.route_id),
+                on_reset=self.reset_routes, name="location/routes")),
+            asyncio.create_task(follow(
+                lambda: self.station.WatchStations(station_pb2.WatchStationsRequest()),
+                on_event=self._on_station_change,
+                on_reset=self.reset_stations, name="location/stations")),
+        ]
+
+    def cache_stats(self) -> dict[str, dict[str, int]]:
+        return {
+            "routes": self._route_cache.stats(),
+            "stations": self._station_coord_cache.stats(),
+            "debounce": self._last_trigger.stats(),
+        }
+
     def _debounced(self, driver_id: str, station_id: str, now: float) -> bool:
         key = (driver_id, station_id)
         last = self._last_trigger.get(key, 0.0)
         if now - last < DEBOUNCE_SECONDS:
             return True
-        self._last_trigger[key] = now
+        self._last_trigger.set(key, now)
         return False
 
-    async def StreamDriverLocation(self, request_iterator, context):
-        async for loc in request_iterator:
-            print(f"[location] StreamDriverLocation received loc={loc}")
-            route = await self._get_route(loc.route_id)
-            if not route or not route.stations:
+    def _geofence(self, groups) -> list[tuple]:
+        """(ping, RouteStation, dist_m) for every ping inside a station fence on its route.
+
+        `groups` is [(CachedRoute, pings)]. Every (ping, route station) pair of the
+        batch goes through one vectorised haversine call; long routes use the
+        station grid instead so their cost stays per-ping constant.
+        """
+        out = []
+        plat, plon, slat, slon, who, which = [], [], [], [], [], []
+        for cr, pings in groups:
+            n = len(cr.stations)
+            if not n:
+                continue
+            if n > GRID_MIN_STATIONS:
+                on_route = cr.by_id
+                for p in pings:
+                    for station_id, dist_m in self._station_index.near(p.point.lat, p.point.lon, GEOFENCE_METERS):
+                        rs = on_route.get(station_id)
+                        if rs is not None:
+                            out.append((p, rs, dist_m))
+                continue
+            for p in pings:
+                plat.extend([p.point.lat] * n)
+                plon.extend([p.point.lon] * n)
+                slat.extend(cr.lats)
+                slon.extend(cr.lons)
+                who.extend([p] * n)
+                which.extend(cr.stations)
+        if plat:
+            d = haversine_pairs(plat, plon, slat, slon)
+            for k in (d <= GEOFENCE_METERS).nonzero()[0]:
+                out.append((who[k], which[k], float(d[k])))
+        return out
+
+    def _match_stub(self, station_id: str):
+        owner = self.match_shards.owner(station_id) if self.match_shards else None
+        if owner is None:
+            return self.match
+        return self._match_peers.stub(owner, matching_pb2_grpc.MatchingServiceStub)
+
+    async def _trigger(self, loc, station_id: str):
+        # one key per (ping, station): a resent ping or a retry below replays the same match
+        req = matching_pb2.TryMatchRequest(
+            driver_id=loc.driver_id,
+            route_id=loc.route_id,
+            station_id=station_id,
+            arrival_eta_unix=int(loc.ts_unix),
+            idempotency_key=f"{loc.driver_id}:{loc.route_id}:{station_id}:{int(loc.ts_unix)}",
+        )
+        for attempt in range(MATCH_RETRIES + 1):
+            try:
+                resp = await self._match_stub(station_id).TryMatch(req, timeout=MATCH_TIMEOUT_S)
+                break
+            except grpc.RpcError as e:
+                if attempt == MATCH_RETRIES or e.code() not in RETRYABLE:
+                    raise
+                log.warning("TryMatch failed, retrying", key=req.idempotency_key, attempt=attempt + 1, code=e.code().name)
+        if resp.trip_id:
+            log.info("matched", station_id=station_id, trip_id=resp.trip_id, seats_left=resp.seats_remaining)
+
+    async def _process_batch(self, pings) -> int:
+        """Geofence a batch of pings, grouped by route; returns how many matches were triggered."""
+        by_route: dict[str, list] = {}
+        for loc in pings:
+            by_route.setdefault(loc.route_id, []).append(loc)
+        routes = {rid: self._route_cache.get(rid) for rid in by_route}
+        missing = [rid for rid, cr in routes.items() if cr is None]
+        if missing:
+            fetched = await asyncio.gather(*(self._get_route(rid) for rid in missing))
+            routes.update(zip(missing, fetched))
+
+        groups = []
+        for route_id, group in by_route.items():
+            cr = routes[route_id]
+            if not cr or not cr.stations:
                 # No registered stations — nothing to check
                 continue
+            groups.append((cr, group))
+
+        triggers = []
+        for loc, rs, dist_m in self._geofence(groups):
+            # If ETA is greater than allowed minutes_before_eta_match → skip
+            eta_minutes = (dist_m / AVG_SPEED_MPS) / 60.0
+            if eta_minutes > rs.minutes_before_eta_match:
+                continue
+            if self._debounced(loc.driver_id, rs.station_id, time.time()):
+                continue
+            triggers.append(self._trigger(loc, rs.station_id))
+
+        for r in await asyncio.gather(*triggers, return_exceptions=True):
+            if isinstance(r, Exception):
+                log.error("TryMatch failed", error=r)
+        return len(triggers)
 
-            # Check proximity for every station on the route
-            for rs in route.stations:
-                station_id = rs.station_id
-                st = await self._get_station_coord(station_id)
-                if not st:
-                    continue
-
-                # Distance between driver and station
-                dist_m = haversine_m(loc.point.lat, loc.point.lon, st.lat, st.lon)
-                if dist_m > GEOFENCE_METERS:
-                    continue
-
-                # --- NEW: ETA based on distance ---
-                AVG_SPEED_MPS = 10  # approx driving speed in m/s   
-                eta_minutes = (dist_m / AVG_SPEED_MPS) / 60.0
-
-                # If ETA is greater than allowed minutes_before_eta_match → skip
-                if eta_minutes > rs.minutes_before_eta_match:
-                    continue    
-
-                now = time.time()
-                if self._debounced(loc.driver_id, station_id, now):
-                    continue
-
-                # Trigger match
-                resp = await self.match.TryMatch(matching_pb2.TryMatchRequest(
-                    driver_id=loc.driver_id,
-                    route_id=loc.route_id,
-                    station_id=station_id,
-                    arrival_eta_unix=int(loc.ts_unix),
-                ))
-                if resp.trip_id:
-                    print(f"[location] matched at {station_id}: trip={resp.trip_id}, seats_left={resp.seats_remaining}")
+    async def _ingest_loop(self):
+        # Runs while there is work; _submit restarts it after the queue drains.
+        while not self._ingest.empty():
+            if self._ingest.qsize() < BATCH_MAX:
+                await asyncio.sleep(BATCH_WINDOW_MS / 1000)  # let the batch fill up
+            batch = []
+            while len(batch) < BATCH_MAX and not self._ingest.empty():
+                batch.append(self._ingest.get_nowait())
+            try:
+                await self._process_batch([loc for loc, _ in batch])
+            except Exception as e:
+                log.error("batch failed", n=len(batch), error=e)
+            for _, done in batch:
+                if not done.done():
+                    done.set_result(None)
 
+    async def _submit(self, loc) -> asyncio.Future:
+        """Queue a ping for the next batch; the future resolves once it has been processed."""
+        if self._ingest_task is None or self._ingest_task.done():
+            self._ingest_task = asyncio.create_task(self._ingest_loop())
+        done = asyncio.get_running_loop().create_future()
+        await self._ingest.put((loc, done))
+        return done
+
+    async def StreamDriverLocation(self, request_iterator, context):
+        # Batches are processed in order, so waiting on the last ping covers the whole stream
+        last = None
+        async for loc in request_iterator:
+            log.sampled("StreamDriverLocation ping", loc=loc)
+            last = await self._submit(loc)
+        if last is not None:
+            await last
         return location_pb2.LocationStreamAck(ok=True)
 
+    async def BatchDriverLocations(self, request, context):
+        log.sampled("BatchDriverLocations", n=len(request.locations))
+        triggered = await self._process_batch(list(request.locations))
+        return location_pb2.BatchDriverLocationsResponse(accepted=len(request.locations), triggered=triggered)
+
 def factory():
-    server = grpc.aio.server()
-    location_pb2_grpc.add_LocationServiceServicer_to_server(LocationServer(), server)
+    server = new_server()
+    loc = LocationServer()
+    loc.start_watchers()
+    if loc.match_shards:
+        loc.match_shards.start()
+    location_pb2_grpc.add_LocationServiceServicer_to_server(loc, server)
     return server
 
 if __name__ == "__main__":
@@ -1,4 +1,9 @@
+import asyncio
+import os
+import weakref
 import grpc
+import numpy as np
+from bson.objectid import ObjectId
 from time import time
 from lastmile.v1 import (
     matching_pb2, matching_pb2_grpc,
@@ -6,9 +11,64 @@ from lastmile.v1 import (
     rider_pb2, rider_pb2_grpc,
     trip_pb2, trip_pb2_grpc,
     notification_pb2, notification_pb2_grpc,
+    common_pb2,
 )
+from common.assignment import solve_assignment
+from common.channels import AioChannelRegistry
+from common.db import MATCH_DEDUP_TTL_SECONDS, ensure_indexes, get_async_db, get_db
+from common.dedup import DedupPending, DedupStore
+from common.outbox import Outbox
+from common.sharding import FORWARDED_HEADER, ShardMap
 from common.env import addr
-from common.run import serve
+from common import tracing
+from common.run import new_server, on_shutdown, serve
+from common.log import get_logger
+
+log = get_logger("matching")
+
+# Batch matching: hold TryMatch calls for a station this long, then assign all
+# drivers that arrived in the window together (0 = match each call greedily).
+MATCH_BATCH_WINDOW_MS = int(os.getenv("MATCH_BATCH_WINDOW_MS", "0"))
+PENDING_WINDOW_MINUTES = 12
+
+# Station sharding: MATCH_PEERS lists the matching replicas ("host:port,..." or
+# "dns:<headless service>:<port>") and MATCH_SELF_ADDR is this replica's entry
+# in that list. Unset = no sharding, every replica matches every station.
+MATCH_PEERS = os.getenv("MATCH_PEERS", "")
+MATCH_SELF_ADDR = os.getenv("MATCH_SELF_ADDR", "")
+
+def eta_cost(rider: common_pb2.RiderRequest, arrival_eta_unix: int) -> int:
+    return abs(rider.eta_unix - arrival_eta_unix)
+
+def plan_batch(arrivals: list[tuple[int, int]], riders: list[common_pb2.RiderRequest]) -> list[list[common_pb2.RiderRequest]]:
+    """Assign riders to drivers meeting at one station, minimising total |ETA difference|.
+
+    `arrivals` is [(arrival_eta_unix, seats_free)] per driver; all riders must
+    share the drivers' dest_area. Each driver becomes one column per free
+    seat and the seat/rider cost matrix is solved exactly, so a late driver
+    can't lose a well-timed rider to whoever called first. Returns each
+    driver's riders, best fit first.
+    """
+    slots = [d for d, (_, seats) in enumerate(arrivals) for _ in range(min(seats, len(riders)))]
+    out: list[list[common_pb2.RiderRequest]] = [[] for _ in arrivals]
+    if not slots or not riders:
+        return out
+    slot_eta = np.array([arrivals[d][0] for d in slots], dtype=np.float64)
+    rider_eta = np.array([r.eta_unix for r in riders], dtype=np.float64)
+    cost = np.abs(rider_eta[:, None] - slot_eta[None, :])
+    for ri, si in solve_assignment(cost):
+        out[slots[si]].append(riders[ri])
+    for d, chosen in enumerate(out):
+        chosen.sort(key=lambda r: (eta_cost(r, arrivals[d][0]), r.eta_unix))
+    return out
+
+def _forwarded(context) -> bool:
+    if context is None:
+        return False
+    return any(k == FORWARDED_HEADER for k, _ in (context.invocation_metadata() or ()))
+
+async def _no_match(route: driver_pb2.DriverRoute) -> matching_pb2.TryMatchResponse:
+    return matching_pb2.TryMatchResponse(seats_remaining=route.seats_free)
 
 class MatchingServer(matching_pb2_grpc.MatchingServiceServicer):
     def __init__(self):
@@ -17,61 +77,286 @@ class MatchingServer(matching_pb2_grpc.MatchingServiceServicer):
         self._trip_addr   = addr("TRIP_ADDR",  "localhost:50055")
         self._notify_addr = addr("NOTIFY_ADDR","localhost:50056")
 
-        self._driver_ch = grpc.aio.insecure_channel(self._driver_addr)
-        self._rider_ch  = grpc.aio.insecure_channel(self._rider_addr)
-        self._trip_ch   = grpc.aio.insecure_channel(self._trip_addr)
-        self._notify_ch = grpc.aio.insecure_channel(self._notify_addr)
+        self._driver_ch = tracing.aio_channel(self._driver_addr)
+        self._rider_ch  = tracing.aio_channel(self._rider_addr)
+        self._trip_ch   = tracing.aio_channel(self._trip_addr)
+        self._notify_ch = tracing.aio_channel(self._notify_addr)
 
         self.driver = driver_pb2_grpc.DriverServiceStub(self._driver_ch)
         self.rider  = rider_pb2_grpc.RiderServiceStub(self._rider_ch)
         self.trip   = trip_pb2_grpc.TripServiceStub(self._trip_ch)
         self.notify = notification_pb2_grpc.NotificationServiceStub(self._notify_ch)
 
-    async def TryMatch(self, request, context):
-        print(f"[matching] TryMatch request={request}")
-        ro = await self.driver.GetRoute(driver_pb2.GetRouteRequest(route_id=request.route_id))
-        route = ro.route
-        if not route or route.seats_free <= 0 or not route.dest_area:
-            return matching_pb2.TryMatchResponse(seats_remaining=route.seats_free if route else 0)
+        self.batch_window = MATCH_BATCH_WINDOW_MS / 1000
+        # station_id -> [(request, future)] waiting for that station's batch to be solved
+        self._batches: dict[str, list[tuple[matching_pb2.TryMatchRequest, asyncio.Future]]] = {}
+        self._tasks: set[asyncio.Task] = set()
 
-        now = int(time())
+        # Matches at one station are serialised on its owner, so concurrent
+        # drivers there don't reserve seats for the same riders and roll back.
+        self._station_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+        self.self_addr = MATCH_SELF_ADDR
+        self.shards = ShardMap(MATCH_PEERS, on_change=self._on_rebalance, name="matching") if MATCH_PEERS else None
+        self._peers = AioChannelRegistry()
+
+        self.dedup = DedupStore(get_async_db().match_dedup, matching_pb2.TryMatchResponse,
+                                ttl=MATCH_DEDUP_TTL_SECONDS, name="matching")
+        # match notifications are batched off the TryMatch path (see common/outbox.py)
+        self.outbox = Outbox(self._send_notifications, get_async_db().notification_outbox,
+                             notification_pb2.PushRequest, name="matching-outbox")
+        if self.shards and not self.self_addr:
+            log.warning("MATCH_PEERS set without MATCH_SELF_ADDR; this replica will own no stations")
+
+    # --- sharding ---
+    def owns(self, station_id: str) -> bool:
+        if self.shards is None:
+            return True
+        owner = self.shards.owner(station_id)
+        return owner is None or owner == self.self_addr
+
+    def _station_lock(self, station_id: str) -> asyncio.Lock:
+        lock = self._station_locks.get(station_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._station_locks[station_id] = lock
+        return lock
+
+    async def _forward(self, owner: str, request):
+        stub = self._peers.stub(owner, matching_pb2_grpc.MatchingServiceStub)
+        return await stub.TryMatch(request, metadata=((FORWARDED_HEADER, self.self_addr or "1"),))
+
+    def _on_rebalance(self, old, new):
+        """Hand off stations this replica no longer owns: solve their open batches now."""
+        for station_id in [s for s in self._batches if not self.owns(s)]:
+            batch = self._batches.pop(station_id)
+            self._background(self._solve(station_id, batch), what=f"handoff batch at {station_id}")
+
+    async def _pending(self, station_id: str, dest_area: str) -> list[common_pb2.RiderRequest]:
         rs = await self.rider.ListPendingAtStation(rider_pb2.ListPendingAtStationRequest(
-            station_id=request.station_id, now_unix=now, minutes_window=12, dest_area=route.dest_area
+            station_id=station_id, now_unix=int(time()), minutes_window=PENDING_WINDOW_MINUTES, dest_area=dest_area
         ))
-        riders = list(rs.requests)
-        if not riders:
-            return matching_pb2.TryMatchResponse(seats_remaining=route.seats_free)
+        return list(rs.requests)
+
+    async def _commit(self, request, route: driver_pb2.DriverRoute, ranked: list[common_pb2.RiderRequest]):
+        """Reserve seats for the best of `ranked`, then create the trip and assign its riders.
 
-        riders.sort(key=lambda r: (abs(r.eta_unix - request.arrival_eta_unix), r.eta_unix))
-        k = min(len(riders), route.seats_free)
-        chosen = riders[:k]
+        The trip id is chosen here, so CreateTrip and MarkAssigned run side by
+        side; the notification is queued on the outbox and sent after the response.
+        If either write fails, or another matcher claimed one of the riders
+        first, both are undone and the seats given back (see `_compensate`).
+        """
+        # seats_free on `route` is only a hint; the reservation is what actually holds seats
+        rv = await self.driver.ReserveSeats(driver_pb2.ReserveSeatsRequest(
+            route_id=route.id, n=min(len(ranked), route.seats_free)
+        ))
+        k = rv.granted
+        left = rv.route.seats_free
+        if k <= 0:
+            return matching_pb2.TryMatchResponse(seats_remaining=left)
+        chosen = ranked[:k]
 
         rider_ids = [r.rider_id for r in chosen]
         req_ids   = [r.id for r in chosen]
+        trip_id   = str(ObjectId())
 
-        ct = await self.trip.CreateTrip(trip_pb2.CreateTripRequest(
-            driver_id=request.driver_id, rider_ids=rider_ids,
-            route_id=request.route_id, station_id=request.station_id
-        ))
-        trip = ct.trip
+        ct, ma = await asyncio.gather(
+            self.trip.CreateTrip(trip_pb2.CreateTripRequest(
+                driver_id=request.driver_id, rider_ids=rider_ids,
+                route_id=request.route_id, station_id=request.station_id, trip_id=trip_id
+            )),
+            self.rider.MarkAssigned(rider_pb2.MarkAssignedRequest(request_ids=req_ids, trip_id=trip_id)),
+            return_exceptions=True,
+        )
+        err = next((r for r in (ct, ma) if isinstance(r, BaseException)), None)
+        if err is not None or not ma.assigned_ids:
+            left = await self._compensate(route.id, trip_id, req_ids, k)
+            if err is not None:
+                raise err
+            # every rider was taken by another match first; they'll be matched on a later ping
+            return matching_pb2.TryMatchResponse(seats_remaining=left)
 
-        await self.rider.MarkAssigned(rider_pb2.MarkAssignedRequest(request_ids=req_ids, trip_id=trip.id))
-        left = max(route.seats_free - k, 0)
-        await self.driver.UpdateSeats(driver_pb2.UpdateSeatsRequest(route_id=route.id, seats_free=left))
+        if ma.taken_ids:
+            # keep the trip for the riders we got; drop the rest from it and give their seats back
+            taken = set(ma.taken_ids)
+            lost = [r for r in chosen if r.id in taken]
+            chosen = [r for r in chosen if r.id not in taken]
+            rider_ids = [r.rider_id for r in chosen]
+            left = await self._shrink(route.id, trip_id, lost, left)
 
         targets = [notification_pb2.PushTarget(user_id=route.driver_id, channel="log")]
         targets += [notification_pb2.PushTarget(user_id=rid, channel="log") for rid in rider_ids]
-        await self.notify.Push(notification_pb2.PushRequest(
+        self.outbox.put(notification_pb2.PushRequest(
             targets=targets, title="Match confirmed", body="Your LastMile ride is scheduled.",
-            data_json=f'{{"tripId":"{trip.id}"}}'
+            data_json=f'{{"tripId":"{trip_id}"}}'
         ))
 
         assignments = [matching_pb2.Assignment(rider_request_id=r.id, rider_id=r.rider_id) for r in chosen]
-        return matching_pb2.TryMatchResponse(trip_id=trip.id, assignments=assignments, seats_remaining=left)
+        return matching_pb2.TryMatchResponse(trip_id=trip_id, assignments=assignments, seats_remaining=left)
+
+    async def _compensate(self, route_id: str, trip_id: str, req_ids: list[str], seats: int) -> int:
+        """Undo a half-made match: unassign riders, cancel the trip, release the seats.
+
+        Each undo only touches what this match wrote (riders assigned to
+        `trip_id`, the trip with that id), so all three run at once and are
+        safe whichever forward steps actually happened. Returns seats_free
+        after the release. Failures are logged with everything needed to
+        finish the cleanup by hand.
+        """
+        results = await asyncio.gather(
+            self.rider.UnassignRequests(rider_pb2.UnassignRequestsRequest(request_ids=req_ids, trip_id=trip_id)),
+            self.trip.UpdateTripStatus(trip_pb2.UpdateTripStatusRequest(trip_id=trip_id, status="CANCELLED")),
+            self.driver.ReleaseSeats(driver_pb2.ReleaseSeatsRequest(route_id=route_id, n=seats)),
+            return_exceptions=True,
+        )
+        for step, r in zip(("unassign riders", "cancel trip", "release seats"), results):
+            if isinstance(r, BaseException):
+                log.error("compensation failed", step=step, trip_id=trip_id, route_id=route_id,
+                          request_ids=req_ids, seats=seats, error=r)
+        released = results[2]
+        return 0 if isinstance(released, BaseException) else released.route.seats_free
+
+    async def _shrink(self, route_id: str, trip_id: str, lost: list[common_pb2.RiderRequest], left: int) -> int:
+        """Take riders someone else assigned first out of the trip, and free their seats."""
+        rm, rel = await asyncio.gather(
+            self.trip.RemoveRiders(trip_pb2.RemoveRidersRequest(trip_id=trip_id, rider_ids=[r.rider_id for r in lost])),
+            self.driver.ReleaseSeats(driver_pb2.ReleaseSeatsRequest(route_id=route_id, n=len(lost))),
+            return_exceptions=True,
+        )
+        for step, r in (("remove riders", rm), ("release seats", rel)):
+            if isinstance(r, BaseException):
+                log.error("compensation failed", step=step, trip_id=trip_id, route_id=route_id,
+                          request_ids=[q.id for q in lost], error=r)
+        return left if isinstance(rel, BaseException) else rel.route.seats_free
+
+    async def _send_notifications(self, pushes):
+        await self.notify.PushBatch(notification_pb2.PushBatchRequest(pushes=pushes), timeout=10)
+
+    def _background(self, coro, what: str):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+
+        def _done(t: asyncio.Task):
+            self._tasks.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                log.error("background task failed", what=what, error=t.exception())
+        task.add_done_callback(_done)
+
+    async def TryMatch(self, request, context):
+        log.debug("TryMatch", request=request)
+        if not self.owns(request.station_id) and not _forwarded(context):
+            owner = self.shards.owner(request.station_id)
+            try:
+                return await self._forward(owner, request)
+            except grpc.RpcError as e:
+                # owner gone before the ring caught up; matching here is still safe
+                log.warning("forward failed, matching locally", owner=owner, code=e.code().name)
+
+        if not request.idempotency_key:
+            return await self._match_local(request)
+        try:
+            return await self.dedup.run(request.idempotency_key, lambda: self._match_local(request))
+        except DedupPending:
+            msg = f"match {request.idempotency_key} still in progress elsewhere, retry later"
+            if context is None:
+                raise
+            await context.abort(grpc.StatusCode.ABORTED, msg)
+
+    async def _match_local(self, request):
+        if self.batch_window > 0:
+            return await self._enqueue(request)
+        async with self._station_lock(request.station_id):
+            return await self._match_one(request)
+
+    async def _match_one(self, request):
+        ro = await self.driver.GetRoute(driver_pb2.GetRouteRequest(route_id=request.route_id))
+        route = ro.route
+        if not route or route.seats_free <= 0 or not route.dest_area:
+            return matching_pb2.TryMatchResponse(seats_remaining=route.seats_free if route else 0)
+
+        riders = await self._pending(request.station_id, route.dest_area)
+        if not riders:
+            return matching_pb2.TryMatchResponse(seats_remaining=route.seats_free)
+
+        riders.sort(key=lambda r: (eta_cost(r, request.arrival_eta_unix), r.eta_unix))
+        return await self._commit(request, route, riders)
+
+    # --- batch mode ---
+    async def _enqueue(self, request) -> matching_pb2.TryMatchResponse:
+        done = asyncio.get_running_loop().create_future()
+        batch = self._batches.get(request.station_id)
+        if batch is None:
+            batch = self._batches[request.station_id] = []
+            self._background(self._flush_after(request.station_id), what=f"batch at {request.station_id}")
+        batch.append((request, done))
+        return await done
+
+    async def _flush_after(self, station_id: str):
+        await asyncio.sleep(self.batch_window)
+        await self._solve(station_id, self._batches.pop(station_id, []))
+
+    async def _solve(self, station_id: str, batch):
+        """match_batch, failing every caller still waiting if it raises."""
+        try:
+            await self.match_batch(station_id, batch)
+        except Exception as e:
+            for _, done in batch:
+                if not done.done():
+                    done.set_exception(e)
+
+    async def match_batch(self, station_id: str, batch):
+        """Solve one station's window of TryMatch calls and resolve their futures."""
+        # a route that pinged twice in the window is matched once; every caller gets the answer
+        callers: dict[str, list[asyncio.Future]] = {}
+        requests: dict[str, matching_pb2.TryMatchRequest] = {}
+        for req, done in batch:
+            callers.setdefault(req.route_id, []).append(done)
+            requests[req.route_id] = req
+
+        ros = await asyncio.gather(*(
+            self.driver.GetRoute(driver_pb2.GetRouteRequest(route_id=rid)) for rid in requests
+        ))
+        results: dict[str, object] = {}
+        by_area: dict[str, list[tuple[matching_pb2.TryMatchRequest, driver_pb2.DriverRoute]]] = {}
+        for rid, ro in zip(requests, ros):
+            route = ro.route
+            if not route or route.seats_free <= 0 or not route.dest_area:
+                results[rid] = matching_pb2.TryMatchResponse(seats_remaining=route.seats_free if route else 0)
+            else:
+                by_area.setdefault(route.dest_area, []).append((requests[rid], route))
+
+        async def solve_area(dest_area, drivers):
+            riders = await self._pending(station_id, dest_area)
+            plan = plan_batch([(req.arrival_eta_unix, route.seats_free) for req, route in drivers], riders)
+            outs = await asyncio.gather(*(
+                self._commit(req, route, ranked) if ranked
+                else _no_match(route)
+                for (req, route), ranked in zip(drivers, plan)
+            ), return_exceptions=True)
+            for (req, _), out in zip(drivers, outs):
+                results[req.route_id] = out
+
+        await asyncio.gather(*(solve_area(area, drivers) for area, drivers in by_area.items()))
+        log.info("batch", station_id=station_id, calls=len(batch), routes=len(requests))
+
+        for rid, futures in callers.items():
+            out = results[rid]
+            for done in futures:
+                if done.done():
+                    continue
+                if isinstance(out, BaseException):
+                    done.set_exception(out)
+                else:
+                    done.set_result(out)
 
 def factory():
-    server = grpc.aio.server()
-    matching_pb2_grpc.add_MatchingServiceServicer_to_server(MatchingServer(), server)
+    ensure_indexes(get_db(), ["match_dedup", "notification_outbox"])
+    server = new_server()
+    match = MatchingServer()
+    match.outbox.start()
+    on_shutdown(match.outbox.close)
+    if match.shards:
+        match.shards.start()
+    matching_pb2_grpc.add_MatchingServiceServicer_to_server(match, server)
     return server
 
 if __name__ == "__main__":
@@ -3,42 +3,183 @@ import os
 # Add the project root to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import asyncio
 import grpc
 import time
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo.errors import PyMongoError
 from lastmile.v1 import notification_pb2, notification_pb2_grpc
-from common.run import serve
-from common.db import get_db
+from common.run import new_server, serve
+from common.log import get_logger
+from common.db import get_async_db, get_db, ensure_indexes, pump_changes
+from common.cache import TTLCache
+from common.changes import ChangeHub
+
+log = get_logger("notification")
+
+# most stored notifications a reconnecting Subscribe replays
+SUBSCRIBE_REPLAY_LIMIT = int(os.getenv("SUBSCRIBE_REPLAY_LIMIT", "100"))
+# Without a change stream, other replicas' notifications for local
+# subscribers are picked up by polling Mongo this often.
+NOTIFY_POLL_SECONDS = float(os.getenv("NOTIFY_POLL_SECONDS", "1"))
+# how far back each poll looks, to catch inserts that landed after their timestamp
+NOTIFY_POLL_OVERLAP_MS = 5000
+
+def notification_from_doc(doc) -> notification_pb2.Notification:
+    return notification_pb2.Notification(
+        id=str(doc["_id"]),
+        user_id=doc["user_id"],
+        title=doc.get("title", ""),
+        body=doc.get("message", ""),
+        data_json=doc.get("data", ""),
+        timestamp=doc.get("timestamp", 0)
+    )
 
 class NotificationServer(notification_pb2_grpc.NotificationServiceServicer):
     def __init__(self):
-        self.db = get_db()
+        self.db = get_async_db()
+        # user_id -> hub of that user's Subscribe streams. Local pushes are
+        # delivered directly; inserts by other replicas arrive through the
+        # notifications change stream (replica set only), or by polling
+        # without one, minus the ids this replica already delivered.
+        self.subscribers: dict[str, ChangeHub] = {}
+        self._delivered = TTLCache(maxsize=10000, ttl=60)
+        self._tailing = False
+        self._poller: asyncio.Task | None = None
+        self._tail_lock = asyncio.Lock()
 
-    async def Push(self, request, context):
-        print(f"[notification] Push request={request}")
-        
+    def _deliver(self, doc):
+        nid = str(doc["_id"])
+        self._delivered.set(nid, True)
+        hub = self.subscribers.get(doc["user_id"])
+        if hub is not None:
+            hub.publish(notification_from_doc(doc))
+
+    def _on_mongo_change(self, change):
+        doc = change.get("fullDocument")
+        if doc and str(doc["_id"]) not in self._delivered:
+            self._deliver(doc)
+
+    async def _ensure_tail(self):
+        async with self._tail_lock:
+            if self._tailing:
+                return
+            try:
+                stream = await self.db.notifications.watch([{"$match": {"operationType": "insert"}}])
+            except PyMongoError as e:
+                # retried on the next Subscribe; poll meanwhile
+                if self._poller is None:
+                    log.warning("change streams unavailable, polling for other replicas' notifications",
+                                every_s=NOTIFY_POLL_SECONDS, error=e)
+                    self._poller = asyncio.create_task(self._poll())
+                return
+            pump_changes(stream, self._on_mongo_change, asyncio.get_running_loop(), name="notifications",
+                         on_end=self._on_tail_end)
+            self._tailing = True
+
+    def _on_tail_end(self):
+        # poll until the next Subscribe reopens the stream
+        self._tailing = False
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        """Deliver notifications stored by other replicas to local subscribers, until a tail opens."""
+        since = int(time.time() * 1000)
+        while True:
+            await asyncio.sleep(NOTIFY_POLL_SECONDS)
+            started = int(time.time() * 1000)
+            if self.subscribers:
+                try:
+                    docs = await self.db.notifications.find({
+                        "user_id": {"$in": list(self.subscribers)},
+                        "timestamp": {"$gte": since - NOTIFY_POLL_OVERLAP_MS},
+                    }, sort=[("timestamp", 1), ("_id", 1)])
+                except PyMongoError as e:
+                    log.warning("notification poll failed", error=e)
+                    continue
+                for doc in docs:
+                    if str(doc["_id"]) not in self._delivered:
+                        self._deliver(doc)
+            since = started
+            if self._tailing:  # one last poll covers the gap before the tail opened
+                self._poller = None
+                return
+
+    async def _store(self, pushes) -> int:
+        """Store one notification per target of every push in a single insert_many, then deliver them."""
         notifications_to_insert = []
         timestamp = int(time.time() * 1000) # ms
 
-        for t in request.targets:
-            print(f"[notify] to={t.user_id} via={t.channel} title='{request.title}' body='{request.body}' data={request.data_json}")
-            
-            # Store in MongoDB
-            notifications_to_insert.append({
-                "user_id": t.user_id,
-                "title": request.title,
-                "message": request.body,
-                "data": request.data_json,
-                "read": False,
-                "timestamp": timestamp
-            })
-            
+        for p in pushes:
+            for t in p.targets:
+                log.debug("notify", to=t.user_id, via=t.channel, title=p.title)
+
+                # Store in MongoDB
+                notifications_to_insert.append({
+                    "_id": ObjectId(),
+                    "user_id": t.user_id,
+                    "title": p.title,
+                    "message": p.body,
+                    "data": p.data_json,
+                    "read": False,
+                    "timestamp": timestamp
+                })
+
         if notifications_to_insert:
-            self.db.notifications.insert_many(notifications_to_insert)
+            await self.db.notifications.insert_many(notifications_to_insert)
+            for doc in notifications_to_insert:
+                self._deliver(doc)
+        return len(notifications_to_insert)
+
+    async def Push(self, request, context):
+        log.debug("Push", request=request)
+        n = await self._store([request])
+        return notification_pb2.PushResponse(attempted=n, success=n)
+
+    async def PushBatch(self, request, context):
+        log.debug("PushBatch", pushes=len(request.pushes))
+        n = await self._store(request.pushes)
+        return notification_pb2.PushResponse(attempted=n, success=n)
 
-        return notification_pb2.PushResponse(attempted=len(request.targets), success=len(request.targets))
+    async def Subscribe(self, request, context):
+        log.debug("Subscribe", request=request)
+        await self._ensure_tail()
+        user_id = request.user_id
+        # Subscribe before the replay query so nothing inserted in between is lost
+        hub = self.subscribers.setdefault(user_id, ChangeHub())
+        sub = hub.subscribe()
+        try:
+            replayed = set()
+            if request.since_ms:
+                newer = {"timestamp": {"$gt": request.since_ms}}
+                if request.after_id:
+                    try:
+                        after = ObjectId(request.after_id)
+                    except InvalidId:
+                        await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "after_id is not a notification id")
+                    # one _store shares a timestamp; _ids order its notifications
+                    newer = {"$or": [newer, {"timestamp": request.since_ms, "_id": {"$gt": after}}]}
+                docs = await self.db.notifications.find(
+                    {"user_id": user_id, **newer},
+                    sort=[("timestamp", -1), ("_id", -1)], limit=SUBSCRIBE_REPLAY_LIMIT
+                )
+                for doc in reversed(docs):
+                    n = notification_from_doc(doc)
+                    replayed.add(n.id)
+                    yield n
+            async for n in sub:
+                if n.id not in replayed:
+                    yield n
+        finally:
+            sub.close()
+            if not len(hub) and self.subscribers.get(user_id) is hub:
+                del self.subscribers[user_id]
 
 def factory():
-    server = grpc.aio.server()
+    ensure_indexes(get_db(), ["notifications"])
+    server = new_server()
     notification_pb2_grpc.add_NotificationServiceServicer_to_server(NotificationServer(), server)
     return server
 
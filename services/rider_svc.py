@@ -1,23 +1,217 @@
 import asyncio
+import os
 import time
+from datetime import datetime, timezone
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable
 import grpc
+from pymongo.errors import PyMongoError
 from lastmile.v1 import rider_pb2, rider_pb2_grpc, common_pb2
-from common.run import run_grpc  
-from common.db import get_db
+from common.run import new_server, run_grpc
+from common.log import get_logger
+from common.metrics import METRICS_PORT, start_metrics_server
+from common.db import get_async_db, get_db, ensure_indexes, pump_changes, RIDER_EXPIRY_GRACE_SECONDS
+from common.changes import ChangeHub, RESYNC, UPSERT, DELETE
+
+log = get_logger("rider")
+
+# Serve ListPendingAtStation from memory (set to 0 to query Mongo every time).
+RIDER_PENDING_INDEX = os.getenv("RIDER_PENDING_INDEX", "1") != "0"
+# Without a change stream, writes made by other replicas (or other services)
+# only reach the index on a full reload, at most this often.
+RIDER_INDEX_RELOAD_SECONDS = int(os.getenv("RIDER_INDEX_RELOAD_SECONDS", "60"))
+
+_MAX_ID = "\U0010ffff"
+
+def request_from_doc(doc) -> common_pb2.RiderRequest:
+    return common_pb2.RiderRequest(
+        id=str(doc["_id"]),
+        rider_id=doc["rider_id"],
+        station_id=doc["station_id"],
+        eta_unix=doc["eta_unix"],
+        dest_area=doc["dest_area"],
+        status=doc["status"]
+    )
 
 class RiderStore:
-    def __init__(self):
+    """PENDING rider requests, bucketed by (station_id, dest_area) and sorted by eta_unix.
+
+    A window query is two bisects into one bucket, so it costs O(log n + k)
+    however many requests are stored. Mongo stays the source of truth; this
+    is rebuilt from it with `replace` and kept current by write-through.
+    Every change is reported to `on_change(op, request)` (RESYNC after a
+    `replace`, with request None).
+    """
+
+    def __init__(self, on_change: Callable[[str, common_pb2.RiderRequest | None], None] | None = None):
         self.lock = asyncio.Lock()
         self.requests: dict[str, common_pb2.RiderRequest] = {}
-        self.by_station: dict[str, set[str]] = {}
+        self.by_station: dict[tuple[str, str], list[tuple[int, str]]] = {}
+        self.on_change = on_change
+
+    def _notify(self, op: str, req: common_pb2.RiderRequest | None):
+        if self.on_change is not None:
+            self.on_change(op, req)
+
+    def __len__(self):
+        return len(self.requests)
+
+    def __contains__(self, rid):
+        return rid in self.requests
+
+    def _insert(self, req: common_pb2.RiderRequest):
+        self._drop(req.id)
+        self.requests[req.id] = req
+        insort(self.by_station.setdefault((req.station_id, req.dest_area), []), (req.eta_unix, req.id))
+
+    def _drop(self, rid: str) -> common_pb2.RiderRequest | None:
+        req = self.requests.pop(rid, None)
+        if req is None:
+            return None
+        key = (req.station_id, req.dest_area)
+        bucket = self.by_station[key]
+        i = bisect_left(bucket, (req.eta_unix, rid))
+        del bucket[i]
+        if not bucket:
+            del self.by_station[key]
+        return req
+
+    def add(self, req: common_pb2.RiderRequest):
+        self._insert(req)
+        self._notify(UPSERT, req)
+
+    def remove(self, rid: str) -> bool:
+        req = self._drop(rid)
+        if req is None:
+            return False
+        self._notify(DELETE, req)
+        return True
+
+    def window(self, station_id: str, dest_area: str, lo: int, hi: int) -> list[common_pb2.RiderRequest]:
+        """Requests with lo <= eta_unix <= hi, earliest first."""
+        bucket = self.by_station.get((station_id, dest_area))
+        if not bucket:
+            return []
+        i = bisect_left(bucket, (lo, ""))
+        j = bisect_right(bucket, (hi, _MAX_ID))
+        return [self.requests[rid] for _, rid in bucket[i:j]]
+
+    def at_station(self, station_id: str, dest_area: str = "") -> list[common_pb2.RiderRequest]:
+        """Every request at a station (one destination, or all if dest_area is empty), earliest first."""
+        if dest_area:
+            return [self.requests[rid] for _, rid in self.by_station.get((station_id, dest_area), [])]
+        out = [self.requests[rid] for (sid, _), bucket in self.by_station.items() if sid == station_id
+               for _, rid in bucket]
+        out.sort(key=lambda r: r.eta_unix)
+        return out
+
+    def expire(self, cutoff_unix: int) -> int:
+        """Drop every request with eta_unix < cutoff_unix."""
+        n = 0
+        for key in list(self.by_station):
+            bucket = self.by_station[key]
+            i = bisect_left(bucket, (cutoff_unix, ""))
+            for _, rid in bucket[:i]:
+                self._notify(DELETE, self.requests.pop(rid))
+            del bucket[:i]
+            n += i
+            if not bucket:
+                del self.by_station[key]
+        return n
+
+    def replace(self, reqs):
+        self.requests.clear()
+        self.by_station.clear()
+        for req in reqs:
+            self._insert(req)
+        self._notify(RESYNC, None)
 
 class RiderServer(rider_pb2_grpc.RiderServiceServicer):
     def __init__(self):
-        self.db = get_db()
+        self.db = get_async_db()
         self.requests = self.db.rider_requests
+        self.pending = RiderStore(on_change=self._publish_pending)
+        # station_id -> hub of WatchStation subscribers for that station
+        self.watchers: dict[str, ChangeHub] = {}
+        self._loaded_at: float | None = None
+        self._loading = False
+        self._backlog: list = []
+        self._tailing = False
+        self._retail: asyncio.Task | None = None
+        self.maintenance: asyncio.Task | None = None
+
+    # --- pending index ---
+    def _apply(self, fn, *args):
+        # writes that land while a reload is reading Mongo are replayed on top of it
+        if self._loading:
+            self._backlog.append((fn, args))
+            return None
+        return fn(*args)
+
+    async def load_pending(self):
+        """(Re)build the pending index from Mongo."""
+        async with self.pending.lock:
+            self._loading, self._backlog = True, []
+            try:
+                docs = await self.requests.find({"status": "PENDING"}, sort=[("eta_unix", 1)])
+                self.pending.replace(request_from_doc(d) for d in docs)
+                for fn, args in self._backlog:
+                    fn(*args)
+                self._loaded_at = time.monotonic()
+            finally:
+                self._loading, self._backlog = False, []
+        log.info("pending index loaded", requests=len(self.pending))
+
+    def _publish_pending(self, op: str, req: common_pb2.RiderRequest | None):
+        if op == RESYNC:
+            for hub in self.watchers.values():
+                hub.publish(rider_pb2.PendingChange(op=RESYNC))
+            return
+        hub = self.watchers.get(req.station_id)
+        if hub is not None:
+            hub.publish(rider_pb2.PendingChange(op=op, request_id=req.id, request=req))
+
+    async def _ensure_loaded(self):
+        if self._loaded_at is None:
+            await self.load_pending()
+
+    def _on_mongo_change(self, change):
+        rid = str(change.get("documentKey", {}).get("_id", ""))
+        doc = change.get("fullDocument")
+        if change.get("operationType") != "delete" and doc and doc.get("status") == "PENDING":
+            self._apply(self.pending.add, request_from_doc(doc))
+        else:
+            self._apply(self.pending.remove, rid)
+
+    async def start_tail(self) -> bool:
+        """Follow rider_requests writes made elsewhere (other replicas, TripService). Needs a replica set."""
+        try:
+            stream = await self.requests.watch(full_document="updateLookup")
+        except PyMongoError as e:
+            log.warning("change streams unavailable, reloading index periodically", every_s=RIDER_INDEX_RELOAD_SECONDS, error=e)
+            return False
+        pump_changes(stream, self._on_mongo_change, asyncio.get_running_loop(), name="rider_requests",
+                     on_end=self._on_tail_end)
+        self._tailing = True
+        return True
+
+    def _on_tail_end(self):
+        # writes made elsewhere since the stream died are unknown until the index is reloaded
+        self._tailing = False
+        self._retail = asyncio.ensure_future(self._reopen_tail())
+
+    async def _reopen_tail(self):
+        """Re-tail, then reload once; if the tail can't be reopened the periodic reload takes over."""
+        await self.start_tail()
+        try:
+            await self.load_pending()
+        except PyMongoError as e:
+            log.warning("pending index reload failed, retrying on the reload schedule", error=e)
+            if self._loaded_at is not None:
+                self._loaded_at = time.monotonic() - RIDER_INDEX_RELOAD_SECONDS
 
     async def AddRequest(self, request, context):
-        print(f"[rider] AddRequest request={request}")
+        log.debug("AddRequest", request=request)
         r = request.request
         
         req_doc = {
@@ -25,9 +219,11 @@ class RiderServer(rider_pb2_grpc.RiderServiceServicer):
             "station_id": r.station_id,
             "eta_unix": r.eta_unix,
             "dest_area": r.dest_area,
-            "status": r.status or "PENDING"
+            "status": r.status or "PENDING",
+            # reaped by the pending_ttl index while still PENDING
+            "expire_at": datetime.fromtimestamp(r.eta_unix + RIDER_EXPIRY_GRACE_SECONDS, tz=timezone.utc),
         }
-        res = self.requests.insert_one(req_doc)
+        res = await self.requests.insert_one(req_doc)
         rid = str(res.inserted_id)
         
         req = common_pb2.RiderRequest(
@@ -35,14 +231,21 @@ class RiderServer(rider_pb2_grpc.RiderServiceServicer):
             eta_unix=r.eta_unix, dest_area=r.dest_area,
             status=req_doc["status"],
         )
+        if req.status == "PENDING":
+            self._apply(self.pending.add, req)
         return rider_pb2.AddRequestResponse(request=req)
 
     async def ListPendingAtStation(self, request, context):
-        print(f"[rider] ListPendingAtStation request={request}")
+        log.debug("ListPendingAtStation", request=request)
         now = request.now_unix
         window = request.minutes_window
         lo, hi = now - window*60, now + window*60
 
+        if RIDER_PENDING_INDEX:
+            await self._ensure_loaded()
+            out = self.pending.window(request.station_id, request.dest_area, lo, hi)
+            return rider_pb2.ListPendingAtStationResponse(requests=out)
+
         query = {
             "station_id": request.station_id,
             "dest_area": request.dest_area,
@@ -50,79 +253,138 @@ class RiderServer(rider_pb2_grpc.RiderServiceServicer):
             "eta_unix": {"$gte": lo, "$lte": hi}
         }
         
-        out = []
-        cursor = self.requests.find(query).sort("eta_unix", 1)
-        for doc in cursor:
-            out.append(common_pb2.RiderRequest(
-                id=str(doc["_id"]),
-                rider_id=doc["rider_id"],
-                station_id=doc["station_id"],
-                eta_unix=doc["eta_unix"],
-                dest_area=doc["dest_area"],
-                status=doc["status"]
-            ))
-            
+        docs = await self.requests.find(query, sort=[("eta_unix", 1)])
+        out = [request_from_doc(doc) for doc in docs]
         return rider_pb2.ListPendingAtStationResponse(requests=out)
 
     async def MarkAssigned(self, request, context):
-        print(f"[rider] MarkAssigned request={request}")
+        """Assign every still-PENDING request to the trip, and report exactly which ones that was.
+
+        One update_many claims them all; one find by trip_id then tells ours
+        apart from the ones another match took first. That is two round trips
+        however many seats are being filled, and a retry with the same
+        trip_id reports the same ids as assigned.
+        """
+        log.debug("MarkAssigned", request=request)
+        from bson.objectid import ObjectId
+        from bson.errors import InvalidId
+        oids = {}
+        for rid in request.request_ids:
+            try:
+                oids[rid] = ObjectId(rid)
+            except (InvalidId, TypeError):
+                pass  # can't exist in Mongo; reported as taken
+
+        assigned = set()
+        if oids:
+            await self.requests.update_many(
+                {"_id": {"$in": list(oids.values())}, "status": "PENDING"},
+                {"$set": {"status": "ASSIGNED", "trip_id": request.trip_id}}
+            )
+            docs = await self.requests.find(
+                {"_id": {"$in": list(oids.values())}, "status": "ASSIGNED", "trip_id": request.trip_id},
+                {"_id": 1}
+            )
+            assigned = {str(d["_id"]) for d in docs}
+
+        # neither kind is PENDING in Mongo any more
+        for rid in request.request_ids:
+            self._apply(self.pending.remove, rid)
+
+        assigned_ids = [rid for rid in request.request_ids if rid in assigned]
+        taken_ids = [rid for rid in request.request_ids if rid not in assigned]
+        return rider_pb2.MarkAssignedResponse(updated=len(assigned_ids), assigned_ids=assigned_ids, taken_ids=taken_ids)
+
+    async def UnassignRequests(self, request, context):
+        log.debug("UnassignRequests", request=request)
         from bson.objectid import ObjectId
         n = 0
         for rid in request.request_ids:
             try:
-                oid = ObjectId(rid)
-                res = self.requests.update_one(
-                    {"_id": oid, "status": "PENDING"},
-                    {"$set": {"status": "ASSIGNED", "trip_id": request.trip_id}}
+                doc = await self.requests.find_one_and_update(
+                    {"_id": ObjectId(rid), "status": "ASSIGNED", "trip_id": request.trip_id},
+                    {"$set": {"status": "PENDING"}, "$unset": {"trip_id": ""}},
+                    return_document=True
                 )
-                if res.modified_count > 0:
-                    n += 1
-            except:
-                pass
-        return rider_pb2.MarkAssignedResponse(updated=n)
-
-    # --- New Background Task ---
-    async def cleanup_expired_requests(self):
-        print("[rider] Starting background cleanup task...")
+            except Exception as e:
+                log.error("UnassignRequests failed", request_id=rid, error=e)
+                continue
+            if doc:
+                n += 1
+                self._apply(self.pending.add, request_from_doc(doc))
+        return rider_pb2.UnassignRequestsResponse(updated=n)
+
+    async def WatchStation(self, request, context):
+        """Live pending board for one station: a snapshot, then every change to it."""
+        log.debug("WatchStation", request=request)
+        if not RIDER_PENDING_INDEX:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "WatchStation needs RIDER_PENDING_INDEX")
+        await self._ensure_loaded()
+        station_id, dest_area = request.station_id, request.dest_area
+
+        def snapshot():
+            yield rider_pb2.PendingChange(op=RESYNC)
+            for r in self.pending.at_station(station_id, dest_area):
+                yield rider_pb2.PendingChange(op=UPSERT, request_id=r.id, request=r)
+
+        hub = self.watchers.setdefault(station_id, ChangeHub())
+        sub = hub.subscribe()
+        try:
+            for change in snapshot():
+                yield change
+            async for change in sub:
+                if change.op == RESYNC:
+                    for c in snapshot():
+                        yield c
+                elif not dest_area or change.request.dest_area == dest_area:
+                    yield change
+        finally:
+            sub.close()
+            if not len(hub) and self.watchers.get(station_id) is hub:
+                del self.watchers[station_id]
+
+    # --- Background maintenance ---
+    async def maintain_pending_index(self):
+        """Keep the in-memory index in step with Mongo's TTL expiry.
+
+        Mongo deletes expired requests itself (pending_ttl index), once for
+        the whole cluster, so replicas no longer run delete_many. Each one only
+        drops the same requests from its own index, and reloads the index
+        when it has no change stream to follow.
+        """
+        log.info("starting pending index maintenance")
         while True:
             try:
-                # 10 minutes (600 seconds) tolerance
-                # If ETA was 10:00, and it is now 10:11, we delete it.
-                # Logic: Delete if (eta_unix + 600) < now  =>  eta_unix < (now - 600)
-                cutoff_unix = int(time.time()) - 600
-                
-                result = self.requests.delete_many({
-                    "status": "PENDING",
-                    "eta_unix": {"$lt": cutoff_unix}
-                })
-                
-                if result.deleted_count > 0:
-                    print(f"[rider] Cleaned up {result.deleted_count} expired requests (ETA + 10m passed).")
-            
-            except Exception as e:
-                print(f"[rider] Error in cleanup task: {e}")
-            
+                n = self._apply(self.pending.expire, int(time.time()) - RIDER_EXPIRY_GRACE_SECONDS)
+                if n:
+                    log.info("expired requests from the pending index", n=n)
+
+                if (not self._tailing and self._loaded_at is not None
+                        and time.monotonic() - self._loaded_at >= RIDER_INDEX_RELOAD_SECONDS):
+                    await self.load_pending()
+            except Exception:
+                log.exception("index maintenance failed")
             # Check every 60 seconds
             await asyncio.sleep(60)
 
-async def main():
-    server = grpc.aio.server()
+async def factory():
+    ensure_indexes(get_db(), ["rider_requests"])
+    server = new_server()
     rider_svc = RiderServer()
     rider_pb2_grpc.add_RiderServiceServicer_to_server(rider_svc, server)
-    
-    # Start the cleanup loop as a background task
-    cleanup_task = asyncio.create_task(rider_svc.cleanup_expired_requests())
-    
-    try:
-        # Use run_grpc helper to start server and wait for termination
-        await run_grpc(server, "[::]:50054")
-    finally:
-        # Ensure task is cancelled on exit
-        cleanup_task.cancel()
-        try:
-            await cleanup_task
-        except asyncio.CancelledError:
-            pass
+    if RIDER_PENDING_INDEX:
+        # tail first so nothing written during the initial load is missed
+        await rider_svc.start_tail()
+        await rider_svc.load_pending()
+        # Expiry itself is Mongo's job (pending_ttl); this only keeps the index in step
+        rider_svc.maintenance = asyncio.create_task(rider_svc.maintain_pending_index())
+    return server
+
+async def main():
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    # the index maintenance task is cancelled with the loop when the server stops
+    await run_grpc(await factory(), "[::]:50054")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
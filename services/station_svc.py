@@ -1,16 +1,76 @@
 import asyncio
 import grpc
 from lastmile.v1 import station_pb2, station_pb2_grpc, common_pb2
-from common.run import serve
-from common.db import get_db
+from common.run import new_server, serve
+from common.log import get_logger
+from common.db import get_async_db, pump_changes, CHANGE_STREAM_RETRY_SECONDS
+from common.changes import ChangeHub, RESYNC, UPSERT, DELETE
+from pymongo.errors import PyMongoError
+
+log = get_logger("station")
+
+def station_from_doc(doc) -> common_pb2.Station:
+    return common_pb2.Station(
+        id=doc["_id"],
+        name=doc["name"],
+        location=common_pb2.LatLng(lat=doc["location"]["lat"], lon=doc["location"]["lon"]),
+        nearby_areas=doc["nearby_areas"]
+    )
 
 class StationServer(station_pb2_grpc.StationServiceServicer):
     def __init__(self):
-        self.db = get_db()
+        self.db = get_async_db()
         self.stations = self.db.stations
+        # Station change feed for WatchStations; same scheme as DriverServer's
+        # route feed (local writes + change stream tail when available).
+        self.changes = ChangeHub()
+        self._tailing = False
+        self._tail_lock = asyncio.Lock()
+        self._retail: asyncio.Task | None = None
+
+    def _publish(self, op: str, station_id: str, station: common_pb2.Station | None = None):
+        self.changes.publish(station_pb2.StationChange(op=op, station_id=station_id, station=station))
+
+    def _on_mongo_change(self, change):
+        station_id = str(change.get("documentKey", {}).get("_id", ""))
+        if change.get("operationType") == "delete":
+            self._publish(DELETE, station_id)
+        elif change.get("fullDocument"):
+            self._publish(UPSERT, station_id, station_from_doc(change["fullDocument"]))
+        else:
+            self._publish(UPSERT, station_id)
+
+    async def _ensure_tail(self):
+        async with self._tail_lock:
+            if self._tailing:
+                return
+            try:
+                stream = await self.stations.watch(full_document="updateLookup")
+            except PyMongoError as e:
+                # retried by the next watcher
+                log.warning("change streams unavailable, publishing local writes only", error=e)
+                return
+            pump_changes(stream, self._on_mongo_change, asyncio.get_running_loop(), name="stations",
+                         on_end=self._on_tail_end)
+            self._tailing = True
+
+    def _on_tail_end(self):
+        # writes made elsewhere while the stream is down are lost: watchers drop their caches
+        self._tailing = False
+        self._publish(RESYNC, "")
+        if len(self.changes):  # otherwise the next watcher reopens it
+            self._retail = asyncio.ensure_future(self._reopen_tail())
+
+    async def _reopen_tail(self):
+        while not self._tailing and len(self.changes):
+            await self._ensure_tail()
+            if self._tailing:
+                self._publish(RESYNC, "")  # covers what changed before the new stream opened
+                return
+            await asyncio.sleep(CHANGE_STREAM_RETRY_SECONDS)
 
     async def UpsertStation(self, request, context):
-        print(f"[station] UpsertStation request={request}")
+        log.debug("UpsertStation", request=request)
         s = request.station
         # Use provided ID or generate one. Station IDs are often semantic (e.g. "MG_ROAD"), so we might want to keep that as _id or a separate field.
         # The current code used `sid = s.id or f"st_{s.name}"`.
@@ -25,46 +85,46 @@ class StationServer(station_pb2_grpc.StationServiceServicer):
             "nearby_areas": list(s.nearby_areas)
         }
         
-        self.stations.replace_one({"_id": sid}, doc, upsert=True)
+        await self.stations.replace_one({"_id": sid}, doc, upsert=True)
         
         ns = common_pb2.Station(
             id=sid, name=s.name, location=s.location, nearby_areas=list(s.nearby_areas)
         )
+        self._publish(UPSERT, sid, ns)
         return station_pb2.UpsertStationResponse(station=ns)
 
     async def GetStation(self, request, context):
-        print(f"[station] GetStation request={request}")
-        doc = self.stations.find_one({"_id": request.id})
-        st = None
-        if doc:
-            st = common_pb2.Station(
-                id=doc["_id"],
-                name=doc["name"],
-                location=common_pb2.LatLng(lat=doc["location"]["lat"], lon=doc["location"]["lon"]),
-                nearby_areas=doc["nearby_areas"]
-            )
+        log.debug("GetStation", request=request)
+        doc = await self.stations.find_one({"_id": request.id})
+        st = station_from_doc(doc) if doc else None
         return station_pb2.GetStationResponse(station=st)
 
     async def ListStations(self, request, context):
-        print(f"[station] ListStations request={request}")
+        log.debug("ListStations", request=request)
         out = []
-        for doc in self.stations.find():
-            out.append(common_pb2.Station(
-                id=doc["_id"],
-                name=doc["name"],
-                location=common_pb2.LatLng(lat=doc["location"]["lat"], lon=doc["location"]["lon"]),
-                nearby_areas=doc["nearby_areas"]
-            ))
+        for doc in await self.stations.find():
+            out.append(station_from_doc(doc))
         return station_pb2.ListStationsResponse(stations=out)
 
     async def NearbyAreas(self, request, context):
-        print(f"[station] NearbyAreas request={request}")
-        doc = self.stations.find_one({"_id": request.id})
+        log.debug("NearbyAreas", request=request)
+        doc = await self.stations.find_one({"_id": request.id})
         areas = doc["nearby_areas"] if doc else []
         return station_pb2.NearbyAreasResponse(nearby_areas=areas)
 
+    async def WatchStations(self, request, context):
+        log.debug("WatchStations", request=request)
+        await self._ensure_tail()
+        sub = self.changes.subscribe()
+        try:
+            yield station_pb2.StationChange(op=RESYNC)
+            async for change in sub:
+                yield change
+        finally:
+            sub.close()
+
 def factory():
-    server = grpc.aio.server()
+    server = new_server()
     station_pb2_grpc.add_StationServiceServicer_to_server(StationServer(), server)
     return server
 
@@ -1,9 +1,15 @@
 import asyncio
 import grpc
 from lastmile.v1 import trip_pb2, trip_pb2_grpc, common_pb2, notification_pb2, notification_pb2_grpc
-from common.run import serve
+from common import tracing
+from common.run import new_server, on_shutdown, serve
+from common.log import get_logger
 from common.env import addr
-from common.db import get_db
+from common.db import get_async_db, get_db, ensure_indexes
+from common.outbox import Outbox
+from pymongo.errors import DuplicateKeyError
+
+log = get_logger("trip")
 
 class TripStore:
     def __init__(self):
@@ -13,16 +19,23 @@ class TripStore:
 
 class TripServer(trip_pb2_grpc.TripServiceServicer):
     def __init__(self):
-        self.db = get_db()
+        self.db = get_async_db()
         self.trips = self.db.trips
         
         # Connect to Notification Service
         self._notify_addr = addr("NOTIFY_ADDR", "localhost:50056")
-        self._notify_ch = grpc.aio.insecure_channel(self._notify_addr)
+        self._notify_ch = tracing.aio_channel(self._notify_addr)
         self.notify = notification_pb2_grpc.NotificationServiceStub(self._notify_ch)
+        # Notifications leave through an outbox, so a slow or down notification
+        # service never holds up a trip RPC
+        self.outbox = Outbox(self._send_notifications, self.db.notification_outbox,
+                             notification_pb2.PushRequest, name="trip-outbox")
+
+    async def _send_notifications(self, pushes):
+        await self.notify.PushBatch(notification_pb2.PushBatchRequest(pushes=pushes), timeout=10)
 
     async def CreateTrip(self, request, context):
-        print(f"[trip] CreateTrip request={request}")
+        log.debug("CreateTrip", request=request)
         
         trip_doc = {
             "driver_id": request.driver_id,
@@ -31,8 +44,19 @@ class TripServer(trip_pb2_grpc.TripServiceServicer):
             "station_id": request.station_id,
             "status": "SCHEDULED"
         }
-        res = self.trips.insert_one(trip_doc)
-        tid = str(res.inserted_id)
+        if request.trip_id:
+            from bson.errors import InvalidId
+            from bson.objectid import ObjectId
+            try:
+                trip_doc["_id"] = ObjectId(request.trip_id)
+            except InvalidId:
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "trip_id is not a trip id")
+        try:
+            res = await self.trips.insert_one(trip_doc)
+            tid = str(res.inserted_id)
+        except DuplicateKeyError:
+            # a retry of a CreateTrip that already went through
+            tid = request.trip_id
         
         t = common_pb2.Trip(
             id=tid, driver_id=request.driver_id, rider_ids=list(request.rider_ids),
@@ -41,16 +65,15 @@ class TripServer(trip_pb2_grpc.TripServiceServicer):
         return trip_pb2.CreateTripResponse(trip=t)
 
     async def UpdateTripStatus(self, request, context):
-        print(f"[trip] UpdateTripStatus request={request}")
+        log.debug("UpdateTripStatus", request=request)
         from bson.objectid import ObjectId
         try:
             oid = ObjectId(request.trip_id)
-            res = self.trips.find_one_and_update(
+            res = await self.trips.find_one_and_update(
                 {"_id": oid},
                 {"$set": {"status": request.status}},
                 return_document=True
             )
-            print(res)
         except:
             res = None
             
@@ -61,34 +84,31 @@ class TripServer(trip_pb2_grpc.TripServiceServicer):
         if request.status == "COMPLETED":
             route_id = res.get("route_id")
             if route_id:
-                print(f"[trip] Deleting route {route_id} for completed trip {oid}")
+                log.info("deleting route of completed trip", route_id=route_id, trip_id=request.trip_id)
                 # We need to access driver_routes collection. 
                 # Since we only initialized self.trips, let's get the db again or access it
-                self.db.driver_routes.delete_one({"_id": ObjectId(route_id)})
+                await self.db.driver_routes.delete_one({"_id": ObjectId(route_id)})
             
             # Also mark rider requests as COMPLETED
             rider_ids = res.get("rider_ids", [])
             if rider_ids:
-                print(f"[trip] Marking rider requests for riders {rider_ids} as COMPLETED")
+                log.info("completing rider requests", rider_ids=rider_ids)
                 # We assume one active request per rider for now, or we could filter by station/time if needed.
                 # But simply marking all non-completed requests for these riders as COMPLETED is a safe heuristic for this MVP.
-                self.db.rider_requests.update_many(
+                await self.db.rider_requests.update_many(
                     {"rider_id": {"$in": rider_ids}, "status": {"$ne": "COMPLETED"}},
                     {"$set": {"status": "COMPLETED"}}
                 )
                 
                 # Send notification to riders
-                try:
-                    targets = [notification_pb2.PushTarget(user_id=rid, channel="log") for rid in rider_ids]
-                    await self.notify.Push(notification_pb2.PushRequest(
-                        targets=targets, 
-                        title="Trip Completed", 
-                        body="You have arrived at your destination. Thank you for riding with LastMile!",
-                        data_json=f'{{"tripId":"{request.trip_id}", "status":"COMPLETED"}}'
-                    ))
-                    print(f"[trip] Sent completion notification to {len(rider_ids)} riders")
-                except Exception as e:
-                    print(f"[trip] Failed to send notification: {e}")
+                targets = [notification_pb2.PushTarget(user_id=rid, channel="log") for rid in rider_ids]
+                self.outbox.put(notification_pb2.PushRequest(
+                    targets=targets,
+                    title="Trip Completed",
+                    body="You have arrived at your destination. Thank you for riding with LastMile!",
+                    data_json=f'{{"tripId":"{request.trip_id}", "status":"COMPLETED"}}'
+                ))
+                log.debug("queued completion notification", riders=len(rider_ids))
 
         t = common_pb2.Trip(
             id=str(res["_id"]),
@@ -100,9 +120,37 @@ class TripServer(trip_pb2_grpc.TripServiceServicer):
         )
         return trip_pb2.UpdateTripStatusResponse(trip=t)
 
+    async def RemoveRiders(self, request, context):
+        log.debug("RemoveRiders", request=request)
+        from bson.objectid import ObjectId
+        try:
+            oid = ObjectId(request.trip_id)
+        except Exception:
+            return trip_pb2.RemoveRidersResponse()
+        res = await self.trips.find_one_and_update(
+            {"_id": oid},
+            {"$pullAll": {"rider_ids": list(request.rider_ids)}},
+            return_document=True
+        )
+        if not res:
+            return trip_pb2.RemoveRidersResponse()
+        t = common_pb2.Trip(
+            id=str(res["_id"]),
+            driver_id=res["driver_id"],
+            rider_ids=res["rider_ids"],
+            route_id=res["route_id"],
+            station_id=res["station_id"],
+            status=res["status"]
+        )
+        return trip_pb2.RemoveRidersResponse(trip=t)
+
 def factory():
-    server = grpc.aio.server()
-    trip_pb2_grpc.add_TripServiceServicer_to_server(TripServer(), server)
+    ensure_indexes(get_db(), ["trips", "notification_outbox"])
+    server = new_server()
+    trip = TripServer()
+    trip.outbox.start()
+    on_shutdown(trip.outbox.close)
+    trip_pb2_grpc.add_TripServiceServicer_to_server(trip, server)
     return server
 
 if __name__ == "__main__":
@@ -1,16 +1,19 @@
 import asyncio
 import grpc
 from lastmile.v1 import user_pb2, user_pb2_grpc, common_pb2
-from common.run import serve
-from common.db import get_db
+from common.run import new_server, serve
+from common.log import get_logger
+from common.db import get_async_db, get_db, ensure_indexes
+
+log = get_logger("user")
 
 class UserServer(user_pb2_grpc.UserServiceServicer):
     def __init__(self):
-        self.db = get_db()
+        self.db = get_async_db()
         self.users = self.db.users
 
     async def CreateUser(self, request, context):
-        print(f"[user] CreateUser request={request}")
+        log.debug("CreateUser", request=request)
         u = request.user
         # Auto-generate ID if not provided, or use provided one (though user asked for auto-gen, client might send one if we don't change it. 
         # But the prompt said "do not ask rider_id or driver_id they should be auto generated by monogodb itself".
@@ -26,7 +29,7 @@ class UserServer(user_pb2_grpc.UserServiceServicer):
             "phone": u.phone,
             "password": request.password
         }
-        result = self.users.insert_one(user_doc)
+        result = await self.users.insert_one(user_doc)
         uid = str(result.inserted_id)
         
         # Update the doc with the ID string for easier retrieval if needed, or just construct the response
@@ -34,17 +37,17 @@ class UserServer(user_pb2_grpc.UserServiceServicer):
         return user_pb2.CreateUserResponse(user=nu)
 
     async def GetUser(self, request, context):
-        print(f"[user] GetUser request={request}")
+        log.debug("GetUser", request=request)
         from bson.objectid import ObjectId
         try:
             oid = ObjectId(request.id)
-            doc = self.users.find_one({"_id": oid})
+            doc = await self.users.find_one({"_id": oid})
         except:
             doc = None
             
         if not doc:
              # Fallback: maybe it was stored as string ID?
-             doc = self.users.find_one({"_id": request.id})
+             doc = await self.users.find_one({"_id": request.id})
 
         if doc:
             u = common_pb2.User(
@@ -57,15 +60,16 @@ class UserServer(user_pb2_grpc.UserServiceServicer):
         return user_pb2.GetUserResponse()
 
     async def Authenticate(self, request, context):
-        print(f"[user] Authenticate request={request}")
+        log.debug("Authenticate", request=request)
         # Find by phone
-        doc = self.users.find_one({"phone": request.phone})
+        doc = await self.users.find_one({"phone": request.phone})
         if doc and doc["password"] == request.password:
             return user_pb2.AuthenticateResponse(user_id=str(doc["_id"]), jwt="demo-jwt")
         return user_pb2.AuthenticateResponse()
 
 def factory():
-    server = grpc.aio.server()
+    ensure_indexes(get_db(), ["users"])
+    server = new_server()
     user_pb2_grpc.add_UserServiceServicer_to_server(UserServer(), server)
     return server
 
@@ -0,0 +1,23 @@
+import itertools
+import numpy as np
+from common.assignment import solve_assignment
+
+def _brute(c):
+    n, m = c.shape
+    if n <= m:
+        return min(sum(c[i, p[i]] for i in range(n)) for p in itertools.permutations(range(m), n))
+    return min(sum(c[p[j], j] for j in range(m)) for p in itertools.permutations(range(n), m))
+
+def test_matches_brute_force_on_rectangular_problems():
+    rnd = np.random.default_rng(7)
+    for _ in range(100):
+        n, m = (int(x) for x in rnd.integers(1, 6, 2))
+        c = rnd.integers(0, 30, (n, m)).astype(float)
+        pairs = solve_assignment(c)
+        assert len(pairs) == min(n, m)
+        assert len({i for i, _ in pairs}) == len({j for _, j in pairs}) == len(pairs)
+        assert sum(c[i, j] for i, j in pairs) == _brute(c)
+
+def test_empty():
+    assert solve_assignment([]) == []
+    assert solve_assignment(np.zeros((0, 3))) == []
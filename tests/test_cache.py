@@ -0,0 +1,55 @@
+from common.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_keeps_recently_used():
+    c = TTLCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1      # a is now most recent
+    c.set("c", 3)               # evicts b
+    assert "b" not in c
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    c = TTLCache(maxsize=10, ttl=5, clock=clock)
+    c.set("a", 1)
+    clock.now = 4.9
+    assert c.get("a") == 1
+    clock.now = 5.0
+    assert c.get("a") is None
+    s = c.stats()
+    assert (s["hits"], s["misses"], s["expirations"], s["size"]) == (1, 1, 1, 0)
+
+
+def test_invalidation_hooks():
+    c = TTLCache(maxsize=10)
+    for k in range(5):
+        c.set(k, k * 10)
+    assert c.invalidate(0) is True
+    assert c.invalidate(0) is False
+    assert c.invalidate_where(lambda k, v: v >= 30) == 2
+    assert sorted(k for k in range(5) if k in c) == [1, 2]
+    assert c.stats()["invalidations"] == 3
+
+
+def test_on_evict_sees_what_the_cache_drops_by_itself():
+    clock, dropped = FakeClock(), []
+    c = TTLCache(maxsize=2, ttl=5, clock=clock, on_evict=lambda k, v: dropped.append((k, v)))
+    c.set("a", 1)
+    c.set("b", 2)
+    c.set("c", 3)               # evicts a
+    c.invalidate("b")           # the caller's own drop: not reported
+    clock.now = 5.0
+    assert c.get("c") is None   # expired
+    assert dropped == [("a", 1), ("c", 3)]
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+import grpc
+from common.changes import ChangeHub, follow, RESYNC, UPSERT
+from lastmile.v1 import driver_pb2
+
+@pytest.mark.asyncio
+async def test_hub_fans_out_in_order():
+    hub = ChangeHub()
+    a, b = hub.subscribe(), hub.subscribe()
+    for i in range(3):
+        hub.publish(i)
+    hub.publish("end")
+
+    async def drain(sub):
+        out = []
+        async for ev in sub:
+            if ev == "end":
+                break
+            out.append(ev)
+        return out
+
+    assert await drain(a) == [0, 1, 2]
+    assert await drain(b) == [0, 1, 2]
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_cut_off():
+    hub = ChangeHub(maxsize=2)
+    slow = hub.subscribe()
+    for i in range(3):
+        hub.publish(i)
+
+    assert len(hub) == 0
+    assert [ev async for ev in slow] == []
+
+@pytest.mark.asyncio
+async def test_follow_resets_on_resync_and_on_drop():
+    calls = []
+
+    class Dropped(grpc.RpcError):
+        def code(self):
+            return grpc.StatusCode.UNAVAILABLE
+
+    async def stream():
+        yield driver_pb2.RouteChange(op=RESYNC)
+        yield driver_pb2.RouteChange(op=UPSERT, route_id="r1")
+        raise Dropped()
+
+    task = asyncio.create_task(follow(stream, on_event=lambda ch: calls.append(ch.route_id),
+                                      on_reset=lambda: calls.append("reset"), retry_seconds=60))
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    assert calls == ["reset", "r1", "reset"]
@@ -0,0 +1,34 @@
+from unittest.mock import MagicMock
+from common.channels import ChannelRegistry
+from lastmile.v1 import user_pb2_grpc
+
+
+def test_stub_reuses_pooled_channels():
+    factory = MagicMock(side_effect=lambda addr, options: MagicMock(name=addr))
+    reg = ChannelRegistry(pool_size=2, channel_factory=factory)
+
+    stubs = [reg.stub("svc:1", user_pb2_grpc.UserServiceStub) for _ in range(6)]
+
+    # One pool of two channels, stubs handed out round-robin and cached
+    assert factory.call_count == 2
+    assert stubs[0] is stubs[2] is stubs[4]
+    assert stubs[1] is stubs[3] is stubs[5]
+    assert stubs[0] is not stubs[1]
+
+
+def test_close_closes_every_channel():
+    chans = []
+    def factory(addr, options):
+        ch = MagicMock()
+        chans.append(ch)
+        return ch
+    reg = ChannelRegistry(pool_size=3, channel_factory=factory)
+    reg.channel("a:1")
+    reg.channel("b:1")
+
+    reg.close()
+
+    assert len(chans) == 6
+    assert all(ch.close.called for ch in chans)
+    reg.channel("a:1")
+    assert len(chans) == 9
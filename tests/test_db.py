@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock
+from pymongo.errors import OperationFailure
+from common.db import INDEXES, HOT_QUERIES, ensure_indexes, plan_stages, verify_indexes
+
+
+def test_ensure_indexes_only_touches_requested_collections():
+    db = MagicMock()
+    assert ensure_indexes(db, ["users"]) is True
+    db.__getitem__.assert_called_once_with("users")
+    db["users"].create_indexes.assert_called_once_with(INDEXES["users"])
+
+
+def test_ensure_indexes_reports_failure():
+    db = MagicMock()
+    db.__getitem__.return_value.create_indexes.side_effect = OperationFailure("conflict")
+    assert ensure_indexes(db) is False
+
+
+def test_plan_stages_walks_nested_plans():
+    plan = {"stage": "FETCH", "inputStage": {"stage": "SORT", "inputStages": [{"stage": "COLLSCAN"}]}}
+    assert plan_stages(plan) == ["FETCH", "SORT", "COLLSCAN"]
+
+
+def test_verify_indexes_flags_collscan():
+    ixscan = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}
+    collscan = {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}
+    db = MagicMock()
+    users = MagicMock()
+    users.find.return_value.explain.return_value = collscan
+    other = MagicMock()
+    other.find.return_value.sort.return_value.explain.return_value = ixscan
+    other.find.return_value.explain.return_value = ixscan
+    db.__getitem__.side_effect = lambda name: users if name == "users" else other
+
+    assert verify_indexes(db) == [("users", {"phone": "P"})]
+
+
+def test_every_hot_query_has_a_manifest_entry():
+    assert {coll for coll, _, _ in HOT_QUERIES} <= set(INDEXES)
+
+def test_pending_requests_expire_through_partial_ttl_index():
+    from common.db import INDEXES
+    ttl = next(m.document for m in INDEXES["rider_requests"] if m.document["name"] == "pending_ttl")
+    assert ttl["expireAfterSeconds"] == 0
+    assert ttl["partialFilterExpression"] == {"status": "PENDING"}
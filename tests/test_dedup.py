@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from pymongo.errors import ServerSelectionTimeoutError
+from common.db import AsyncCollection
+from common.dedup import DedupPending, DedupStore
+from common.memdb import MemoryClient
+from lastmile.v1 import matching_pb2
+
+def _memory_collection():
+    return AsyncCollection(MemoryClient()["lastmile"]["match_dedup"])
+
+def _store(coll, **kw):
+    return DedupStore(coll, matching_pb2.TryMatchResponse, poll_seconds=0.001, **kw)
+
+@pytest.mark.asyncio
+async def test_replay_and_concurrent_calls_run_once():
+    coll = _memory_collection()
+    store = _store(coll)
+    calls = 0
+
+    async def match():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return matching_pb2.TryMatchResponse(trip_id="t1")
+
+    first = await asyncio.gather(*(store.run("k", match) for _ in range(3)))
+    again = await store.run("k", match)
+    assert calls == 1
+    assert {r.trip_id for r in first} == {"t1"} and again.trip_id == "t1"
+
+@pytest.mark.asyncio
+async def test_other_process_gets_stored_result():
+    coll = _memory_collection()
+    await _store(coll).run("k", _returns("t1"))
+
+    other = _store(coll)  # fresh memory, as on another replica
+    assert (await other.run("k", _returns("t2"))).trip_id == "t1"
+
+@pytest.mark.asyncio
+async def test_failure_releases_claim_and_pending_claim_times_out():
+    coll = _memory_collection()
+    store = _store(coll)
+
+    async def boom():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        await store.run("k", boom)
+    assert coll.sync.find_one({"_id": "k"}) is None
+    assert (await store.run("k", _returns("t1"))).trip_id == "t1"
+
+    coll.sync.insert_one({"_id": "busy", "result": None})
+    with pytest.raises(DedupPending):
+        await _store(coll, wait_seconds=0.01).run("busy", _returns("t2"))
+
+@pytest.mark.asyncio
+async def test_runs_without_mongo():
+    coll = AsyncCollection(MagicMock())
+    coll.sync.insert_one.side_effect = ServerSelectionTimeoutError("no mongo")
+    store = _store(coll)
+    assert (await store.run("k", _returns("t1"))).trip_id == "t1"
+    assert (await store.run("k", _returns("t2"))).trip_id == "t1"
+
+def _returns(trip_id):
+    async def fn():
+        return matching_pb2.TryMatchResponse(trip_id=trip_id)
+    return fn
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_free_the_key():
+    coll = _memory_collection()
+    store = _store(coll)
+    calls = 0
+
+    async def match():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return matching_pb2.TryMatchResponse(trip_id=f"t{calls}")
+
+    first = asyncio.create_task(store.run("k", match))
+    await asyncio.sleep(0.01)
+    first.cancel()  # the caller's deadline fired mid-match
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert coll.sync.find_one({"_id": "k"}) is not None
+    assert (await store.run("k", match)).trip_id == "t1"
+    assert calls == 1
@@ -1,21 +1,21 @@
 import pytest
 from unittest.mock import MagicMock, patch
+from common.db import AsyncDatabase, AsyncCollection
 from services.driver_svc import DriverServer
 from lastmile.v1 import driver_pb2, common_pb2
 
 @pytest.fixture
 def driver_server():
-    with patch('services.driver_svc.get_db') as mock_get_db:
+    with patch('services.driver_svc.get_async_db') as mock_get_db:
         mock_db = MagicMock()
-        mock_get_db.return_value = mock_db
+        mock_get_db.return_value = AsyncDatabase(mock_db)
         server = DriverServer()
-        server.drivers = mock_db.drivers
-        server.routes = mock_db.routes
+        server.routes = AsyncCollection(mock_db.routes)
         return server
 
 @pytest.mark.asyncio
 async def test_register_route(driver_server):
-    driver_server.routes.insert_one.return_value.inserted_id = "r1"
+    driver_server.routes.sync.insert_one.return_value.inserted_id = "r1"
     
     # Create a dummy route
     route = driver_pb2.DriverRoute(
@@ -30,7 +30,7 @@ async def test_register_route(driver_server):
 
 @pytest.mark.asyncio
 async def test_get_route(driver_server):
-    driver_server.routes.find_one.return_value = {
+    driver_server.routes.sync.find_one.return_value = {
         "_id": "507f1f77bcf86cd799439011", "driver_id": "d1", "dest_area": "Area A", "seats_total": 4, "seats_free": 4,
         "stations": [{"station_id": "s1", "minutes_before_eta_match": 10}]
     }
@@ -40,3 +40,116 @@ async def test_get_route(driver_server):
     
     assert response.route.id == "507f1f77bcf86cd799439011"
     assert response.route.driver_id == "d1"
+
+@pytest.mark.asyncio
+async def test_watch_routes_resyncs_then_relays_writes(driver_server):
+    from pymongo.errors import OperationFailure
+    driver_server.routes.sync.watch.side_effect = OperationFailure("not a replica set")
+    driver_server.routes.sync.insert_one.return_value.inserted_id = "r1"
+
+    watch = driver_server.WatchRoutes(driver_pb2.WatchRoutesRequest(), None)
+    first = await watch.__anext__()
+    assert first.op == "RESYNC"
+
+    await driver_server.RegisterRoute(driver_pb2.RegisterRouteRequest(
+        route=driver_pb2.DriverRoute(driver_id="d1", dest_area="Area A", seats_total=4, seats_free=4)), None)
+    change = await watch.__anext__()
+    assert (change.op, change.route_id, change.route.driver_id) == ("UPSERT", "r1", "d1")
+
+    await watch.aclose()
+    assert len(driver_server.changes) == 0
+
+@pytest.mark.asyncio
+async def test_tail_is_retried_after_watch_fails(driver_server):
+    from pymongo.errors import AutoReconnect
+    driver_server.routes.sync.watch.side_effect = [AutoReconnect("primary stepped down"), MagicMock()]
+
+    await driver_server._ensure_tail()
+    assert not driver_server._tailing
+    await driver_server._ensure_tail()
+    await driver_server._ensure_tail()
+    assert driver_server._tailing and driver_server.routes.sync.watch.call_count == 2
+
+class _Stream:
+    """A change stream that yields `changes`, then fails with `error` or blocks until `closed` is set."""
+    def __init__(self, changes=(), error=None):
+        import threading
+        self.changes, self.error, self.closed = list(changes), error, threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed.set()
+
+    def __iter__(self):
+        yield from self.changes
+        if self.error:
+            raise self.error
+        self.closed.wait(5)
+
+@pytest.mark.asyncio
+async def test_dropped_tail_resyncs_and_reopens(driver_server, monkeypatch):
+    import asyncio
+    from pymongo.errors import AutoReconnect
+    monkeypatch.setattr("services.driver_svc.CHANGE_STREAM_RETRY_SECONDS", 0.01)
+    second = _Stream()
+    driver_server.routes.sync.watch.side_effect = [
+        _Stream(error=AutoReconnect("primary stepped down")), AutoReconnect("no primary yet"), second]
+
+    watch = driver_server.WatchRoutes(driver_pb2.WatchRoutesRequest(), None)
+    assert (await watch.__anext__()).op == "RESYNC"
+    assert (await asyncio.wait_for(watch.__anext__(), 1)).op == "RESYNC"  # the stream died
+    assert (await asyncio.wait_for(watch.__anext__(), 1)).op == "RESYNC"  # and is open again
+    assert driver_server._tailing and driver_server.routes.sync.watch.call_count == 3
+    await watch.aclose()
+    second.closed.set()
+
+def _seat_counter(driver_server, seats_free):
+    """Back find_one_and_update/find_one with a single in-memory route honouring the $gte guard."""
+    doc = {"_id": "507f1f77bcf86cd799439011", "driver_id": "d1", "dest_area": "Area A",
+           "seats_total": 4, "seats_free": seats_free, "stations": []}
+
+    def find_one_and_update(flt, update, return_document=False):
+        if doc["seats_free"] < flt["seats_free"]["$gte"]:
+            return None
+        doc["seats_free"] += update["$inc"]["seats_free"]
+        return dict(doc)
+
+    driver_server.routes.sync.find_one_and_update.side_effect = find_one_and_update
+    driver_server.routes.sync.find_one.side_effect = lambda flt: dict(doc)
+    return doc
+
+@pytest.mark.asyncio
+async def test_reserve_seats_grants_what_is_left(driver_server):
+    doc = _seat_counter(driver_server, 3)
+    req = driver_pb2.ReserveSeatsRequest(route_id=doc["_id"], n=2)
+
+    assert (await driver_server.ReserveSeats(req, None)).granted == 2
+    resp = await driver_server.ReserveSeats(req, None)
+    assert (resp.granted, resp.route.seats_free) == (1, 0)
+    assert (await driver_server.ReserveSeats(req, None)).granted == 0
+    assert doc["seats_free"] == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_reservations_never_overbook(driver_server):
+    import asyncio
+    doc = _seat_counter(driver_server, 4)
+    req = driver_pb2.ReserveSeatsRequest(route_id=doc["_id"], n=3)
+
+    resps = await asyncio.gather(*(driver_server.ReserveSeats(req, None) for _ in range(5)))
+    assert sum(r.granted for r in resps) == 4
+    assert doc["seats_free"] == 0
+
+@pytest.mark.asyncio
+async def test_release_seats_caps_at_total(driver_server):
+    driver_server.routes.sync.find_one_and_update.return_value = {
+        "_id": "507f1f77bcf86cd799439011", "driver_id": "d1", "dest_area": "Area A",
+        "seats_total": 4, "seats_free": 4, "stations": []
+    }
+    resp = await driver_server.ReleaseSeats(
+        driver_pb2.ReleaseSeatsRequest(route_id="507f1f77bcf86cd799439011", n=2), None)
+
+    assert resp.route.seats_free == 4
+    update = driver_server.routes.sync.find_one_and_update.call_args.args[1]
+    assert update[0]["$set"]["seats_free"]["$min"][1] == "$seats_total"
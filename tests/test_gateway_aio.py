@@ -0,0 +1,180 @@
+import asyncio
+import time
+import grpc
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import gateway
+import gateway_aio
+from lastmile.v1 import user_pb2, station_pb2, rider_pb2, location_pb2, common_pb2
+
+
+class FakeRpcError(grpc.RpcError):
+    def details(self):
+        return "backend down"
+
+
+def stubs(**methods):
+    """Same canned responses for the Flask (sync) and Quart (async) stub."""
+    sync, aio = MagicMock(), MagicMock()
+    for name, value in methods.items():
+        if isinstance(value, Exception):
+            setattr(sync, name, MagicMock(side_effect=value))
+            setattr(aio, name, AsyncMock(side_effect=value))
+        else:
+            setattr(sync, name, MagicMock(return_value=value))
+            setattr(aio, name, AsyncMock(return_value=value))
+    return sync, aio
+
+
+async def call_both(getter, stub_pair, method, path, json=None):
+    sync, aio = stub_pair
+    with patch(f'gateway.{getter}', return_value=sync):
+        r1 = getattr(gateway.app.test_client(), method)(path, json=json)
+    with patch(f'gateway_aio.{getter}', return_value=aio):
+        r2 = await getattr(gateway_aio.app.test_client(), method)(path, json=json)
+    return (r1.status_code, r1.get_json()), (r2.status_code, await r2.get_json())
+
+
+@pytest.mark.asyncio
+async def test_login_matches_flask_gateway():
+    pair = stubs(
+        Authenticate=user_pb2.AuthenticateResponse(user_id="u1", jwt="demo-jwt"),
+        GetUser=user_pb2.GetUserResponse(user=common_pb2.User(id="u1", role=common_pb2.DRIVER, name="D")),
+    )
+    flask_res, aio_res = await call_both('get_user_stub', pair, 'post', '/api/login',
+                                         json={"phone": "1", "password": "p"})
+    assert aio_res == flask_res
+    assert aio_res[0] == 200
+    assert aio_res[1]["user"]["role"] == "DRIVER"
+
+
+@pytest.mark.asyncio
+async def test_login_invalid_credentials():
+    pair = stubs(Authenticate=user_pb2.AuthenticateResponse())
+    flask_res, aio_res = await call_both('get_user_stub', pair, 'post', '/api/login',
+                                         json={"phone": "1", "password": "bad"})
+    assert aio_res == flask_res == (401, {"error": "Invalid credentials"})
+
+
+@pytest.mark.asyncio
+async def test_list_stations_matches_flask_gateway():
+    pair = stubs(ListStations=station_pb2.ListStationsResponse(stations=[
+        common_pb2.Station(id="s1", name="S1", location=common_pb2.LatLng(lat=1.0, lon=2.0), nearby_areas=["A"]),
+    ]))
+    flask_res, aio_res = await call_both('get_station_stub', pair, 'get', '/api/stations')
+    assert aio_res == flask_res
+    assert aio_res[1][0]["nearbyAreas"] == ["A"]
+
+
+@pytest.mark.asyncio
+async def test_backend_error_maps_to_500():
+    pair = stubs(ListPendingAtStation=FakeRpcError())
+    flask_res, aio_res = await call_both('get_rider_stub', pair, 'get', '/api/rider/requests?station_id=s1')
+    assert aio_res == flask_res == (500, {"error": "backend down"})
+
+
+@pytest.mark.asyncio
+async def test_missing_param_is_400():
+    pair = stubs(ListPendingAtStation=rider_pb2.ListPendingAtStationResponse())
+    flask_res, aio_res = await call_both('get_rider_stub', pair, 'get', '/api/rider/requests')
+    assert aio_res == flask_res == (400, {"error": "station_id required"})
+
+
+@pytest.mark.asyncio
+async def test_bulk_driver_locations():
+    pair = stubs(BatchDriverLocations=location_pb2.BatchDriverLocationsResponse(accepted=2, triggered=1))
+    body = {"locations": [
+        {"driver_id": "d1", "route_id": "r1", "lat": 1.0, "lon": 2.0},
+        {"driver_id": "d2", "route_id": "r2", "lat": 1.0, "lon": 2.0, "ts_unix": 5},
+    ]}
+    flask_res, aio_res = await call_both('get_location_stub', pair, 'post', '/api/driver/locations', json=body)
+    assert aio_res == flask_res == (200, {"accepted": 2, "triggered": 1})
+    sent = pair[1].BatchDriverLocations.await_args.args[0]
+    assert [l.driver_id for l in sent.locations] == ["d1", "d2"]
+    assert sent.locations[1].ts_unix == 5
+
+
+class FakeStream:
+    """A finite WatchStation call for both stubs: iterable, async-iterable, cancellable."""
+    def __init__(self, changes, idle=0.0):
+        self.changes = changes
+        self.idle = idle  # seconds before each change
+        self.cancelled = False
+
+    def __iter__(self):
+        for c in self.changes:
+            time.sleep(self.idle)
+            yield c
+
+    async def __aiter__(self):
+        for c in self.changes:
+            await asyncio.sleep(self.idle)
+            yield c
+
+    def cancel(self):
+        self.cancelled = True
+
+
+@pytest.mark.asyncio
+async def test_pending_board_stream_is_sse():
+    changes = [rider_pb2.PendingChange(op="RESYNC"),
+               rider_pb2.PendingChange(op="UPSERT", request_id="q1",
+                                       request=common_pb2.RiderRequest(id="q1", station_id="s1"))]
+    sync, aio = MagicMock(), MagicMock()
+    sync.WatchStation.return_value = FakeStream(changes)
+    aio.WatchStation.return_value = FakeStream(changes)
+    path = '/api/rider/requests/stream?station_id=s1&dest_area=A'
+    with patch('gateway.get_rider_stub', return_value=sync):
+        r1 = gateway.app.test_client().get(path)
+        body1 = r1.get_data(as_text=True)
+    with patch('gateway_aio.get_rider_stub', return_value=aio):
+        r2 = await gateway_aio.app.test_client().get(path)
+        body2 = await r2.get_data(as_text=True)
+
+    assert body1 == body2
+    assert r1.mimetype == r2.mimetype == "text/event-stream"
+    frames = body2.strip().split("\n\n")
+    assert frames[0] == 'event: RESYNC\ndata: {"op": "RESYNC"}'
+    assert frames[1].startswith("event: UPSERT\ndata: ")
+    assert aio.WatchStation.call_args.args[0].dest_area == "A"
+    assert sync.WatchStation.return_value.cancelled and aio.WatchStation.return_value.cancelled
+
+
+@pytest.mark.asyncio
+async def test_idle_stream_sends_keepalives(monkeypatch):
+    monkeypatch.setattr(gateway, "SSE_KEEPALIVE_SECONDS", 0.02)
+    monkeypatch.setattr(gateway_aio, "SSE_KEEPALIVE_SECONDS", 0.02)
+    changes = [rider_pb2.PendingChange(op="RESYNC")]
+    sync, aio = MagicMock(), MagicMock()
+    sync.WatchStation.return_value = FakeStream(changes, idle=0.1)
+    aio.WatchStation.return_value = FakeStream(changes, idle=0.1)
+    path = '/api/rider/requests/stream?station_id=s1'
+    with patch('gateway.get_rider_stub', return_value=sync):
+        body1 = gateway.app.test_client().get(path).get_data(as_text=True)
+    with patch('gateway_aio.get_rider_stub', return_value=aio):
+        body2 = await (await gateway_aio.app.test_client().get(path)).get_data(as_text=True)
+
+    for body in (body1, body2):
+        frames = body.strip().split("\n\n")
+        assert len(frames) >= 3 and set(frames[:-1]) == {": keepalive"}
+        assert frames[-1] == 'event: RESYNC\ndata: {"op": "RESYNC"}'
+
+
+@pytest.mark.asyncio
+async def test_notification_stream_resumes_from_last_event_id():
+    from lastmile.v1 import notification_pb2
+    notifs = [notification_pb2.Notification(id="n1", user_id="u1", title="T", body="B", timestamp=42)]
+    sync, aio = MagicMock(), MagicMock()
+    sync.Subscribe.return_value = FakeStream(notifs)
+    aio.Subscribe.return_value = FakeStream(notifs)
+    path, headers = '/api/notifications/stream?user_id=u1', {"Last-Event-ID": "40-n0"}
+    with patch('gateway.get_notification_stub', return_value=sync):
+        body1 = gateway.app.test_client().get(path, headers=headers).get_data(as_text=True)
+    with patch('gateway_aio.get_notification_stub', return_value=aio):
+        body2 = await (await gateway_aio.app.test_client().get(path, headers=headers)).get_data(as_text=True)
+
+    assert body1 == body2
+    assert body2.startswith("id: 42-n1\nevent: notification\ndata: ")
+    assert '"message": "B"' in body2 and '"read": false' in body2
+    sent = aio.Subscribe.call_args.args[0]
+    assert (sent.since_ms, sent.after_id) == (40, "n0")
@@ -0,0 +1,85 @@
+import random
+import numpy as np
+from common.geo import GeoGrid, haversine_m, haversine_many, haversine_matrix, haversine_pairs, polyline_segments_m
+
+
+def test_haversine_known_distance():
+    # MG Road -> Trinity metro, ~1.1 km
+    d = haversine_m(12.9756, 77.6069, 12.9730, 77.6170)
+    assert 1000 < d < 1200
+
+
+def test_geogrid_near_matches_brute_force():
+    rnd = random.Random(7)
+    pts = {f"s{i}": (12.9 + rnd.random() * 0.2, 77.5 + rnd.random() * 0.2) for i in range(2000)}
+    grid = GeoGrid(cell_m=400)
+    for k, (lat, lon) in pts.items():
+        grid.insert(k, lat, lon)
+
+    for _ in range(50):
+        lat, lon = 12.9 + rnd.random() * 0.2, 77.5 + rnd.random() * 0.2
+        expected = {k for k, (a, b) in pts.items() if haversine_m(lat, lon, a, b) <= 400}
+        got = grid.near(lat, lon, 400)
+        assert {k for k, _ in got} == expected
+        assert [d for _, d in got] == sorted(d for _, d in got)
+
+
+def test_geogrid_insert_moves_and_remove():
+    grid = GeoGrid(cell_m=400)
+    grid.insert("a", 10.0, 20.0)
+    grid.insert("a", 11.0, 21.0)
+    assert len(grid) == 1
+    assert grid.near(10.0, 20.0, 400) == []
+    assert [k for k, _ in grid.near(11.0, 21.0, 400)] == ["a"]
+
+    grid.remove("a")
+    assert "a" not in grid
+    assert grid.near(11.0, 21.0, 400) == []
+
+
+def _pts(n, seed):
+    rnd = random.Random(seed)
+    return [12.9 + rnd.random() * 0.2 for _ in range(n)], [77.5 + rnd.random() * 0.2 for _ in range(n)]
+
+
+def test_haversine_many_matches_scalar():
+    lats, lons = _pts(500, 1)
+    got = haversine_many(12.97, 77.59, lats, lons)
+    want = [haversine_m(12.97, 77.59, a, b) for a, b in zip(lats, lons)]
+    assert got.dtype == np.float64
+    assert np.allclose(got, want, rtol=0, atol=1e-6)
+
+
+def test_haversine_matrix_matches_scalar():
+    lats1, lons1 = _pts(40, 2)
+    lats2, lons2 = _pts(30, 3)
+    got = haversine_matrix(lats1, lons1, lats2, lons2)
+    assert got.shape == (40, 30)
+    for i in range(40):
+        for j in range(30):
+            assert abs(got[i, j] - haversine_m(lats1[i], lons1[i], lats2[j], lons2[j])) < 1e-6
+
+
+def test_float32_is_within_a_few_metres():
+    lats1, lons1 = _pts(40, 4)
+    lats2, lons2 = _pts(30, 5)
+    f64 = haversine_matrix(lats1, lons1, lats2, lons2)
+    f32 = haversine_matrix(lats1, lons1, lats2, lons2, dtype=np.float32)
+    assert f32.dtype == np.float32
+    assert np.max(np.abs(f32 - f64)) < 5.0
+
+
+def test_polyline_segments():
+    lats, lons = _pts(100, 6)
+    legs = polyline_segments_m(lats, lons)
+    assert legs.shape == (99,)
+    total = sum(haversine_m(lats[i], lons[i], lats[i + 1], lons[i + 1]) for i in range(99))
+    assert abs(legs.sum() - total) < 1e-5
+
+
+def test_haversine_pairs_matches_scalar():
+    lats1, lons1 = _pts(200, 7)
+    lats2, lons2 = _pts(200, 8)
+    got = haversine_pairs(lats1, lons1, lats2, lons2)
+    want = [haversine_m(a, b, c, d) for a, b, c, d in zip(lats1, lons1, lats2, lons2)]
+    assert np.allclose(got, want, rtol=0, atol=1e-6)
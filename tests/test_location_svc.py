@@ -50,3 +50,152 @@ async def test_stream_driver_location(location_server):
     response = await location_server.StreamDriverLocation(request_iterator(), None)
     
     assert response.ok is True
+
+@pytest.mark.asyncio
+async def test_only_nearby_route_stations_trigger(location_server):
+    location_server.driver.GetRoute = AsyncMock(return_value=driver_pb2.GetRouteResponse(
+        route=driver_pb2.DriverRoute(
+            id="rt1",
+            stations=[
+                driver_pb2.RouteStation(station_id="near", minutes_before_eta_match=10),
+                driver_pb2.RouteStation(station_id="far", minutes_before_eta_match=10),
+            ]
+        )
+    ))
+    coords = {"near": (10.0, 20.0), "far": (10.5, 20.5)}
+    location_server.station.GetStation = AsyncMock(side_effect=lambda req: station_pb2.GetStationResponse(
+        station=common_pb2.Station(id=req.id, location=common_pb2.LatLng(lat=coords[req.id][0], lon=coords[req.id][1]))
+    ))
+    location_server.match.TryMatch = AsyncMock(return_value=matching_pb2.TryMatchResponse())
+
+    async def request_iterator():
+        for _ in range(3):
+            yield location_pb2.DriverLocation(
+                driver_id="d1", point=common_pb2.LatLng(lat=10.001, lon=20.0), ts_unix=1000, route_id="rt1"
+            )
+
+    await location_server.StreamDriverLocation(request_iterator(), None)
+
+    # route and stations resolved once, a single (debounced) trigger at "near"
+    assert location_server.driver.GetRoute.await_count == 1
+    assert location_server.station.GetStation.await_count == 2
+    location_server.match.TryMatch.assert_awaited_once()
+    assert location_server.match.TryMatch.await_args.args[0].station_id == "near"
+
+@pytest.mark.asyncio
+async def test_batch_driver_locations_groups_by_route(location_server):
+    routes = {
+        "rt1": driver_pb2.DriverRoute(id="rt1", stations=[driver_pb2.RouteStation(station_id="s1", minutes_before_eta_match=10)]),
+        "rt2": driver_pb2.DriverRoute(id="rt2", stations=[driver_pb2.RouteStation(station_id="s2", minutes_before_eta_match=10)]),
+    }
+    location_server.driver.GetRoute = AsyncMock(side_effect=lambda req: driver_pb2.GetRouteResponse(route=routes[req.route_id]))
+    coords = {"s1": (10.0, 20.0), "s2": (11.0, 21.0)}
+    location_server.station.GetStation = AsyncMock(side_effect=lambda req: station_pb2.GetStationResponse(
+        station=common_pb2.Station(id=req.id, location=common_pb2.LatLng(lat=coords[req.id][0], lon=coords[req.id][1]))
+    ))
+    location_server.match.TryMatch = AsyncMock(return_value=matching_pb2.TryMatchResponse())
+
+    def ping(driver, route, lat, lon):
+        return location_pb2.DriverLocation(driver_id=driver, route_id=route, ts_unix=1000,
+                                           point=common_pb2.LatLng(lat=lat, lon=lon))
+    request = location_pb2.BatchDriverLocationsRequest(locations=[
+        ping("d1", "rt1", 10.0, 20.0),
+        ping("d2", "rt1", 10.0005, 20.0),
+        ping("d3", "rt1", 10.5, 20.5),     # nowhere near s1
+        ping("d4", "rt2", 11.0, 21.0),
+        ping("d4", "rt2", 11.0, 21.0),     # debounced repeat
+        ping("d5", "rt2", 10.0, 20.0),     # at s1, but s1 is not on rt2
+    ])
+
+    response = await location_server.BatchDriverLocations(request, None)
+
+    assert response.accepted == 6
+    assert response.triggered == 3
+    assert location_server.driver.GetRoute.await_count == 2
+    triggered = sorted((c.args[0].driver_id, c.args[0].station_id) for c in location_server.match.TryMatch.await_args_list)
+    assert triggered == [("d1", "s1"), ("d2", "s1"), ("d4", "s2")]
+
+@pytest.mark.asyncio
+async def test_invalidate_route_forces_refetch(location_server):
+    location_server.driver.GetRoute = AsyncMock(return_value=driver_pb2.GetRouteResponse(
+        route=driver_pb2.DriverRoute(id="rt1", stations=[driver_pb2.RouteStation(station_id="s1", minutes_before_eta_match=10)])
+    ))
+    location_server.station.GetStation = AsyncMock(return_value=station_pb2.GetStationResponse(
+        station=common_pb2.Station(id="s1", location=common_pb2.LatLng(lat=10.0, lon=20.0))
+    ))
+
+    await location_server._get_route("rt1")
+    await location_server._get_route("rt1")
+    assert location_server.driver.GetRoute.await_count == 1
+
+    location_server.invalidate_route("rt1")
+    await location_server._get_route("rt1")
+    assert location_server.driver.GetRoute.await_count == 2
+
+    location_server.invalidate_station("s1")
+    assert location_server.cache_stats()["routes"]["size"] == 0
+    await location_server._get_route("rt1")
+    assert location_server.station.GetStation.await_count == 2
+
+@pytest.mark.asyncio
+async def test_station_change_evicts_routes_through_it(location_server):
+    from lastmile.v1 import station_pb2 as sp
+    location_server.driver.GetRoute = AsyncMock(return_value=driver_pb2.GetRouteResponse(
+        route=driver_pb2.DriverRoute(id="rt1", stations=[driver_pb2.RouteStation(station_id="s1")])
+    ))
+    location_server.station.GetStation = AsyncMock(return_value=station_pb2.GetStationResponse(
+        station=common_pb2.Station(id="s1", location=common_pb2.LatLng(lat=10.0, lon=20.0))
+    ))
+    await location_server._get_route("rt1")
+
+    moved = common_pb2.Station(id="s1", location=common_pb2.LatLng(lat=11.0, lon=21.0))
+    location_server._on_station_change(sp.StationChange(op="UPSERT", station_id="s1", station=moved))
+    assert "rt1" not in location_server._route_cache
+    assert (await location_server._get_station_coord("s1")).lat == 11.0
+    assert location_server.station.GetStation.await_count == 1
+
+    location_server.reset_stations()
+    assert len(location_server._station_index) == 0
+    assert "s1" not in location_server._station_coord_cache
+
+@pytest.mark.asyncio
+async def test_station_grid_follows_coord_cache_evictions(location_server):
+    from common.cache import TTLCache
+    location_server._station_coord_cache = TTLCache(
+        2, on_evict=lambda station_id, _: location_server._drop_station(station_id))
+    location_server.station.GetStation = AsyncMock(side_effect=lambda req: station_pb2.GetStationResponse(
+        station=common_pb2.Station(id=req.id, location=common_pb2.LatLng(lat=10.0, lon=20.0))))
+    location_server.driver.GetRoute = AsyncMock(return_value=driver_pb2.GetRouteResponse(
+        route=driver_pb2.DriverRoute(id="rt1", stations=[driver_pb2.RouteStation(station_id="s0")])))
+    await location_server._get_route("rt1")
+
+    for i in range(1, 5):
+        await location_server._get_station_coord(f"s{i}")
+    assert len(location_server._station_index) == 2 and "s0" not in location_server._station_index
+    assert "rt1" not in location_server._route_cache  # it relied on s0 being in the grid
+
+def test_trigger_goes_to_station_owner(location_server):
+    from common.sharding import ShardMap
+    location_server.match_shards = ShardMap("m1:50057,m2:50057")
+    location_server.match_shards.ring.set_nodes(["m1:50057", "m2:50057"])
+    location_server._match_peers.stub = MagicMock(side_effect=lambda addr, cls: addr)
+
+    owners = {location_server._match_stub(f"s{i}") for i in range(50)}
+    assert owners == {"m1:50057", "m2:50057"}
+    assert location_server._match_stub("s7") == location_server.match_shards.owner("s7")
+
+@pytest.mark.asyncio
+async def test_trigger_retries_with_same_key(location_server):
+    import grpc
+
+    class Unavailable(grpc.RpcError):
+        def code(self):
+            return grpc.StatusCode.UNAVAILABLE
+
+    location_server.match.TryMatch = AsyncMock(side_effect=[Unavailable(), matching_pb2.TryMatchResponse(trip_id="t1")])
+    loc = location_pb2.DriverLocation(driver_id="d1", route_id="rt1", ts_unix=1000)
+
+    await location_server._trigger(loc, "s1")
+
+    keys = [c.args[0].idempotency_key for c in location_server.match.TryMatch.await_args_list]
+    assert keys == ["d1:rt1:s1:1000"] * 2
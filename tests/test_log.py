@@ -0,0 +1,62 @@
+import io
+import json
+import logging
+import pytest
+from common import log as logmod
+from common.log import Logger
+from lastmile.v1 import common_pb2
+
+@pytest.fixture
+def out():
+    buf = io.StringIO()
+    logmod.configure(stream=buf, fmt="json", level="INFO")
+    yield buf
+    logmod.configure(stream=io.StringIO(), fmt="json", level="INFO")  # detach from buf
+
+def _lines(buf):
+    logmod.shutdown()  # flush the writer thread
+    return [json.loads(l) for l in buf.getvalue().splitlines()]
+
+def test_json_records_with_fields_and_protobuf(out):
+    log = Logger("rider")
+    log.info("pending index loaded", requests=3)
+    log.debug("AddRequest", request=common_pb2.RiderRequest(id="q1"))  # below INFO: dropped
+    log.warning("AddRequest", request=common_pb2.RiderRequest(id="q1", eta_unix=5))
+
+    recs = _lines(out)
+    assert [(r["level"], r["logger"], r["msg"]) for r in recs] == [
+        ("INFO", "rider", "pending index loaded"), ("WARNING", "rider", "AddRequest")]
+    assert recs[0]["requests"] == 3
+    assert recs[1]["request"] == 'id: "q1" eta_unix: 5'
+
+def test_disabled_level_never_formats(out):
+    class Loud:
+        def __str__(self):
+            raise AssertionError("formatted")
+    Logger("trip").debug("UpdateTripStatus", doc=Loud())
+    assert _lines(out) == []
+
+def test_per_service_level_and_sampling(out, monkeypatch):
+    monkeypatch.setenv("LOG_LEVEL_LOCATION", "WARNING")
+    quiet = Logger("location", sample_rate=1.0)
+    quiet.sampled("ping")
+    quiet.warning("slow")
+    never, always = Logger("a", sample_rate=0.0), Logger("b", sample_rate=1.0)
+    for _ in range(50):
+        never.sampled("ping")
+    always.sampled("ping", n=1)
+
+    recs = _lines(out)
+    assert [(r["logger"], r["msg"]) for r in recs] == [("location", "slow"), ("b", "ping")]
+    assert recs[1]["sample_rate"] == 1.0
+    logging.getLogger("location").setLevel(logging.NOTSET)
+
+def test_full_queue_drops_instead_of_blocking():
+    logmod.configure(stream=io.StringIO(), queue_size=1)
+    logmod._listener.stop()  # writer stalled
+    logmod._listener = None
+    before = logmod.dropped()
+    for i in range(5):
+        Logger("x").info("m", i=i)
+    assert logmod.dropped() - before == 4
+    logmod.configure(stream=io.StringIO())
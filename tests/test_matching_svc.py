@@ -1,24 +1,262 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+from common.db import AsyncDatabase
 from services.matching_svc import MatchingServer
-from lastmile.v1 import matching_pb2
+from lastmile.v1 import matching_pb2, driver_pb2, rider_pb2, trip_pb2, common_pb2
 
 @pytest.fixture
 def matching_server():
-    # Matching service might depend on other services, but for unit test we mock logic
-    server = MatchingServer()
+    with patch('grpc.aio.insecure_channel'), \
+         patch('services.matching_svc.get_async_db') as mock_get_db:
+        mock_get_db.return_value = AsyncDatabase(MagicMock())
+        server = MatchingServer()
+    server.driver = MagicMock()
+    server.rider = MagicMock()
+    server.trip = MagicMock()
+    server.notify = MagicMock()
+    server.driver.GetRoute = AsyncMock(return_value=driver_pb2.GetRouteResponse(route=driver_pb2.DriverRoute(
+        id="rt1", driver_id="d1", dest_area="Area A", seats_total=4, seats_free=3)))
+    server.rider.ListPendingAtStation = AsyncMock(return_value=rider_pb2.ListPendingAtStationResponse(requests=[
+        common_pb2.RiderRequest(id=f"q{i}", rider_id=f"r{i}", station_id="s1", dest_area="Area A", eta_unix=1000 + i)
+        for i in range(3)
+    ]))
+    server.trip.CreateTrip = AsyncMock(return_value=trip_pb2.CreateTripResponse(trip=common_pb2.Trip(id="t1")))
+    server.rider.MarkAssigned = AsyncMock(
+        side_effect=lambda req: rider_pb2.MarkAssignedResponse(
+            updated=len(req.request_ids), assigned_ids=list(req.request_ids)))
+    server.notify.PushBatch = AsyncMock()
     return server
 
+def _try(station="s1"):
+    return matching_pb2.TryMatchRequest(driver_id="d1", route_id="rt1", station_id=station, arrival_eta_unix=1000)
+
 @pytest.mark.asyncio
 async def test_match_rider(matching_server):
-    # This service likely has complex logic calling other services.
-    # For a basic unit test, we might just check if the method exists and returns something expected
-    # or mock the internal calls.
-    # Assuming basic implementation for now.
-    
-    # If MatchingServer calls other gRPC services, we need to mock those stubs.
-    # Let's assume we just want to ensure it runs without error for now.
-    pass 
-    # Real implementation would require mocking grpc channels.
-    # Skipping deep logic test for matching service to avoid complexity in this quick pass.
-    assert True
+    matching_server.driver.ReserveSeats = AsyncMock(return_value=driver_pb2.ReserveSeatsResponse(
+        granted=3, route=driver_pb2.DriverRoute(id="rt1", seats_free=0)))
+
+    resp = await matching_server.TryMatch(_try(), None)
+
+    assert resp.trip_id == matching_server.trip.CreateTrip.await_args.args[0].trip_id
+    assert matching_server.rider.MarkAssigned.await_args.args[0].trip_id == resp.trip_id
+    assert [a.rider_request_id for a in resp.assignments] == ["q0", "q1", "q2"]
+    assert resp.seats_remaining == 0
+    assert matching_server.driver.ReserveSeats.await_args.args[0].n == 3
+
+    # the notification waits in the outbox, off the TryMatch path
+    matching_server.notify.PushBatch.assert_not_awaited()
+    assert await matching_server.outbox.flush()
+    pushes = matching_server.notify.PushBatch.await_args.args[0].pushes
+    assert [t.user_id for t in pushes[0].targets] == ["d1", "r0", "r1", "r2"]
+
+@pytest.mark.asyncio
+async def test_match_only_takes_granted_seats(matching_server):
+    # another matcher took two of the three seats between GetRoute and ReserveSeats
+    matching_server.driver.ReserveSeats = AsyncMock(return_value=driver_pb2.ReserveSeatsResponse(
+        granted=1, route=driver_pb2.DriverRoute(id="rt1", seats_free=0)))
+
+    resp = await matching_server.TryMatch(_try(), None)
+
+    assert [a.rider_request_id for a in resp.assignments] == ["q0"]
+    assert list(matching_server.trip.CreateTrip.await_args.args[0].rider_ids) == ["r0"]
+
+@pytest.mark.asyncio
+async def test_no_trip_when_nothing_granted(matching_server):
+    matching_server.driver.ReserveSeats = AsyncMock(return_value=driver_pb2.ReserveSeatsResponse(
+        granted=0, route=driver_pb2.DriverRoute(id="rt1", seats_free=0)))
+
+    resp = await matching_server.TryMatch(_try(), None)
+
+    assert resp.trip_id == "" and resp.seats_remaining == 0
+    matching_server.trip.CreateTrip.assert_not_awaited()
+
+def test_plan_batch_beats_first_come():
+    from services.matching_svc import plan_batch
+    x = common_pb2.RiderRequest(id="x", eta_unix=1060)
+    y = common_pb2.RiderRequest(id="y", eta_unix=900)
+    # greedy (A first) gives A x and B y: 60 + 200; the optimum is A y, B x: 100 + 40
+    plan = plan_batch([(1000, 1), (1100, 1)], [x, y])
+    assert [[r.id for r in p] for p in plan] == [["y"], ["x"]]
+
+    plan = plan_batch([(1000, 2), (1100, 0)], [x, y])
+    assert [[r.id for r in p] for p in plan] == [["x", "y"], []]
+
+@pytest.mark.asyncio
+async def test_batch_mode_assigns_station_jointly(matching_server):
+    import asyncio
+    routes = {
+        "rtA": driver_pb2.DriverRoute(id="rtA", driver_id="dA", dest_area="Area A", seats_free=1),
+        "rtB": driver_pb2.DriverRoute(id="rtB", driver_id="dB", dest_area="Area A", seats_free=1),
+    }
+    matching_server.driver.GetRoute = AsyncMock(
+        side_effect=lambda req: driver_pb2.GetRouteResponse(route=routes[req.route_id]))
+    matching_server.rider.ListPendingAtStation = AsyncMock(return_value=rider_pb2.ListPendingAtStationResponse(requests=[
+        common_pb2.RiderRequest(id="x", rider_id="rx", eta_unix=1060),
+        common_pb2.RiderRequest(id="y", rider_id="ry", eta_unix=900),
+    ]))
+    matching_server.driver.ReserveSeats = AsyncMock(side_effect=lambda req: driver_pb2.ReserveSeatsResponse(
+        granted=req.n, route=driver_pb2.DriverRoute(id=req.route_id, seats_free=0)))
+    matching_server.batch_window = 0.01
+
+    a, b = await asyncio.gather(
+        matching_server.TryMatch(matching_pb2.TryMatchRequest(driver_id="dA", route_id="rtA", station_id="s1", arrival_eta_unix=1000), None),
+        matching_server.TryMatch(matching_pb2.TryMatchRequest(driver_id="dB", route_id="rtB", station_id="s1", arrival_eta_unix=1100), None),
+    )
+
+    assert [x.rider_request_id for x in a.assignments] == ["y"]
+    assert [x.rider_request_id for x in b.assignments] == ["x"]
+    # one pending-rider lookup for the whole station window
+    assert matching_server.rider.ListPendingAtStation.await_count == 1
+
+def _compensation_mocks(server):
+    server.driver.ReserveSeats = AsyncMock(return_value=driver_pb2.ReserveSeatsResponse(
+        granted=3, route=driver_pb2.DriverRoute(id="rt1", seats_free=0)))
+    server.rider.UnassignRequests = AsyncMock(return_value=rider_pb2.UnassignRequestsResponse())
+    server.trip.UpdateTripStatus = AsyncMock(return_value=trip_pb2.UpdateTripStatusResponse())
+    server.driver.ReleaseSeats = AsyncMock(return_value=driver_pb2.ReleaseSeatsResponse(
+        route=driver_pb2.DriverRoute(id="rt1", seats_free=3)))
+
+@pytest.mark.asyncio
+async def test_trip_and_assignment_run_concurrently(matching_server):
+    import asyncio
+    _compensation_mocks(matching_server)
+    started = []
+
+    async def create(req):
+        started.append("create")
+        await asyncio.sleep(0)
+        assert "assign" in started  # MarkAssigned was issued without waiting for CreateTrip
+        return trip_pb2.CreateTripResponse(trip=common_pb2.Trip(id=req.trip_id))
+
+    async def assign(req):
+        started.append("assign")
+        return rider_pb2.MarkAssignedResponse(updated=len(req.request_ids), assigned_ids=list(req.request_ids))
+
+    matching_server.trip.CreateTrip = AsyncMock(side_effect=create)
+    matching_server.rider.MarkAssigned = AsyncMock(side_effect=assign)
+
+    resp = await matching_server.TryMatch(_try(), None)
+    await asyncio.sleep(0)
+
+    assert len(resp.assignments) == 3
+    matching_server.driver.ReleaseSeats.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_failed_trip_is_compensated(matching_server):
+    _compensation_mocks(matching_server)
+    matching_server.trip.CreateTrip = AsyncMock(side_effect=RuntimeError("trip down"))
+
+    with pytest.raises(RuntimeError):
+        await matching_server.TryMatch(_try(), None)
+
+    trip_id = matching_server.rider.MarkAssigned.await_args.args[0].trip_id
+    assert matching_server.rider.UnassignRequests.await_args.args[0].trip_id == trip_id
+    assert matching_server.trip.UpdateTripStatus.await_args.args[0].status == "CANCELLED"
+    assert matching_server.driver.ReleaseSeats.await_args.args[0].n == 3
+    assert len(matching_server.outbox) == 0
+
+@pytest.mark.asyncio
+async def test_all_riders_taken_elsewhere_rolls_back(matching_server):
+    _compensation_mocks(matching_server)
+    matching_server.rider.MarkAssigned = AsyncMock(return_value=rider_pb2.MarkAssignedResponse(
+        taken_ids=["q0", "q1", "q2"]))
+
+    resp = await matching_server.TryMatch(_try(), None)
+
+    assert resp.trip_id == "" and resp.seats_remaining == 3
+    assert matching_server.trip.UpdateTripStatus.await_args.args[0].status == "CANCELLED"
+
+@pytest.mark.asyncio
+async def test_partly_taken_match_keeps_the_rest(matching_server):
+    _compensation_mocks(matching_server)
+    matching_server.rider.MarkAssigned = AsyncMock(return_value=rider_pb2.MarkAssignedResponse(
+        updated=2, assigned_ids=["q0", "q2"], taken_ids=["q1"]))
+    matching_server.trip.RemoveRiders = AsyncMock(return_value=trip_pb2.RemoveRidersResponse())
+    matching_server.driver.ReleaseSeats = AsyncMock(return_value=driver_pb2.ReleaseSeatsResponse(
+        route=driver_pb2.DriverRoute(id="rt1", seats_free=1)))
+
+    resp = await matching_server.TryMatch(_try(), None)
+
+    assert [a.rider_request_id for a in resp.assignments] == ["q0", "q2"]
+    assert resp.trip_id and resp.seats_remaining == 1
+    assert list(matching_server.trip.RemoveRiders.await_args.args[0].rider_ids) == ["r1"]
+    assert matching_server.driver.ReleaseSeats.await_args.args[0].n == 1
+    matching_server.trip.UpdateTripStatus.assert_not_awaited()
+
+def _sharded(server, owner_of_s1: str):
+    from common.sharding import ShardMap
+    server.self_addr = "me:50057"
+    server.shards = ShardMap("me:50057,peer:50057", on_change=server._on_rebalance)
+    server.shards.ring.set_nodes(["me:50057", "peer:50057"])
+    station = next(f"s{i}" for i in range(100) if server.shards.owner(f"s{i}") == owner_of_s1)
+    return station
+
+@pytest.mark.asyncio
+async def test_non_owner_forwards_to_owner(matching_server):
+    station = _sharded(matching_server, "peer:50057")
+    peer = MagicMock()
+    peer.TryMatch = AsyncMock(return_value=matching_pb2.TryMatchResponse(trip_id="t-peer"))
+    matching_server._peers.stub = MagicMock(return_value=peer)
+
+    resp = await matching_server.TryMatch(_try(station), None)
+
+    assert resp.trip_id == "t-peer"
+    assert matching_server._peers.stub.call_args.args[0] == "peer:50057"
+    matching_server.driver.GetRoute.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_forwarded_request_is_matched_locally(matching_server):
+    from common.sharding import FORWARDED_HEADER
+    station = _sharded(matching_server, "peer:50057")
+    matching_server.driver.ReserveSeats = AsyncMock(return_value=driver_pb2.ReserveSeatsResponse(
+        granted=3, route=driver_pb2.DriverRoute(id="rt1", seats_free=0)))
+    context = MagicMock()
+    context.invocation_metadata.return_value = ((FORWARDED_HEADER, "other:50057"),)
+
+    resp = await matching_server.TryMatch(_try(station), context)
+
+    assert len(resp.assignments) == 3
+
+@pytest.mark.asyncio
+async def test_rebalance_hands_off_open_batches(matching_server):
+    import asyncio
+    station = _sharded(matching_server, "me:50057")
+    matching_server.match_batch = AsyncMock()
+    done = asyncio.get_running_loop().create_future()
+    matching_server._batches[station] = [(_try(station), done)]
+
+    matching_server.shards.ring.set_nodes(["peer:50057"])
+    matching_server._on_rebalance(("me:50057", "peer:50057"), ("peer:50057",))
+    await asyncio.sleep(0)
+
+    assert station not in matching_server._batches
+    assert matching_server.match_batch.await_args.args[0] == station
+
+@pytest.mark.asyncio
+async def test_failed_handoff_fails_its_callers(matching_server):
+    import asyncio
+    station = _sharded(matching_server, "me:50057")
+    matching_server.driver.GetRoute = AsyncMock(side_effect=RuntimeError("driver down"))
+    done = asyncio.get_running_loop().create_future()
+    matching_server._batches[station] = [(_try(station), done)]
+
+    matching_server.shards.ring.set_nodes(["peer:50057"])
+    matching_server._on_rebalance(("me:50057", "peer:50057"), ("peer:50057",))
+
+    with pytest.raises(RuntimeError, match="driver down"):
+        await asyncio.wait_for(done, 1)
+
+@pytest.mark.asyncio
+async def test_replayed_key_returns_original_match(matching_server):
+    from tests.test_dedup import _memory_collection
+    matching_server.dedup.coll = _memory_collection()
+    _compensation_mocks(matching_server)
+    req = _try()
+    req.idempotency_key = "d1:rt1:s1:1000"
+
+    first = await matching_server.TryMatch(req, None)
+    replay = await matching_server.TryMatch(req, None)
+
+    assert replay == first and first.trip_id
+    assert matching_server.driver.ReserveSeats.await_count == 1
+    matching_server.trip.CreateTrip.assert_awaited_once()
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from common.memdb import MemoryClient
+
+@pytest.fixture
+def coll():
+    return MemoryClient()["lastmile"]["things"]
+
+def test_find_filters_sort_and_projection(coll):
+    coll.insert_many([
+        {"_id": "a", "n": 3, "tags": ["x"], "area": "A"},
+        {"_id": "b", "n": 1, "tags": ["x", "y"], "area": "B"},
+        {"_id": "c", "n": 2, "area": "A"},
+    ])
+    assert [d["_id"] for d in coll.find({"n": {"$gte": 2}}).sort("n", ASCENDING)] == ["c", "a"]
+    assert [d["_id"] for d in coll.find({"tags": "y"})] == ["b"]
+    assert [d["_id"] for d in coll.find({"tags": {"$exists": False}})] == ["c"]
+    assert [d["_id"] for d in coll.find({"$or": [{"area": "B"}, {"n": 3}]}, sort=[("n", -1)])] == ["a", "b"]
+    assert coll.find_one({"_id": "a"}, {"n": 1, "_id": 0}) == {"n": 3}
+    assert coll.count_documents({"area": {"$in": ["A"]}}) == 2
+    assert [d["_id"] for d in coll.find().sort("n").skip(1).limit(1)] == ["c"]
+
+def test_update_operators(coll):
+    coll.insert_one({"_id": "r", "seats": 3, "queue": ["p", "q", "p"], "ids": []})
+    coll.update_one({"_id": "r"}, {"$inc": {"seats": -1}, "$addToSet": {"ids": {"$each": ["i", "i"]}},
+                                   "$pullAll": {"queue": ["p"]}, "$set": {"meta.ok": True}})
+    assert coll.find_one({"_id": "r"}) == {"_id": "r", "seats": 2, "queue": ["q"], "ids": ["i"], "meta": {"ok": True}}
+    # pipeline-style update, as used for clamped seat counts
+    coll.update_one({"_id": "r"}, [{"$set": {"seats": {"$min": [{"$add": ["$seats", 5]}, 4]}}}])
+    assert coll.find_one({"_id": "r"})["seats"] == 4
+
+def test_upserts_and_find_one_and_update(coll):
+    res = coll.replace_one({"_id": "s1"}, {"name": "S1"}, upsert=True)
+    assert res.upserted_id == "s1" and coll.find_one({"_id": "s1"}) == {"_id": "s1", "name": "S1"}
+    coll.update_one({"k": "x"}, {"$setOnInsert": {"hits": 0}, "$inc": {"n": 1}}, upsert=True)
+    assert coll.find_one({"k": "x"}, {"_id": 0}) == {"k": "x", "hits": 0, "n": 1}
+    after = coll.find_one_and_update({"k": "x"}, {"$inc": {"n": 1}}, return_document=ReturnDocument.AFTER)
+    assert after["n"] == 2
+    assert coll.find_one_and_delete({"k": "x"})["n"] == 2 and coll.count_documents({}) == 1
+
+def test_duplicate_keys(coll):
+    coll.create_indexes([IndexModel([("email", ASCENDING)], unique=True)])
+    coll.insert_one({"_id": 1, "email": "a@x"})
+    with pytest.raises(DuplicateKeyError):
+        coll.insert_one({"_id": 1, "email": "b@x"})
+    with pytest.raises(DuplicateKeyError):
+        coll.insert_one({"_id": 2, "email": "a@x"})
+    with pytest.raises(DuplicateKeyError):
+        coll.update_one({"_id": 3}, {"$set": {"email": "a@x"}}, upsert=True)
+
+def test_change_stream_events(coll):
+    with coll.watch([{"$match": {"operationType": {"$in": ["insert", "delete"]}}}]) as stream:
+        coll.insert_one({"_id": "a", "v": 1})
+        coll.update_one({"_id": "a"}, {"$set": {"v": 2}})
+        coll.delete_one({"_id": "a"})
+        first, second = stream.try_next(), stream.try_next()
+        assert stream.try_next() is None
+    assert (first["operationType"], first["fullDocument"]) == ("insert", {"_id": "a", "v": 1})
+    assert (second["operationType"], second["documentKey"]) == ("delete", {"_id": "a"})
+    assert first["ns"] == {"db": "lastmile", "coll": "things"}
+
+def test_change_streams_off_like_a_standalone_mongod():
+    coll = MemoryClient(change_streams=False)["lastmile"]["things"]
+    with pytest.raises(OperationFailure) as e:
+        coll.watch()
+    assert e.value.code == 40573
+
+def test_ttl_expire_respects_partial_filter(coll):
+    now = datetime.now(timezone.utc)
+    coll.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0,
+                      partialFilterExpression={"state": "PENDING"})
+    coll.insert_many([
+        {"_id": "old", "state": "PENDING", "expires_at": now - timedelta(minutes=1)},
+        {"_id": "kept", "state": "ASSIGNED", "expires_at": now - timedelta(minutes=1)},
+        {"_id": "fresh", "state": "PENDING", "expires_at": now + timedelta(minutes=1)},
+    ])
+    assert coll.expire(now) == 1
+    assert sorted(d["_id"] for d in coll.find()) == ["fresh", "kept"]
@@ -0,0 +1,69 @@
+import asyncio
+import grpc
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry, Gauge
+from common.metrics import start_metrics_server
+from common.run import new_server
+
+def _sample(name, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+async def _echo(request, context):
+    if request == b"boom":
+        await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "bad")
+    return request
+
+async def _count(request, context):
+    for i in range(3):
+        yield bytes([i])
+
+@pytest.mark.asyncio
+async def test_interceptor_records_every_rpc():
+    server = new_server()
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler("test.Echo", {
+        "Echo": grpc.unary_unary_rpc_method_handler(_echo),
+        "Count": grpc.unary_stream_rpc_method_handler(_count),
+    }),))
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    unary = dict(grpc_type="unary", grpc_service="test.Echo", grpc_method="Echo")
+    stream = dict(grpc_type="server_stream", grpc_service="test.Echo", grpc_method="Count")
+    before = (_sample("grpc_server_started_total", **unary),
+              _sample("grpc_server_handled_total", **unary, grpc_code="INVALID_ARGUMENT"),
+              _sample("grpc_server_handling_seconds_count", **stream))
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as ch:
+            assert await ch.unary_unary("/test.Echo/Echo")(b"hi") == b"hi"
+            with pytest.raises(grpc.aio.AioRpcError):
+                await ch.unary_unary("/test.Echo/Echo")(b"boom")
+            assert [r async for r in ch.unary_stream("/test.Echo/Count")(b"")] == [b"\x00", b"\x01", b"\x02"]
+    finally:
+        await server.stop(None)
+
+    assert _sample("grpc_server_started_total", **unary) == before[0] + 2
+    assert _sample("grpc_server_handled_total", **unary, grpc_code="INVALID_ARGUMENT") == before[1] + 1
+    assert _sample("grpc_server_handling_seconds_count", **stream) == before[2] + 1
+    assert _sample("grpc_server_in_flight", **unary) == _sample("grpc_server_in_flight", **stream) == 0
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    reg = CollectorRegistry()
+    Gauge("queue_depth", "Queued items.", registry=reg).set(7)
+    server = start_metrics_server(0, reg, host="127.0.0.1")
+    port = server.server_port
+
+    async def get(path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n".encode())
+        data = await reader.read()
+        writer.close()
+        return data.decode()
+
+    try:
+        ok = await get("/metrics")
+        assert " 200 " in ok.split("\r\n", 1)[0] and "queue_depth 7.0\n" in ok
+        # a second service on the same host keeps running without the endpoint
+        assert start_metrics_server(port, reg, host="127.0.0.1") is None
+    finally:
+        server.shutdown()
+        server.server_close()
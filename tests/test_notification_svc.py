@@ -1,13 +1,14 @@
 import pytest
 from unittest.mock import MagicMock, patch
+from common.db import AsyncDatabase
 from services.notification_svc import NotificationServer
 from lastmile.v1 import notification_pb2
 
 @pytest.fixture
 def notification_server():
-    with patch('services.notification_svc.get_db') as mock_get_db:
+    with patch('services.notification_svc.get_async_db') as mock_get_db:
         mock_db = MagicMock()
-        mock_get_db.return_value = mock_db
+        mock_get_db.return_value = AsyncDatabase(mock_db)
         server = NotificationServer()
         server.notifications = mock_db.notifications
         return server
@@ -23,3 +24,87 @@ async def test_push_notification(notification_server):
     response = await notification_server.Push(request, None)
     
     assert response.success == 1
+
+@pytest.mark.asyncio
+async def test_subscribe_replays_then_streams_pushes(notification_server):
+    import asyncio
+    from bson.objectid import ObjectId
+    from pymongo.errors import OperationFailure
+    notification_server.notifications.watch.side_effect = OperationFailure("standalone")
+    old = {"_id": ObjectId(), "user_id": "u1", "title": "Earlier", "message": "m", "data": "", "timestamp": 5}
+    notification_server.notifications.find.return_value.sort.return_value.limit.return_value = [old]
+
+    stream = notification_server.Subscribe(notification_pb2.SubscribeRequest(user_id="u1", since_ms=1), None)
+    first = await anext(stream)
+    assert (first.id, first.title, first.timestamp) == (str(old["_id"]), "Earlier", 5)
+    flt = notification_server.notifications.find.call_args.args[0]
+    assert flt == {"user_id": "u1", "timestamp": {"$gt": 1}}
+
+    await notification_server.Push(notification_pb2.PushRequest(
+        targets=[notification_pb2.PushTarget(user_id="u2"), notification_pb2.PushTarget(user_id="u1")],
+        title="Matched", body="Your driver is on the way"), None)
+    n = await asyncio.wait_for(anext(stream), 1)
+    assert (n.user_id, n.title, n.body) == ("u1", "Matched", "Your driver is on the way")
+
+    # an insert by another replica arrives via the change stream; our own is not repeated
+    own = notification_server.notifications.insert_many.call_args.args[0][1]
+    other = {"_id": ObjectId(), "user_id": "u1", "title": "Elsewhere", "message": "", "data": "", "timestamp": 9}
+    notification_server._on_mongo_change({"operationType": "insert", "fullDocument": own})
+    notification_server._on_mongo_change({"operationType": "insert", "fullDocument": other})
+    assert (await asyncio.wait_for(anext(stream), 1)).title == "Elsewhere"
+
+    await stream.aclose()
+    assert "u1" not in notification_server.subscribers
+    notification_server._poller.cancel()
+
+@pytest.mark.asyncio
+async def test_push_batch_is_one_insert(notification_server):
+    pushes = [notification_pb2.PushRequest(targets=[notification_pb2.PushTarget(user_id=u) for u in users], title=t)
+              for t, users in (("A", ["u1", "u2"]), ("B", ["u3"]))]
+
+    resp = await notification_server.PushBatch(notification_pb2.PushBatchRequest(pushes=pushes), None)
+
+    assert resp.success == 3
+    notification_server.notifications.insert_many.assert_called_once()
+    docs = notification_server.notifications.insert_many.call_args.args[0]
+    assert [(d["user_id"], d["title"]) for d in docs] == [("u1", "A"), ("u2", "A"), ("u3", "B")]
+
+@pytest.fixture
+def standalone_db():
+    from common import db
+    from common.memdb import MemoryClient
+    previous = db.use_client(MemoryClient(change_streams=False))
+    yield
+    db.use_client(previous)
+
+@pytest.mark.asyncio
+async def test_subscribe_polls_other_replicas_without_change_streams(standalone_db, monkeypatch):
+    import asyncio
+    monkeypatch.setattr("services.notification_svc.NOTIFY_POLL_SECONDS", 0.01)
+    here, there = NotificationServer(), NotificationServer()
+    stream = here.Subscribe(notification_pb2.SubscribeRequest(user_id="u1"), None)
+    first = asyncio.ensure_future(anext(stream))
+    await asyncio.sleep(0.02)  # subscribed, tail failed, poller running
+    assert here._poller is not None and not here._tailing
+
+    await there.Push(notification_pb2.PushRequest(
+        targets=[notification_pb2.PushTarget(user_id="u1")], title="Elsewhere"), None)
+    assert (await asyncio.wait_for(first, 1)).title == "Elsewhere"
+    await stream.aclose()
+    here._poller.cancel()
+
+@pytest.mark.asyncio
+async def test_replay_resumes_after_id_within_one_ms(standalone_db):
+    server = NotificationServer()
+    await server.PushBatch(notification_pb2.PushBatchRequest(pushes=[
+        notification_pb2.PushRequest(targets=[notification_pb2.PushTarget(user_id="u1")], title=t)
+        for t in ("A", "B", "C")]), None)
+    docs = list(server.db.notifications.sync.find({}, sort=[("_id", 1)]))
+    assert len({d["timestamp"] for d in docs}) == 1  # one _store, one ms
+
+    stream = server.Subscribe(notification_pb2.SubscribeRequest(
+        user_id="u1", since_ms=docs[0]["timestamp"], after_id=str(docs[0]["_id"])), None)
+    assert [(await anext(stream)).title for _ in range(2)] == ["B", "C"]
+    await stream.aclose()
+    if server._poller:
+        server._poller.cancel()
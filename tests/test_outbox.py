@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import ServerSelectionTimeoutError
+from common.db import AsyncCollection
+from common.memdb import MemoryClient
+from common.outbox import Outbox
+from lastmile.v1 import notification_pb2
+
+def _memory_collection():
+    return AsyncCollection(MemoryClient()["lastmile"]["notification_outbox"])
+
+def _spilled(coll) -> int:
+    return coll.sync.count_documents({})
+
+def _push(title):
+    return notification_pb2.PushRequest(targets=[notification_pb2.PushTarget(user_id="u1")], title=title)
+
+def _outbox(send, coll, **kw):
+    return Outbox(send, coll, notification_pb2.PushRequest, window=0.01, retry_seconds=0.01, **kw)
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_into_batches():
+    coll = _memory_collection()
+    send = AsyncMock()
+    box = _outbox(send, coll, max_batch=3)
+    box.start()
+    for i in range(5):
+        box.put(_push(f"n{i}"))
+    assert send.await_count == 0  # put never waits on delivery
+
+    await asyncio.sleep(0.05)
+    box._task.cancel()
+    assert [[p.title for p in c.args[0]] for c in send.await_args_list] == [["n0", "n1", "n2"], ["n3", "n4"]]
+    assert box.sent == 5 and len(box) == 0
+
+@pytest.mark.asyncio
+async def test_failed_send_spills_and_is_retried_from_mongo():
+    coll = _memory_collection()
+    send = AsyncMock(side_effect=[RuntimeError("notification down"), None])
+    box = _outbox(send, coll)
+    box.put(_push("a"))
+    box.put(_push("b"))
+
+    assert not await box.flush()
+    assert len(box) == 0 and _spilled(coll) == 2 and box.spilled == 2
+
+    # a fresh outbox (as after a restart) finds and delivers them
+    other = _outbox(send, coll)
+    assert await other.flush()
+    assert [p.title for p in send.await_args.args[0]] == ["a", "b"]
+    assert _spilled(coll) == 0
+
+@pytest.mark.asyncio
+async def test_claimed_messages_are_not_sent_twice():
+    coll = _memory_collection()
+    await _outbox(AsyncMock(side_effect=RuntimeError("down")), coll)._spill([_push("a")])
+    # another replica holds a live lease on it
+    slow, fast = AsyncMock(), AsyncMock()
+    gate = asyncio.Event()
+
+    async def held(batch):
+        await gate.wait()
+    slow.side_effect = held
+    first = asyncio.create_task(_outbox(slow, coll).flush())
+    await asyncio.sleep(0.01)
+    assert await _outbox(fast, coll).flush()
+    gate.set()
+    assert await first
+    fast.assert_not_awaited()
+    assert slow.await_count == 1 and _spilled(coll) == 0
+
+@pytest.mark.asyncio
+async def test_overflow_spills_and_mongo_outage_keeps_memory():
+    coll = _memory_collection()
+    send = AsyncMock()
+    box = _outbox(send, coll, max_buffer=2)
+    box._spilled = False
+    for t in "abc":
+        box.put(_push(t))
+    assert await box.flush()
+    assert [p.title for p in send.await_args_list[0].args[0]] == ["a", "b"]
+    assert box.spilled == 1  # "c" went through Mongo
+
+    coll.sync.insert_many = MagicMock(side_effect=ServerSelectionTimeoutError("mongo down"))
+    send.side_effect = RuntimeError("down")
+    box.put(_push("d"))
+    box.put(_push("e"))
+    assert not await box.flush()
+    assert [p.title for p in box._queue] == ["d", "e"]  # nowhere to spill, kept in order
+
+@pytest.mark.asyncio
+async def test_close_spills_what_is_queued():
+    coll = _memory_collection()
+    gate = asyncio.Event()
+
+    async def stuck(batch):
+        await gate.wait()
+    box = _outbox(AsyncMock(side_effect=stuck), coll, max_batch=1)
+    box._spilled = False
+    box.start()
+    for t in "abc":
+        box.put(_push(t))
+    await asyncio.sleep(0.03)  # "a" is mid-send, "b" and "c" still queued
+
+    await box.close()
+    assert box._task is None and len(box) == 0
+    send = AsyncMock()
+    assert await _outbox(send, coll, max_batch=10).flush()  # as another replica's drain
+    assert [p.title for p in send.await_args.args[0]] == ["a", "b", "c"]
@@ -1,20 +1,21 @@
 import pytest
 from unittest.mock import MagicMock, patch
+from common.db import AsyncDatabase, AsyncCollection
 from services.rider_svc import RiderServer
 from lastmile.v1 import rider_pb2, common_pb2
 
 @pytest.fixture
 def rider_server():
-    with patch('services.rider_svc.get_db') as mock_get_db:
+    with patch('services.rider_svc.get_async_db') as mock_get_db:
         mock_db = MagicMock()
-        mock_get_db.return_value = mock_db
+        mock_get_db.return_value = AsyncDatabase(mock_db)
         server = RiderServer()
-        server.rider_requests = mock_db.rider_requests
+        server.requests = AsyncCollection(mock_db.rider_requests)
         return server
 
 @pytest.mark.asyncio
 async def test_add_request(rider_server):
-    rider_server.requests.insert_one.return_value.inserted_id = "req1"
+    rider_server.requests.sync.insert_one.return_value.inserted_id = "req1"
     
     req = common_pb2.RiderRequest(
         rider_id="r1", station_id="s1", dest_area="Area A", eta_unix=1000
@@ -31,7 +32,7 @@ async def test_list_pending_at_station(rider_server):
     mock_cursor = [
         {"_id": "req1", "rider_id": "r1", "station_id": "s1", "dest_area": "Area A", "status": "PENDING", "eta_unix": 1000}
     ]
-    rider_server.requests.find.return_value.sort.return_value = mock_cursor
+    rider_server.requests.sync.find.return_value.sort.return_value = mock_cursor
     
     request = rider_pb2.ListPendingAtStationRequest(
         station_id="s1", now_unix=1000, minutes_window=10, dest_area="Area A"
@@ -40,3 +41,132 @@ async def test_list_pending_at_station(rider_server):
     
     assert len(response.requests) == 1
     assert response.requests[0].id == "req1"
+
+def _req(rid, eta, station="s1", area="Area A"):
+    return common_pb2.RiderRequest(id=rid, rider_id="r" + rid, station_id=station, dest_area=area,
+                                   eta_unix=eta, status="PENDING")
+
+def test_rider_store_window_and_expire():
+    from services.rider_svc import RiderStore
+    store = RiderStore()
+    for rid, eta in [("a", 1300), ("b", 1000), ("c", 1600), ("d", 1000)]:
+        store.add(_req(rid, eta))
+    store.add(_req("e", 1000, area="Area B"))
+
+    assert [r.id for r in store.window("s1", "Area A", 1000, 1300)] == ["b", "d", "a"]
+    assert store.window("s2", "Area A", 0, 9999) == []
+
+    store.add(_req("b", 1700))  # re-adding moves it
+    assert [r.id for r in store.window("s1", "Area A", 1500, 2000)] == ["c", "b"]
+
+    assert store.expire(1500) == 3
+    assert sorted(store.requests) == ["b", "c"]
+    assert store.remove("c") and not store.remove("c")
+
+@pytest.mark.asyncio
+async def test_pending_index_write_through(rider_server):
+    rider_server.requests.sync.find.return_value.sort.return_value = [
+        {"_id": "507f1f77bcf86cd799439011", "rider_id": "r1", "station_id": "s1", "dest_area": "Area A", "status": "PENDING", "eta_unix": 1000}
+    ]
+    list_req = rider_pb2.ListPendingAtStationRequest(station_id="s1", now_unix=1000, minutes_window=10, dest_area="Area A")
+    assert [r.id for r in (await rider_server.ListPendingAtStation(list_req, None)).requests] == ["507f1f77bcf86cd799439011"]
+
+    rider_server.requests.sync.insert_one.return_value.inserted_id = "req2"
+    await rider_server.AddRequest(rider_pb2.AddRequestRequest(request=_req("", 1100)), None)
+    await rider_server.MarkAssigned(rider_pb2.MarkAssignedRequest(request_ids=["507f1f77bcf86cd799439011"], trip_id="t1"), None)
+
+    resp = await rider_server.ListPendingAtStation(list_req, None)
+    assert [r.id for r in resp.requests] == ["req2"]
+    # loaded once, then served from memory
+    loads = [c for c in rider_server.requests.sync.find.call_args_list if c.args[0] == {"status": "PENDING"}]
+    assert len(loads) == 1
+
+@pytest.mark.asyncio
+async def test_unassign_puts_request_back_in_index(rider_server):
+    rider_server.requests.sync.find.return_value.sort.return_value = []
+    await rider_server.load_pending()
+    rider_server.requests.sync.find_one_and_update.return_value = {
+        "_id": "507f1f77bcf86cd799439011", "rider_id": "r1", "station_id": "s1",
+        "dest_area": "Area A", "status": "PENDING", "eta_unix": 1000
+    }
+
+    resp = await rider_server.UnassignRequests(rider_pb2.UnassignRequestsRequest(
+        request_ids=["507f1f77bcf86cd799439011"], trip_id="t1"), None)
+
+    assert resp.updated == 1
+    assert "507f1f77bcf86cd799439011" in rider_server.pending
+    flt = rider_server.requests.sync.find_one_and_update.call_args.args[0]
+    assert flt["trip_id"] == "t1" and flt["status"] == "ASSIGNED"
+
+@pytest.mark.asyncio
+async def test_add_request_sets_ttl_expiry(rider_server):
+    from datetime import datetime, timezone
+    from common.db import RIDER_EXPIRY_GRACE_SECONDS
+    rider_server.requests.sync.insert_one.return_value.inserted_id = "req1"
+
+    await rider_server.AddRequest(rider_pb2.AddRequestRequest(request=_req("", 1000)), None)
+
+    doc = rider_server.requests.sync.insert_one.call_args.args[0]
+    assert doc["expire_at"] == datetime.fromtimestamp(1000 + RIDER_EXPIRY_GRACE_SECONDS, tz=timezone.utc)
+
+@pytest.mark.asyncio
+async def test_mark_assigned_is_one_bulk_write_with_report(rider_server):
+    ours, taken = "507f1f77bcf86cd799439011", "507f1f77bcf86cd799439012"
+    rider_server.requests.sync.find.return_value = [{"_id": ours}]
+
+    resp = await rider_server.MarkAssigned(rider_pb2.MarkAssignedRequest(
+        request_ids=[ours, taken, "not-an-id"], trip_id="t1"), None)
+
+    assert list(resp.assigned_ids) == [ours]
+    assert list(resp.taken_ids) == [taken, "not-an-id"]
+    assert resp.updated == 1
+    rider_server.requests.sync.update_many.assert_called_once()
+    rider_server.requests.sync.update_one.assert_not_called()
+    flt = rider_server.requests.sync.update_many.call_args.args[0]
+    assert len(flt["_id"]["$in"]) == 2 and flt["status"] == "PENDING"
+
+@pytest.mark.asyncio
+async def test_watch_station_snapshot_then_deltas(rider_server):
+    import asyncio
+    rid = "507f1f77bcf86cd799439011"
+    rider_server.requests.sync.find.return_value.sort.return_value = [
+        {"_id": rid, "rider_id": "r1", "station_id": "s1", "dest_area": "Area A", "status": "PENDING", "eta_unix": 1000},
+        {"_id": "other", "rider_id": "r2", "station_id": "s2", "dest_area": "Area A", "status": "PENDING", "eta_unix": 1000},
+    ]
+    stream = rider_server.WatchStation(rider_pb2.WatchStationRequest(station_id="s1"), None)
+
+    first = [await anext(stream), await anext(stream)]
+    assert [(c.op, c.request_id) for c in first] == [("RESYNC", ""), ("UPSERT", rid)]
+
+    rider_server.requests.sync.insert_one.return_value.inserted_id = "req2"
+    await rider_server.AddRequest(rider_pb2.AddRequestRequest(request=_req("", 1100, area="Area B")), None)
+    await rider_server.AddRequest(rider_pb2.AddRequestRequest(request=_req("", 1100, station="s2")), None)
+    await rider_server.MarkAssigned(rider_pb2.MarkAssignedRequest(request_ids=[rid], trip_id="t1"), None)
+
+    nxt = [await asyncio.wait_for(anext(stream), 1) for _ in range(2)]
+    assert [(c.op, c.request_id) for c in nxt] == [("UPSERT", "req2"), ("DELETE", rid)]
+    assert nxt[0].request.dest_area == "Area B"
+
+    await stream.aclose()
+    assert "s1" not in rider_server.watchers
+
+@pytest.mark.asyncio
+async def test_dropped_tail_reloads_the_index(rider_server):
+    import asyncio
+    from pymongo.errors import AutoReconnect
+    from tests.test_driver_svc import _Stream
+    rider_server.requests.sync.watch.side_effect = [
+        _Stream(error=AutoReconnect("primary stepped down")), AutoReconnect("no primary yet")]
+    rider_server.requests.sync.find.return_value.sort.return_value = []
+    assert await rider_server.start_tail()
+    await rider_server.load_pending()
+
+    # written by another replica while the stream was down
+    rider_server.requests.sync.find.return_value.sort.return_value = [{
+        "_id": "q1", "rider_id": "r1", "station_id": "s1", "dest_area": "A", "eta_unix": 2**31, "status": "PENDING"}]
+    for _ in range(100):
+        if rider_server._retail is not None and rider_server._retail.done():
+            break
+        await asyncio.sleep(0.01)
+    assert not rider_server._tailing  # so maintain_pending_index reloads on its schedule
+    assert [r.id for r in rider_server.pending.at_station("s1")] == ["q1"]
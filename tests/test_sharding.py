@@ -0,0 +1,33 @@
+import pytest
+from common.sharding import HashRing, ShardMap, resolve_peers
+
+KEYS = [f"station-{i}" for i in range(2000)]
+
+def test_ring_spreads_keys_and_moves_few_on_join():
+    ring = HashRing(["a:1", "b:1", "c:1", "d:1"])
+    before = {k: ring.owner(k) for k in KEYS}
+    counts = {n: list(before.values()).count(n) for n in ring.nodes}
+    assert min(counts.values()) > len(KEYS) / 4 * 0.6
+
+    assert ring.set_nodes(["a:1", "b:1", "c:1", "d:1", "e:1"])
+    moved = [k for k in KEYS if ring.owner(k) != before[k]]
+    # only keys taken over by the new node move, roughly 1/5 of them
+    assert all(ring.owner(k) == "e:1" for k in moved)
+    assert 0.1 < len(moved) / len(KEYS) < 0.3
+
+def test_ring_depends_only_on_member_set():
+    a, b = HashRing(["x:1", "y:1", "z:1"]), HashRing(["z:1", "x:1", "y:1", "y:1"])
+    assert all(a.owner(k) == b.owner(k) for k in KEYS)
+    assert not a.set_nodes(["y:1", "z:1", "x:1"])
+    assert HashRing().owner("s1") is None
+
+@pytest.mark.asyncio
+async def test_shard_map_reports_membership_changes():
+    changes = []
+    shards = ShardMap("b:1, a:1", on_change=lambda old, new: changes.append((old, new)))
+    assert await shards.refresh()
+    assert not await shards.refresh()
+    shards.spec = "a:1"
+    assert await shards.refresh()
+    assert changes == [((), ("a:1", "b:1")), (("a:1", "b:1"), ("a:1",))]
+    assert await resolve_peers("dns:localhost:50057")
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import time
+import pytest
+from lastmile.v1 import common_pb2, driver_pb2, location_pb2, rider_pb2, station_pb2
+from common import db
+from common.memdb import MemoryClient
+from common.stack import Stack
+
+async def _eventually(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+@pytest.mark.asyncio
+async def test_ping_to_trip_to_notifications():
+    async with Stack() as stack:
+        await stack.stub("station").UpsertStation(station_pb2.UpsertStationRequest(station=common_pb2.Station(
+            id="S1", name="Central", location=common_pb2.LatLng(lat=12.97, lon=77.6), nearby_areas=["A"])))
+        route = (await stack.stub("driver").RegisterRoute(driver_pb2.RegisterRouteRequest(route=driver_pb2.DriverRoute(
+            driver_id="d1", dest_area="A", seats_total=2, seats_free=2,
+            stations=[driver_pb2.RouteStation(station_id="S1", minutes_before_eta_match=5)],
+        )))).route
+        now = int(time.time())
+        await stack.stub("rider").AddRequest(rider_pb2.AddRequestRequest(request=common_pb2.RiderRequest(
+            rider_id="r1", station_id="S1", eta_unix=now + 60, dest_area="A")))
+        await stack.stub("location").BatchDriverLocations(location_pb2.BatchDriverLocationsRequest(locations=[
+            location_pb2.DriverLocation(driver_id="d1", route_id=route.id, ts_unix=now,
+                                        point=common_pb2.LatLng(lat=12.97, lon=77.6))]))
+        await _eventually(lambda: stack.db.notifications.count_documents({}) >= 2)
+        trip = stack.db.trips.find_one({})
+        assert trip["driver_id"] == "d1" and trip["rider_ids"] == ["r1"]
+        assert stack.db.driver_routes.find_one({"driver_id": "d1"})["seats_free"] == 1
+        assert {n["user_id"] for n in stack.db.notifications.find()} == {"d1", "r1"}
+
+@pytest.mark.asyncio
+async def test_stop_restores_env_and_client(monkeypatch):
+    monkeypatch.setenv("STATION_ADDR", "elsewhere:50052")
+    monkeypatch.delenv("USER_ADDR", raising=False)
+    before = db.use_client(None)
+    db.use_client(before)
+    stack = await Stack(services=["user", "station"]).start()
+    assert set(stack.addrs) == {"user", "station"}
+    assert os.environ["STATION_ADDR"] == stack.addrs["station"]
+    assert isinstance(db.get_db().client, MemoryClient)
+    await stack.stop()
+    assert os.environ["STATION_ADDR"] == "elsewhere:50052" and "USER_ADDR" not in os.environ
+    assert db._client is before
@@ -0,0 +1,114 @@
+import json
+from unittest.mock import MagicMock
+import grpc
+import pytest
+from flask import Flask
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import StatusCode
+from common import tracing
+from common.db import AsyncCollection
+from common.run import new_server
+
+class Spans(InMemorySpanExporter):
+    @property
+    def spans(self):
+        return self.get_finished_spans()
+
+    def named(self, name):
+        return next(s for s in self.spans if s.name == name)
+
+@pytest.fixture
+def exporter():
+    exp = Spans()
+    tracing.configure(exp, sample_rate=1.0, service="test", batch=False)
+    yield exp
+    tracing.disable()
+
+def test_sampling_decision_follows_the_root():
+    exp = Spans()
+    tracer = tracing.configure(exp, sample_rate=0.0, service="test", batch=False)
+    try:
+        with tracer.start_as_current_span("root") as root:
+            with tracer.start_as_current_span("child") as child:
+                assert child.get_span_context().trace_id == root.get_span_context().trace_id
+                assert not child.get_span_context().trace_flags.sampled
+                # an unsampled trace still propagates, so downstream drops it too
+                assert int(tracing._with_context(())[-1][1].rsplit("-", 1)[1], 16) & 1 == 0
+        assert exp.spans == () and not tracing.in_trace()
+    finally:
+        tracing.disable()
+
+async def _echo(request, context):
+    with tracing.get_tracer().start_as_current_span("handler"):
+        if request == b"boom":
+            await context.abort(grpc.StatusCode.NOT_FOUND, "gone")
+    return request
+
+@pytest.mark.asyncio
+async def test_context_crosses_grpc_hops(exporter):
+    server = new_server()
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler("test.Echo", {
+        "Echo": grpc.unary_unary_rpc_method_handler(_echo),
+    }),))
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    tracer = tracing.get_tracer()
+    try:
+        async with tracing.aio_channel(f"127.0.0.1:{port}") as ch:
+            with tracer.start_as_current_span("request") as root:
+                assert await ch.unary_unary("/test.Echo/Echo")(b"hi") == b"hi"
+            with pytest.raises(grpc.aio.AioRpcError):
+                await ch.unary_unary("/test.Echo/Echo")(b"boom")
+    finally:
+        await server.stop(None)
+
+    trace_id = root.get_span_context().trace_id
+    first = {s.kind: s for s in exporter.spans if s.context.trace_id == trace_id and s.name != "handler"}
+    client, srv = first[tracing.CLIENT], first[tracing.SERVER]
+    handler = next(s for s in exporter.spans if s.name == "handler" and s.context.trace_id == trace_id)
+    assert client.name == "test.Echo/Echo" and client.parent.span_id == root.get_span_context().span_id
+    assert srv.name == "test.Echo/Echo" and srv.parent.span_id == client.context.span_id and srv.parent.is_remote
+    assert handler.parent.span_id == srv.context.span_id
+    failed = [s for s in exporter.spans if s.status.status_code == StatusCode.ERROR and s.name != "handler"]
+    assert {s.kind for s in failed} == {tracing.CLIENT, tracing.SERVER}
+    assert all(s.status.description == "NOT_FOUND" and s.attributes["rpc.grpc.status_code"] == 5 for s in failed)
+
+@pytest.mark.asyncio
+async def test_mongo_calls_are_spans_inside_a_trace(exporter):
+    coll = MagicMock()
+    coll.name = "trips"
+    coll.find.return_value = [{"_id": 1}]
+    trips = AsyncCollection(coll)
+    assert await trips.find({}) == [{"_id": 1}]  # no trace yet: no root span per query
+    assert exporter.spans == ()
+    with tracing.get_tracer().start_as_current_span("request") as root:
+        await trips.find({"status": "active"})
+    span = exporter.named("mongo trips.find")
+    assert span.parent.span_id == root.get_span_context().span_id and span.attributes["db.operation"] == "find"
+
+def test_flask_requests_continue_the_callers_trace(exporter):
+    app = Flask(__name__)
+    tracing.init_app(app)
+
+    @app.route("/api/ping/<x>")
+    def ping(x):
+        return "pong"
+
+    caller = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert app.test_client().get("/api/ping/1", headers={"traceparent": caller}).status_code == 200
+    span, = exporter.spans
+    assert span.name == "GET /api/ping/<x>" and span.kind == tracing.SERVER
+    assert (span.context.trace_id, span.parent.span_id) == (0x4bf92f3577b34da6a3ce929d0e0e4736, 0x00f067aa0ba902b7)
+    assert span.attributes["http.status_code"] == 200 and not tracing.in_trace()
+
+def test_file_exporter(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = tracing.configure(tracing.file_exporter(str(path)), sample_rate=1.0, service="trip", batch=False)
+    try:
+        with tracer.start_as_current_span("TripService/Complete", kind=tracing.SERVER) as span:
+            pass
+    finally:
+        tracing.disable()
+    out = json.loads(path.read_text())
+    assert out["name"] == "TripService/Complete" and out["resource"]["attributes"]["service.name"] == "trip"
+    assert out["context"]["span_id"] == f"0x{span.get_span_context().span_id:016x}"
@@ -1,20 +1,21 @@
 import pytest
 from unittest.mock import MagicMock, patch
+from common.db import AsyncDatabase, AsyncCollection
 from services.trip_svc import TripServer
 from lastmile.v1 import trip_pb2, common_pb2
 
 @pytest.fixture
 def trip_server():
-    with patch('services.trip_svc.get_db') as mock_get_db:
+    with patch('services.trip_svc.get_async_db') as mock_get_db:
         mock_db = MagicMock()
-        mock_get_db.return_value = mock_db
+        mock_get_db.return_value = AsyncDatabase(mock_db)
         server = TripServer()
-        server.trips = mock_db.trips
+        server.trips = AsyncCollection(mock_db.trips)
         return server
 
 @pytest.mark.asyncio
 async def test_create_trip(trip_server):
-    trip_server.trips.insert_one.return_value.inserted_id = "t1"
+    trip_server.trips.sync.insert_one.return_value.inserted_id = "t1"
     
     request = trip_pb2.CreateTripRequest(
         driver_id="d1", route_id="rt1", station_id="s1", rider_ids=["r1"]
@@ -25,7 +26,7 @@ async def test_create_trip(trip_server):
 
 @pytest.mark.asyncio
 async def test_update_trip_status(trip_server):
-    trip_server.trips.find_one_and_update.return_value = {
+    trip_server.trips.sync.find_one_and_update.return_value = {
         "_id": "507f1f77bcf86cd799439011", "driver_id": "d1", "route_id": "rt1", "station_id": "s1", "status": "ACTIVE", "rider_ids": []
     }
     
@@ -34,3 +35,54 @@ async def test_update_trip_status(trip_server):
     
     assert response.trip.id == "507f1f77bcf86cd799439011"
     assert response.trip.status == "ACTIVE"
+
+@pytest.mark.asyncio
+async def test_create_trip_with_caller_id_is_retry_safe(trip_server):
+    from pymongo.errors import DuplicateKeyError
+    trip_server.trips.sync.insert_one.side_effect = DuplicateKeyError("dup")
+
+    request = trip_pb2.CreateTripRequest(
+        driver_id="d1", route_id="rt1", station_id="s1", rider_ids=["r1"], trip_id="507f1f77bcf86cd799439011"
+    )
+    response = await trip_server.CreateTrip(request, None)
+
+    assert response.trip.id == "507f1f77bcf86cd799439011"
+    assert str(trip_server.trips.sync.insert_one.call_args.args[0]["_id"]) == "507f1f77bcf86cd799439011"
+
+@pytest.mark.asyncio
+async def test_create_trip_rejects_a_malformed_trip_id(trip_server):
+    import grpc
+    from unittest.mock import AsyncMock
+    context = MagicMock(abort=AsyncMock(side_effect=grpc.RpcError()))
+
+    with pytest.raises(grpc.RpcError):
+        await trip_server.CreateTrip(trip_pb2.CreateTripRequest(driver_id="d1", trip_id="not-an-id"), context)
+
+    assert context.abort.await_args.args[0] == grpc.StatusCode.INVALID_ARGUMENT
+    trip_server.trips.sync.insert_one.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_remove_riders_pulls_them_from_trip(trip_server):
+    trip_server.trips.sync.find_one_and_update.return_value = {
+        "_id": "507f1f77bcf86cd799439011", "driver_id": "d1", "route_id": "rt1", "station_id": "s1",
+        "status": "SCHEDULED", "rider_ids": ["r1"]
+    }
+    response = await trip_server.RemoveRiders(trip_pb2.RemoveRidersRequest(
+        trip_id="507f1f77bcf86cd799439011", rider_ids=["r2"]), None)
+
+    assert list(response.trip.rider_ids) == ["r1"]
+    assert trip_server.trips.sync.find_one_and_update.call_args.args[1] == {"$pullAll": {"rider_ids": ["r2"]}}
+
+@pytest.mark.asyncio
+async def test_completion_notification_goes_to_outbox(trip_server):
+    trip_server.notify = MagicMock()
+    trip_server.trips.sync.find_one_and_update.return_value = {
+        "_id": "507f1f77bcf86cd799439011", "driver_id": "d1", "route_id": "507f1f77bcf86cd799439012",
+        "station_id": "s1", "status": "COMPLETED", "rider_ids": ["r1", "r2"]
+    }
+
+    await trip_server.UpdateTripStatus(trip_pb2.UpdateTripStatusRequest(
+        trip_id="507f1f77bcf86cd799439011", status="COMPLETED"), None)
+
+    assert len(trip_server.outbox) == 1
+    assert not trip_server.notify.mock_calls  # nothing on the request path